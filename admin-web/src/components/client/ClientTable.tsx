@@ -2,6 +2,7 @@ import { useEffect, useState } from 'react';
 import { useAuth } from '@/context/AuthContext';
 import { Client } from './types';
 import { formatDate, formatPhone } from '@/utils/formatters';
+import { fetchAllPages } from '@/utils/pagination';
 import { useClientModal } from './ClientModalContext';
 import { Input } from '@/components/ui/input';
 import { Button } from '@/components/ui/button';
@@ -23,15 +24,7 @@ export const ClientTable = ({ refreshKey }: { refreshKey?: number }) => {
     setIsLoading(true);
     setError(null);
     try {
-      const response = await authAxios.get(`api/v1/users/customers/`);
-      const data = await response.json();
-      const clientList = Array.isArray(data)
-        ? data
-        : Array.isArray(data.results)
-          ? data.results
-          : Array.isArray(data.data)
-            ? data.data
-            : [];
+      const clientList = await fetchAllPages<Client>(authAxios, 'api/v1/users/customers/');
       setClients(clientList);
     } catch (err: unknown) {
       if (err instanceof Error) {
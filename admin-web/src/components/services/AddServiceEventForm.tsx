@@ -40,6 +40,7 @@ import {
 } from "@/components/ui/popover";
 import { useAuth } from "@/context/AuthContext";
 import { useNavigate } from "react-router-dom";
+import { fetchAllPages } from "@/utils/pagination";
 
 // Form schema validation
 const serviceEventSchema = z.object({
@@ -149,51 +150,9 @@ export function AddServiceEventForm({
       
       try {
         console.log("[AddServiceEventForm] Fetching service types...");
-        const response = await authAxios.get("api/v1/service-types/");
-        const data = response.data;
-        // Gestion du cas token expiré ou invalide
-        if (data && data.error && data.error.code === 'token_not_valid') {
-          setServiceTypesError("Session expirée, veuillez vous reconnecter.");
-          setServiceTypes([]);
-          return;
-        }
-        
-        // Ensure serviceTypes is always an array
-        if (Array.isArray(data)) {
-          console.log("[AddServiceEventForm] Setting serviceTypes from direct array");
-          setServiceTypes(data.map(normalizeServiceType));
-        } else if (data && Array.isArray(data.data)) {
-          // Handle nested data structure if API returns {data: [...]}
-          console.log("[AddServiceEventForm] Setting serviceTypes from nested data.data array");
-          setServiceTypes(data.data.map(normalizeServiceType));
-        } else if (data && data.results && Array.isArray(data.results)) {
-          // Handle pagination format {results: [...]}
-          console.log("[AddServiceEventForm] Setting serviceTypes from data.results array");
-          setServiceTypes(data.results.map(normalizeServiceType));
-        } else if (data && typeof data === 'object') {
-          // If it's an object but not in any expected format, try to extract values
-          console.log("[AddServiceEventForm] Attempting to convert object to array");
-          const extractedTypes = Object.values(data).filter((v): v is ServiceTypeResponse => !!v && typeof v === 'object' && 'id' in v);
-          
-          if (extractedTypes.length > 0) {
-            console.log("[AddServiceEventForm] Extracted types from object:", extractedTypes);
-            setServiceTypes(extractedTypes.map(normalizeServiceType));
-          } else {
-            // Last resort - create dummy data for testing
-            console.log("[AddServiceEventForm] Creating dummy service type data for testing");
-            setServiceTypesError("Format de données inattendu - utilisation de données de test");
-            setServiceTypes([
-              { id: 1, name: "Vidange (Test)" },
-              { id: 2, name: "Révision (Test)" },
-              { id: 3, name: "Freins (Test)" }
-            ]);
-          }
-        } else {
-          // Set empty array as fallback
-          console.error("[AddServiceEventForm] Unexpected service types data format:", data);
-          setServiceTypesError("Format de données inattendu");
-          setServiceTypes([]);
-        }
+        // Toutes les pages de la liste
+        const data = await fetchAllPages<ServiceTypeResponse>(authAxios, "api/v1/service-types/");
+        setServiceTypes(data.map(normalizeServiceType));
       } catch (error) {
         console.error("[AddServiceEventForm] Failed to fetch service types:", error);
         setServiceTypesError("Erreur lors du chargement des types de service");
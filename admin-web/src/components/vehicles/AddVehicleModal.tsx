@@ -30,6 +30,7 @@ import {
 } from "@/components/ui/popover";
 import { RadioGroup, RadioGroupItem } from "@/components/ui/radio-group";
 import { z } from "zod";
+import { fetchAllPages } from "@/utils/pagination";
 
 // Type definitions
 interface AddVehicleModalProps {
@@ -158,16 +159,8 @@ const AddVehicleModal: React.FC<AddVehicleModalProps> = ({ isOpen, onOpenChange,
     try {
       console.log("[AddVehicleModal] Fetching customers from /api/v1/users/customers/");
       
-      // Use Ky client through authAxios - separate response and json steps
-      const response = await authAxios.get('api/v1/users/customers/');
-      const responseData = await response.json();
-      console.log("[AddVehicleModal] Customer list response:", responseData);
-      
-      const userList: Customer[] = Array.isArray(responseData.results) 
-        ? responseData.results 
-        : (Array.isArray(responseData.data)
-            ? responseData.data
-            : (Array.isArray(responseData) ? responseData : []));
+      // Toutes les pages de la liste
+      const userList = await fetchAllPages<Customer>(authAxios, 'api/v1/users/customers/');
 
       if (Array.isArray(userList)) {
         setCustomers(userList);
@@ -11,6 +11,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { toast } from 'sonner';
 import { useNavigate } from 'react-router-dom';
 import type { Vehicle } from "@/types/vehicle";
+import { fetchAllPages } from '@/utils/pagination';
 
 interface CustomerDetails {
   id: number;
@@ -38,7 +39,7 @@ export const VehicleDetailsModal: React.FC<VehicleDetailsModalProps> = ({
   vehicle, 
 }) => {
   // TOUS les hooks doivent être ici, AVANT toute logique conditionnelle
-  const { token, refreshToken, authAxios, isAuthenticated } = useAuth();
+  const { token, authAxios, isAuthenticated } = useAuth();
   const [customerDetails, setCustomerDetails] = useState<CustomerDetails | null>(null);
   const [isLoadingCustomer, setIsLoadingCustomer] = useState(false);
   const [customerError, setCustomerError] = useState<string | null>(null);
@@ -97,26 +98,7 @@ export const VehicleDetailsModal: React.FC<VehicleDetailsModalProps> = ({
     setIsLoadingCustomer(true);
     setCustomerError(null);
     try {
-      const response = await authAxios.get('api/v1/users/customers/');
-      if (response.status === 401 && refreshToken) {
-        await refreshToken();
-        setIsLoadingCustomer(false);
-        return;
-      }
-      if (!response.ok) {
-        if (response.status === 401) {
-          navigate('/login');
-          return;
-        }
-        throw new Error(`Erreur lors de la récupération des détails du client: ${response.statusText}`);
-      }
-      const responseData = await response.json();
-      let customersArray = [];
-      if (responseData.data && Array.isArray(responseData.data)) {
-        customersArray = responseData.data;
-      } else if (Array.isArray(responseData)) {
-        customersArray = responseData;
-      }
+      const customersArray = await fetchAllPages<CustomerDetails>(authAxios, 'api/v1/users/customers/');
       const userData = customersArray.find((user: CustomerDetails) => user.username === username);
       if (!userData) {
         throw new Error(`Utilisateur ${username} non trouvé`);
@@ -178,26 +160,7 @@ export const VehicleDetailsModal: React.FC<VehicleDetailsModalProps> = ({
     if (!token || !isAuthenticated) return;
     setIsLoadingOwners(true);
     try {
-      const response = await authAxios.get('api/v1/users/customers/');
-      if (response.status === 401 && refreshToken) {
-        await refreshToken();
-        setIsLoadingOwners(false);
-        return;
-      }
-      if (!response.ok) {
-        if (response.status === 401) {
-          navigate('/login');
-          return;
-        }
-        throw new Error(`Erreur lors de la récupération des propriétaires: ${response.statusText}`);
-      }
-      const responseData = await response.json();
-      let ownersArray = [];
-      if (responseData.data && Array.isArray(responseData.data)) {
-        ownersArray = responseData.data;
-      } else if (Array.isArray(responseData)) {
-        ownersArray = responseData;
-      }
+      const ownersArray = await fetchAllPages(authAxios, 'api/v1/users/customers/');
       setAvailableOwners(ownersArray);
     } catch (error) {
       toast.error("Impossible de charger la liste des propriétaires", {
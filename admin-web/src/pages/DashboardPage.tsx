@@ -20,83 +20,94 @@ import { Alert, AlertDescription, AlertTitle } from '@/components/ui/alert';
 import { formatDate } from '@/utils/formatters';
 import { Skeleton } from '@/components/ui/skeleton';
 
-// Types pour les données de l'API
-interface Vehicle {
+// Types pour la réponse de api/v1/dashboard/ (indicateurs calculés par le serveur)
+interface ActivityItem {
+  type: 'vehicle' | 'service' | 'mileage' | 'invoice';
   id: number;
+  at: string;
   registration_number: string;
-  make: string;
-  model: string;
-  owner_username?: string;
-  created_at: string;
+  value: string | number | null;
+  user: string | null;
 }
 
-interface ServiceEvent {
-  id: number;
-  vehicle: number;
-  service_type: number;
-  event_date: string;
-  status: 'SCHEDULED' | 'IN_PROGRESS' | 'COMPLETED';
-  service_type_info?: {
-    name: string;
+interface DashboardData {
+  vehicles: {
+    total: number;
+    added_last_month: number;
+    average_mileage: number | null;
+    growth_rate: number | null;
   };
-  vehicle_info?: {
-    registration_number: string;
+  service_events: {
+    upcoming: number;
+    today: number;
+    urgent: number;
+    last_month: number;
   };
-}
-
-interface User {
-  id: number;
-  username: string;
-  first_name?: string;
-  last_name?: string;
-  email: string;
-  date_joined?: string;
-}
-
-interface MileageRecord {
-  id: number;
-  vehicle: number;
-  mileage: number;
-  recorded_at: string;
-  source: string;
-  recorded_by_username?: string;
-}
-
-interface Invoice {
-  id: number;
-  vehicle_id: number;
-  service_event_id?: number;
-  file?: string;
-  final_amount: number;
-  created_at: string;
-  vehicle_info?: {
-    registration_number: string;
-  }
+  customers: {
+    total: number;
+    joined_last_week: number;
+  };
+  invoices: {
+    total: number;
+    total_amount: number;
+    amount_last_month: number;
+    monthly: { month: string; count: number; amount: number }[];
+  };
+  recent_activity: ActivityItem[];
 }
 
 interface RecentActivity {
-  id: number;
+  id: string;
   description: string;
   user: string;
   time: string;
 }
 
+// Fonction helper pour vérifier si une date est valide
+const isValidDate = (date: Date): boolean => date instanceof Date && !isNaN(date.getTime());
+
+// Texte "il y a X minutes/heures/jours" (ou la date au-delà de 30 jours)
+const timeAgo = (date: Date): string => {
+  if (!isValidDate(date)) return 'date inconnue';
+  const diffMins = Math.max(0, Math.floor((Date.now() - date.getTime()) / 60000));
+  const diffHours = Math.floor(diffMins / 60);
+  const diffDays = Math.floor(diffHours / 24);
+  if (diffMins < 60) return `il y a ${diffMins} minute${diffMins > 1 ? 's' : ''}`;
+  if (diffHours < 24) return `il y a ${diffHours} heure${diffHours > 1 ? 's' : ''}`;
+  if (diffDays < 30) return `il y a ${diffDays} jour${diffDays > 1 ? 's' : ''}`;
+  return formatDate(date.toISOString());
+};
+
+// Convertir une activité de l'API en ligne affichable
+const describeActivity = (item: ActivityItem): RecentActivity => {
+  let description = '';
+  let user = item.user || 'Admin';
+  switch (item.type) {
+    case 'vehicle':
+      description = `Nouveau véhicule ajouté : ${item.registration_number}`;
+      break;
+    case 'service':
+      description = `Service ${item.value} enregistré pour ${item.registration_number}`;
+      user = item.user || 'Mécanicien';
+      break;
+    case 'mileage':
+      description = `Kilométrage mis à jour pour ${item.registration_number}: ${Number(item.value).toLocaleString('fr-FR')} km`;
+      break;
+    case 'invoice':
+      description = `Nouvelle facture ajoutée pour ${item.registration_number}: ${Number(item.value ?? 0).toLocaleString('fr-FR')} DT`;
+      user = item.user || 'Manager';
+      break;
+  }
+  return { id: `${item.type}-${item.id}`, description, user, time: timeAgo(new Date(item.at)) };
+};
+
 const DashboardPage = () => {
   const { authAxios, token, isAuthenticated } = useAuth();
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  
-  // États pour stocker les données de l'API
-  const [vehicles, setVehicles] = useState<Vehicle[]>([]);
-  const [serviceEvents, setServiceEvents] = useState<ServiceEvent[]>([]);
-  const [users, setUsers] = useState<User[]>([]);
-  const [mileageRecords, setMileageRecords] = useState<MileageRecord[]>([]);
-  const [invoices, setInvoices] = useState<Invoice[]>([]);
-  
-  // État pour les activités récentes
-  const [recentActivities, setRecentActivities] = useState<RecentActivity[]>([]);
+  const [dashboard, setDashboard] = useState<DashboardData | null>(null);
 
-  // Fonction pour charger toutes les données nécessaires
+  // Une seule requête : les indicateurs sont agrégés côté serveur
   const fetchDashboardData = async () => {
     if (!token || !isAuthenticated) return;
     
@@ -104,45 +115,12 @@ const DashboardPage = () => {
     setError(null);
     
     try {
-      // Charger les véhicules
-      const vehiclesPromise = authAxios.get('api/v1/vehicles/')
-        .then(response => response.json())
-        .then(data => data.data || data || []);
-      
-      // Charger les événements de service
-      const serviceEventsPromise = authAxios.get('api/v1/service-events/')
-        .then(response => response.json())
-        .then(data => data.data || data || []);
-      
-      // Charger les utilisateurs (clients)
-      const usersPromise = authAxios.get('api/v1/users/customers/')
-        .then(response => response.json())
-        .then(data => data.data || data || []);
-      
-      // Charger les enregistrements de kilométrage
-      const mileageRecordsPromise = authAxios.get('api/v1/mileage-records/')
-        .then(response => response.json())
-        .then(data => data.data || data || []);
-      
-      // Charger les factures
-      const invoicesPromise = authAxios.get('api/v1/invoices/')
-        .then(response => response.json())
-        .then(data => data.data || data || []);
-      
-      // Attendre que toutes les promesses soient résolues
-      const [vehiclesData, serviceEventsData, usersData, mileageRecordsData, invoicesData] = 
-        await Promise.all([vehiclesPromise, serviceEventsPromise, usersPromise, mileageRecordsPromise, invoicesPromise]);
-      
-      // Mettre à jour les états avec les données récupérées
-      setVehicles(vehiclesData);
-      setServiceEvents(serviceEventsData);
-      setUsers(usersData);
-      setMileageRecords(mileageRecordsData);
-      setInvoices(invoicesData);
-      
-      // Générer les activités récentes
-      generateRecentActivities(vehiclesData, serviceEventsData, mileageRecordsData, invoicesData);
-      
+      const response = await authAxios.get('api/v1/dashboard/');
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data?.error?.detail || 'Une erreur est survenue lors du chargement des données');
+      }
+      setDashboard(data.data);
     } catch (err) {
       console.error('Error fetching dashboard data:', err);
       setError(err instanceof Error ? err.message : 'Une erreur est survenue lors du chargement des données');
@@ -151,225 +129,23 @@ const DashboardPage = () => {
     }
   };
   
-  // Fonction pour générer les activités récentes basées sur les données
-  const generateRecentActivities = (
-    vehicles: Vehicle[],
-    services: ServiceEvent[],
-    mileages: MileageRecord[],
-    invoices: Invoice[]
-  ) => {
-    // Extraire les 20 derniers éléments à partir de toutes les sources
-    const activities: { element: Vehicle | ServiceEvent | MileageRecord | Invoice, type: string, date: Date }[] = [];
-    
-    // Ajouter les véhicules récemment ajoutés
-    vehicles.forEach(vehicle => {
-      activities.push({
-        element: vehicle,
-        type: 'vehicle',
-        date: new Date(vehicle.created_at)
-      });
-    });
-    
-    // Ajouter les événements de service récents
-    services.forEach(service => {
-      activities.push({
-        element: service,
-        type: 'service',
-        date: new Date(service.event_date)
-      });
-    });
-    
-    // Ajouter les enregistrements de kilométrage récents
-    mileages.forEach(mileage => {
-      activities.push({
-        element: mileage,
-        type: 'mileage',
-        date: new Date(mileage.recorded_at)
-      });
-    });
-    
-    // Ajouter les factures récentes
-    invoices.forEach(invoice => {
-      activities.push({
-        element: invoice,
-        type: 'invoice',
-        date: new Date(invoice.created_at)
-      });
-    });
-    
-    // Trier les activités par date (les plus récentes d'abord)
-    activities.sort((a, b) => {
-      // Valider les dates avant de les comparer
-      const dateA = isValidDate(a.date) ? a.date.getTime() : 0;
-      const dateB = isValidDate(b.date) ? b.date.getTime() : 0;
-      return dateB - dateA;
-    });
-    
-    // Fonction helper pour vérifier si une date est valide
-    function isValidDate(date: Date): boolean {
-      return date instanceof Date && !isNaN(date.getTime());
-    }
-    
-    // Convertir en format d'activité récente pour l'affichage
-    const recentActivitiesList: RecentActivity[] = activities.slice(0, 10).map((activity, index) => {
-      let description = '';
-      let user = '';
-      let registrationNumber = '';
-      
-      // Vérifier si la date est valide
-      if (!isValidDate(activity.date)) {
-        console.warn('Date invalide détectée:', activity);
-        // Utiliser la date actuelle pour les dates invalides
-        activity.date = new Date();
-      }
-      
-      // Avant le switch, déclarer toutes les variables nécessaires
-      let vehicle: Vehicle;
-      let service: ServiceEvent;
-      let mileage: MileageRecord;
-      let vehicleForMileage: Vehicle | undefined;
-      let invoice: Invoice;
-
-      switch (activity.type) {
-        case 'vehicle':
-          vehicle = activity.element as Vehicle;
-          description = `Nouveau véhicule ajouté : ${vehicle.registration_number}`;
-          user = vehicle.owner_username || 'Admin';
-          break;
-        case 'service':
-          service = activity.element as ServiceEvent;
-          registrationNumber = service.vehicle_info?.registration_number || `ID:${service.vehicle}`;
-          description = `Service ${service.service_type_info?.name || 'ID:' + service.service_type} ${service.status === 'COMPLETED' ? 'complété' : (service.status === 'IN_PROGRESS' ? 'en cours' : 'planifié')} pour ${registrationNumber}`;
-          user = 'Mécanicien';
-          break;
-        case 'mileage':
-          mileage = activity.element as MileageRecord;
-          vehicleForMileage = vehicles.find(v => v.id === mileage.vehicle);
-          registrationNumber = vehicleForMileage?.registration_number || `ID:${mileage.vehicle}`;
-          description = `Kilométrage mis à jour pour ${registrationNumber}: ${mileage.mileage.toLocaleString('fr-FR')} km`;
-          user = mileage.recorded_by_username || (mileage.source === 'CLIENT' ? 'Client' : 'Admin');
-          break;
-        case 'invoice':
-          invoice = activity.element as Invoice;
-          registrationNumber = invoice.vehicle_info?.registration_number || `ID:${invoice.vehicle_id}`;
-          description = `Nouvelle facture ajoutée pour ${registrationNumber}: ${invoice.final_amount.toLocaleString('fr-FR')} DT`;
-          user = 'Manager';
-          break;
-      }
-      
-      // Calculer l'affichage du temps (il y a X minutes/heures/jours)
-      const now = new Date();
-      const diffMs = now.getTime() - activity.date.getTime();
-      const diffMins = Math.floor(diffMs / 60000);
-      const diffHours = Math.floor(diffMins / 60);
-      const diffDays = Math.floor(diffHours / 24);
-      
-      let timeAgo;
-      if (diffMins < 60) {
-        timeAgo = `il y a ${diffMins} minute${diffMins > 1 ? 's' : ''}`;
-      } else if (diffHours < 24) {
-        timeAgo = `il y a ${diffHours} heure${diffHours > 1 ? 's' : ''}`;
-      } else if (diffDays < 30) {
-        timeAgo = `il y a ${diffDays} jour${diffDays > 1 ? 's' : ''}`;
-      } else {
-        // S'assurer que la date est valide avant d'appeler toISOString()
-        timeAgo = isValidDate(activity.date) 
-          ? formatDate(activity.date.toISOString()) 
-          : 'date inconnue';
-      }
-      
-      return {
-        id: index,
-        description,
-        user,
-        time: timeAgo
-      };
-    });
-    
-    setRecentActivities(recentActivitiesList);
-  };
-  
   // Charger les données au montage du composant
   useEffect(() => {
     fetchDashboardData();
   }, [token, isAuthenticated]);
-  
-  // Calculer les statistiques pour les cartes
-  const calculateStats = () => {
-    // Stats des véhicules
-    const totalVehicles = vehicles.length;
-    const lastMonthDate = new Date();
-    lastMonthDate.setMonth(lastMonthDate.getMonth() - 1);
-    const vehiclesLastMonth = vehicles.filter(v => new Date(v.created_at) > lastMonthDate).length;
-    const vehicleGrowthRate = totalVehicles > 0 ? (vehiclesLastMonth / totalVehicles) * 100 : 0;
-    
-    // Stats des services
-    const pendingServices = serviceEvents.filter(s => s.status !== 'COMPLETED').length;
-    const urgentServices = serviceEvents.filter(s => {
-      const eventDate = new Date(s.event_date);
-      const now = new Date();
-      const diffDays = Math.floor((eventDate.getTime() - now.getTime()) / (1000 * 60 * 60 * 24));
-      return s.status !== 'COMPLETED' && diffDays <= 3;  // Considérer urgent si dans les 3 jours
-    }).length;
-    
-    // Stats des clients
-    const totalClients = users.length;
-    const lastWeekDate = new Date();
-    lastWeekDate.setDate(lastWeekDate.getDate() - 7);
-    const clientsLastWeek = users.filter(u => u.date_joined && new Date(u.date_joined) > lastWeekDate).length;
-    
-    // Stats des rendez-vous
-    const today = new Date();
-    today.setHours(0, 0, 0, 0);
-    const tomorrow = new Date(today);
-    tomorrow.setDate(tomorrow.getDate() + 1);
-    
-    const upcomingAppointments = serviceEvents.filter(s => {
-      const eventDate = new Date(s.event_date);
-      eventDate.setHours(0, 0, 0, 0);
-      return s.status === 'SCHEDULED' && eventDate >= today;
-    }).length;
-    
-    const todayAppointments = serviceEvents.filter(s => {
-      const eventDate = new Date(s.event_date);
-      eventDate.setHours(0, 0, 0, 0);
-      return s.status !== 'COMPLETED' && eventDate.getTime() === today.getTime();
-    }).length;
-    
-    const avgMileage = mileageRecords.length > 0 
-      ? mileageRecords.reduce((sum, record) => sum + record.mileage, 0) / mileageRecords.length
-      : 0;
 
-    const totalInvoiceAmount = invoices.length > 0
-      ? invoices.reduce((sum, invoice) => sum + invoice.final_amount, 0)
-      : 0;
+  const recentActivities: RecentActivity[] = (dashboard?.recent_activity || []).map(describeActivity);
 
-    return {
-      totalVehicles,
-      vehicleGrowthRate,
-      pendingServices,
-      urgentServices,
-      totalClients,
-      clientsLastWeek,
-      upcomingAppointments,
-      todayAppointments,
-      avgMileage,
-      totalInvoiceAmount
-    };
+  const stats = {
+    totalVehicles: dashboard?.vehicles.total ?? 0,
+    vehicleGrowthRate: dashboard?.vehicles.growth_rate ?? 0,
+    pendingServices: dashboard?.service_events.upcoming ?? 0,
+    urgentServices: dashboard?.service_events.urgent ?? 0,
+    totalClients: dashboard?.customers.total ?? 0,
+    clientsLastWeek: dashboard?.customers.joined_last_week ?? 0,
+    upcomingAppointments: dashboard?.service_events.upcoming ?? 0,
+    todayAppointments: dashboard?.service_events.today ?? 0,
   };
-  
-  const stats = isLoading ? {
-    totalVehicles: 0,
-    vehicleGrowthRate: 0,
-    pendingServices: 0,
-    urgentServices: 0,
-    totalClients: 0,
-    clientsLastWeek: 0,
-    upcomingAppointments: 0,
-    todayAppointments: 0,
-    avgMileage: 0,
-    totalInvoiceAmount: 0
-  } : calculateStats();
 
   return (
     <div className="space-y-6 p-6 bg-background text-primary min-h-screen">
@@ -24,6 +24,7 @@ import { formatDate } from '@/utils/formatters'; // Assuming this utility exists
 // Define the Invoice interface based on the actual API response
 interface Invoice {
   id: number;
+import { fetchAllPages } from '@/utils/pagination';
   // Field names with both French and English possibilities
   vehicule_id?: number;
   vehicle_id?: number;
@@ -100,23 +101,8 @@ const FacturesPage = () => {
     setError(null);
     
     try {
-      const response = await authAxios.get('api/v1/invoices/');
-
-      // Check if we got JSON back
-      const contentType = response.headers.get('content-type');
-      if (!contentType || !contentType.includes('application/json')) {
-        throw new Error('Réponse du serveur non valide (attendu: JSON)');
-      }
-
-      const responseData = await response.json();
-      console.log('API response:', responseData);
-
-      // Extract invoices from nested data field if needed
-      const invoicesData = responseData.data || responseData;
-      
-      if (!Array.isArray(invoicesData)) {
-        throw new Error('Format de réponse API inattendu pour les factures');
-      }
+      // Toutes les pages de la liste
+      const invoicesData = await fetchAllPages(authAxios, 'api/v1/invoices/');
 
       // Log the entire first invoice to see exact structure
       if (invoicesData.length > 0) {
@@ -145,12 +131,7 @@ const FacturesPage = () => {
     if (!token || !isAuthenticated) return;
     setIsVehiclesLoading(true);
     try {
-      const response = await authAxios.get('api/v1/vehicles/');
-      const data = await response.json();
-      const vehiclesData = data.data || data;
-      if (!Array.isArray(vehiclesData)) {
-        throw new Error('Format de réponse API inattendu pour les véhicules');
-      }
+      const vehiclesData = await fetchAllPages(authAxios, 'api/v1/vehicles/');
       setVehicles(vehiclesData);
     } catch (err) {
       console.error('Error fetching vehicles:', err);
@@ -168,16 +149,7 @@ const FacturesPage = () => {
     setServices([]);
     
     try {
-      // Avec Ky, utilisez searchParams pour les paramètres de requête
-      const response = await authAxios.get('api/v1/service-events/', {
-        searchParams: { vehicle_id: vehicleId }
-      });
-      
-      const data = await response.json();
-      const servicesData = data.data || data;
-      if (!Array.isArray(servicesData)) {
-        throw new Error('Format de réponse API inattendu pour les services');
-      }
+      const servicesData = await fetchAllPages(authAxios, 'api/v1/service-events/', { vehicle_id: vehicleId });
       setServices(servicesData);
     } catch (err) {
       console.error('Error fetching services:', err);
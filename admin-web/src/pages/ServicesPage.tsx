@@ -9,6 +9,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogDescription, Di
 import * as z from 'zod';
 import { useForm } from 'react-hook-form';
 import { zodResolver } from '@hookform/resolvers/zod';
+import { fetchAllPages } from '@/utils/pagination';
 
 // Types de base
 interface ServiceEvent {
@@ -128,15 +129,8 @@ const ServicesPage: React.FC = () => {
     if (isLoading || !token || !isAuthenticated) return;
     setError(null);
     setIsDataLoading(true);
-    authAxios.get('api/v1/service-events/')
-      .then(res => res.json())
-      .then((data: { results?: ServiceEvent[]; data?: ServiceEvent[] } | ServiceEvent[]) => {
-        let results: ServiceEvent[] = [];
-        if (Array.isArray(data)) results = data;
-        else if (typeof data === 'object' && 'results' in data && Array.isArray(data.results)) results = data.results;
-        else if (typeof data === 'object' && 'data' in data && Array.isArray(data.data)) results = data.data;
-        setServiceEvents(results);
-      })
+    fetchAllPages<ServiceEvent>(authAxios, 'api/v1/service-events/')
+      .then(setServiceEvents)
       .catch((err: { message?: string }) => {
         setError("Erreur lors du chargement des interventions. " + (err?.message || ''));
       })
@@ -148,20 +142,14 @@ const ServicesPage: React.FC = () => {
     setIsMileageLoading(true);
     setMileageError(null);
     const vehicleId = selectedEvent.vehicle_info && selectedEvent.vehicle_info.id;
-    const queryParam = vehicleId ? `vehicle_id=${vehicleId}` : selectedEvent.vehicle_info?.registration_number ? `vehicle=${encodeURIComponent(selectedEvent.vehicle_info.registration_number)}` : '';
+    const queryParam: Record<string, string | number> | null = vehicleId ? { vehicle_id: vehicleId } : selectedEvent.vehicle_info?.registration_number ? { vehicle: selectedEvent.vehicle_info.registration_number } : null;
     if (!queryParam) {
       setMileageError('Impossible de déterminer le véhicule pour le suivi kilométrique.');
       setIsMileageLoading(false);
       return;
     }
-    authAxios.get(`api/v1/mileage-records/?${queryParam}`)
-      .then(res => res.json())
-      .then((data: { data?: MileageRecord[] } | MileageRecord[]) => {
-        let records: MileageRecord[] = [];
-        if (Array.isArray(data)) records = data;
-        else if (typeof data === 'object' && 'data' in data && Array.isArray(data.data)) records = data.data;
-        setMileageRecords(records);
-      })
+    fetchAllPages<MileageRecord>(authAxios, 'api/v1/mileage-records/', queryParam)
+      .then(setMileageRecords)
       .catch(() => {
         setMileageError('Erreur lors du chargement du suivi kilométrique.');
       })
@@ -178,16 +166,8 @@ const ServicesPage: React.FC = () => {
       return;
     }
     Promise.all([
-      authAxios.get('api/v1/vehicles/').then(res => res.json()).then((data: VehicleListItem[] | { data?: VehicleListItem[] }) => {
-        if (Array.isArray(data)) return data;
-        if (typeof data === 'object' && 'data' in data && Array.isArray(data.data)) return data.data;
-        return [];
-      }),
-      authAxios.get('api/v1/service-types/').then(res => res.json()).then((data: ServiceTypeItem[] | { data?: ServiceTypeItem[] }) => {
-        if (Array.isArray(data)) return data;
-        if (typeof data === 'object' && 'data' in data && Array.isArray(data.data)) return data.data;
-        return [];
-      })
+      fetchAllPages<VehicleListItem>(authAxios, 'api/v1/vehicles/'),
+      fetchAllPages<ServiceTypeItem>(authAxios, 'api/v1/service-types/')
     ])
       .then(([v, t]) => {
         setVehiclesList(v);
@@ -293,15 +273,8 @@ const ServicesPage: React.FC = () => {
       setIsAddModalOpen(false);
       form.reset();
       setIsDataLoading(true);
-      authAxios.get('api/v1/service-events/')
-        .then(res => res.json())
-        .then((data: { results?: ServiceEvent[]; data?: ServiceEvent[] } | ServiceEvent[]) => {
-          let results: ServiceEvent[] = [];
-          if (Array.isArray(data)) results = data;
-          else if (typeof data === 'object' && 'results' in data && Array.isArray(data.results)) results = data.results;
-          else if (typeof data === 'object' && 'data' in data && Array.isArray(data.data)) results = data.data;
-          setServiceEvents(results);
-        })
+      fetchAllPages<ServiceEvent>(authAxios, 'api/v1/service-events/')
+        .then(setServiceEvents)
         .catch((err: { message?: string }) => {
           setError("Erreur lors du chargement des interventions. " + (err?.message || ''));
         })
@@ -330,15 +303,8 @@ const ServicesPage: React.FC = () => {
       setIsDeleteModalOpen(false);
       setEventToDelete(null);
       setIsDataLoading(true);
-      authAxios.get('api/v1/service-events/')
-        .then(res => res.json())
-        .then((data: { results?: ServiceEvent[]; data?: ServiceEvent[] } | ServiceEvent[]) => {
-          let results: ServiceEvent[] = [];
-          if (Array.isArray(data)) results = data;
-          else if (typeof data === 'object' && 'results' in data && Array.isArray(data.results)) results = data.results;
-          else if (typeof data === 'object' && 'data' in data && Array.isArray(data.data)) results = data.data;
-          setServiceEvents(results);
-        })
+      fetchAllPages<ServiceEvent>(authAxios, 'api/v1/service-events/')
+        .then(setServiceEvents)
         .catch((err: { message?: string }) => {
           setError("Erreur lors du chargement des interventions. " + (err?.message || ''));
         })
@@ -650,17 +616,8 @@ const ServicePredictionModal: React.FC<ServicePredictionModalProps> = ({ open, o
     setLoading(true);
     setError(null);
     setPredictions([]);
-    authAxios.get(`api/v1/service-predictions/?vehicle_id=${vehicle.id}`)
-      .then(res => res.json())
-      .then((data) => {
-        if (Array.isArray(data)) {
-          setPredictions(data);
-        } else if (typeof data === 'object' && 'data' in data && Array.isArray(data.data)) {
-          setPredictions(data.data);
-        } else {
-          setPredictions([]);
-        }
-      })
+    fetchAllPages<ServicePrediction>(authAxios, 'api/v1/service-predictions/', { vehicle_id: vehicle.id })
+      .then(setPredictions)
       .catch(() => setError('Erreur lors du chargement des prédictions.'))
       .finally(() => setLoading(false));
   }, [open, vehicle?.id]);
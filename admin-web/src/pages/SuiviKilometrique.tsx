@@ -20,6 +20,7 @@ import { Label } from '@/components/ui/label';
 import { Input } from '@/components/ui/input';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Textarea } from '@/components/ui/textarea';
+import { fetchAllPages } from '@/utils/pagination';
 
 // Define the MileageRecord interface based on the actual API response
 interface MileageRecord {
@@ -75,21 +76,8 @@ const SuiviKilometrique = () => {
     if (!token || !isAuthenticated) return;
     
     try {
-      const response = await authAxios.get('api/v1/mileage-records/');
-
-      if (!response.ok) {
-        throw new Error(`Erreur lors de la récupération des enregistrements de kilométrage: ${response.statusText}`);
-      }
-
-      const responseData = await response.json();
-      console.log('API response:', responseData);
-
-      // Extract mileage records from nested data field if needed
-      const mileageData = responseData.data || responseData;
-      
-      if (!Array.isArray(mileageData)) {
-        throw new Error('Format de réponse API inattendu pour les enregistrements de kilométrage');
-      }
+      // Toutes les pages de la liste
+      const mileageData = await fetchAllPages(authAxios, 'api/v1/mileage-records/');
 
       // Log the entire first record to see exact structure
       if (mileageData.length > 0) {
@@ -116,10 +104,7 @@ const SuiviKilometrique = () => {
     if (!token || !isAuthenticated) return;
     const fetchVehicles = async () => {
       try {
-        const response = await authAxios.get('/api/v1/vehicles/');
-        if (!response.ok) throw new Error('Erreur lors du chargement des véhicules');
-        const data = await response.json();
-        const arr = data.data || data || [];
+        const arr = await fetchAllPages(authAxios, 'api/v1/vehicles/');
         // Créer le mapping id -> plaque
         const map: Record<number, string> = {};
         arr.forEach((v: any) => { if (v.id && v.registration_number) map[v.id] = v.registration_number; });
@@ -136,13 +121,7 @@ const SuiviKilometrique = () => {
     if (!token || !isAuthenticated) return;
     setIsVehiclesLoading(true);
     try {
-      const response = await authAxios.get('api/v1/vehicles/');
-      if (!response.ok) throw new Error('Erreur lors du chargement des véhicules');
-      const data = await response.json();
-      const vehiclesData = data.data || data;
-      if (!Array.isArray(vehiclesData)) {
-        throw new Error('Format de réponse API inattendu pour les véhicules');
-      }
+      const vehiclesData = await fetchAllPages(authAxios, 'api/v1/vehicles/');
       setVehicles(vehiclesData);
     } catch (err) {
       console.error('Error fetching vehicles:', err);
@@ -11,6 +11,7 @@ import { VehicleDetailsModal } from '@/components/vehicles/VehicleDetailsModal';
 import { useNavigate } from 'react-router-dom';
 import type { Vehicle } from "@/types/vehicle";
 import { ServicePredictionModal } from '@/pages/ServicesPage';
+import { fetchAllPages } from '@/utils/pagination';
 
 // Define the Vehicle interface based on the actual API response
 // interface Vehicle {
@@ -55,13 +56,7 @@ const VehiclesPage = () => {
     setError(null);
     
     try {
-      const response = await authAxios.get('api/v1/vehicles/');
-      const responseData = await response.json();
-      console.log('API response:', responseData);
-      const vehiclesData = responseData.data || responseData;
-      if (!Array.isArray(vehiclesData)) {
-        throw new Error('Format de réponse API inattendu pour les véhicules');
-      }
+      const vehiclesData = await fetchAllPages(authAxios, 'api/v1/vehicles/');
       if (vehiclesData.length > 0) {
         console.log('First vehicle structure (complete):', JSON.stringify(vehiclesData[0], null, 2));
       }
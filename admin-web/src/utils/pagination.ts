@@ -0,0 +1,54 @@
+/**
+ * Lecture complète des listes paginées de l'API ECAR
+ * Les listes sont paginées par curseur : chaque réponse porte au plus `page_size`
+ * éléments et le lien vers la suite dans `metadata.pagination.next`
+ */
+
+// Taille de page maximale acceptée par l'API (KeysetPagination.max_page_size)
+export const MAX_PAGE_SIZE = 500;
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
+
+interface PageClient {
+  get: (url: string, options?: any) => Promise<any>;
+}
+
+/**
+ * Convertit le lien absolu `next` renvoyé par l'API en chemin relatif au `prefixUrl` du client Ky
+ * @param next - URL absolue de la page suivante
+ * @returns Chemin sans slash initial, avec sa query string (curseur compris)
+ */
+export const toClientPath = (next: string): string => {
+  const url = new URL(next, API_BASE_URL);
+  const basePath = new URL(API_BASE_URL).pathname.replace(/\/$/, '');
+  const path = basePath && url.pathname.startsWith(basePath) ? url.pathname.slice(basePath.length) : url.pathname;
+  return path.replace(/^\//, '') + url.search;
+};
+
+/**
+ * Récupère tous les éléments d'une liste en suivant `metadata.pagination.next` jusqu'à la dernière page
+ * @param client - Client Ky authentifié (`authAxios`)
+ * @param url - Chemin de la liste, ex. 'api/v1/vehicles/'
+ * @param searchParams - Filtres de la première requête (repris ensuite dans les liens `next`)
+ * @returns Tous les éléments de la liste
+ */
+export const fetchAllPages = async <T = any>(
+  client: PageClient,
+  url: string,
+  searchParams: Record<string, string | number> = {}
+): Promise<T[]> => {
+  const items: T[] = [];
+  let response = await client.get(url, { searchParams: { page_size: MAX_PAGE_SIZE, ...searchParams } });
+  for (;;) {
+    const body = await response.json();
+    // Liste non paginée : le tableau directement ou dans `data`
+    const page = Array.isArray(body) ? body : body?.data ?? body?.results;
+    if (!Array.isArray(page)) {
+      throw new Error('Format de réponse API inattendu');
+    }
+    items.push(...page);
+    const next: string | null | undefined = body?.metadata?.pagination?.next ?? body?.next;
+    if (!next) return items;
+    response = await client.get(toClientPath(next));
+  }
+};
@@ -1,7 +1,11 @@
+import logging
+
 from rest_framework.views import exception_handler
 from rest_framework.exceptions import ValidationError, PermissionDenied, NotAuthenticated
 from django.utils.translation import gettext_lazy as _ # For potential future i18n setup
 
+logger = logging.getLogger(__name__)
+
 # Basic dictionary for known error string translations
 # This will need to be expanded significantly
 FRENCH_ERRORS = {
@@ -64,7 +68,7 @@ def custom_exception_handler(exc, context):
 
     # Now, override the response data with French messages if possible
     if response is not None:
-        print(f"DEBUG: Original error data: {response.data}") # Log original
+        logger.debug("Original error data: %s", response.data)
         
         if isinstance(response.data, dict):
             # Standard DRF validation errors are dicts {field: [messages]} or {non_field_errors: [...]} 
@@ -75,7 +79,7 @@ def custom_exception_handler(exc, context):
              # Sometimes errors are lists of strings
              response.data = translate_drf_error(response.data)
 
-        print(f"DEBUG: Translated error data: {response.data}") # Log translated
+        logger.debug("Translated error data: %s", response.data)
         
         # Potentially modify structure here later to match {error: {code:..., message:...}}
         # For now, just translate the messages within the existing structure.
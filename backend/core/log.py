@@ -0,0 +1,73 @@
+"""Non-blocking structured logging.
+
+Request threads only put records on an in-memory queue (`QueueHandler`); a single
+`QueueListener` thread formats them as one JSON object per line and writes them to
+the stream. Loggers are level-gated in settings.LOGGING, so with %-style arguments
+(`logger.debug("... %s", value)`) a disabled debug call costs one level check and
+no formatting at all.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# LogRecord attributes that are not `extra` fields
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as one JSON line; `extra={...}` fields become top-level keys."""
+
+    def format(self, record):
+        payload = {
+            'timestamp': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update((key, value) for key, value in vars(record).items() if key not in RESERVED_ATTRS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class NonBlockingStreamHandler(QueueHandler):
+    """QueueHandler feeding a background QueueListener that writes JSON lines to `stream`.
+
+    Usable directly from settings.LOGGING (`'class': 'core.log.NonBlockingStreamHandler'`).
+    The listener is flushed and stopped at interpreter exit.
+    """
+
+    def __init__(self, stream=None, formatter=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(formatter or JSONFormatter())
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        # Merge the arguments now (they may change after the call returns) but leave the
+        # formatting to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def close(self):
+        self.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,191 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keeps full microsecond precision (DjangoJSONEncoder rounds datetimes to milliseconds)."""
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """Keyset (seek) pagination over a composite ordering.
+
+    Pages are fetched with `WHERE (ordering) > (last row)` instead of an OFFSET, so
+    every page is one index range scan whatever its depth. The ordering comes from
+    the view's `keyset_ordering` (or `ordering` here); it must end with a unique
+    field. Fields may be nullable: NULLs sort last in both directions of traversal.
+
+    For NOT NULL fields the ORDER BY has no NULLS clause, so that a `(a, id)`
+    btree serves it in either direction, and the seek condition starts with a
+    plain bound on the first field (`a <= v AND (a < v OR id < w)`) that the
+    index can start its range scan from.
+
+    Cursors are opaque base64 tokens. The response fits CustomJSONRenderer's
+    `metadata.pagination` envelope; `count` is None since counting would scan.
+    """
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = "Curseur invalide."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = [self.parse_field(field) for field in getattr(view, 'keyset_ordering', None) or self.ordering]
+        self.nullable = [self.is_nullable(queryset.model, name) for name, _ in self.fields]
+
+        position, reverse = self.decode_cursor(request)
+        queryset = queryset.order_by(*self.order_expressions(reverse))
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self.row_position(rows[-1])
+            if (has_more and reverse) or (position is not None and not reverse):
+                self.previous_position = self.row_position(rows[0])
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    @staticmethod
+    def parse_field(field):
+        """Returns `(name, descending)` for 'name' or '-name'."""
+        return (field[1:], True) if field.startswith('-') else (field, False)
+
+    @staticmethod
+    def is_nullable(model, name):
+        """Whether the ordering field `name` (which may span relations) can be NULL.
+
+        Names that are not model fields (annotations) are assumed nullable.
+        """
+        parts = name.split('__')
+        try:
+            for part in parts[:-1]:
+                field = model._meta.get_field(part)
+                if field.null: # Outer join
+                    return True
+                model = field.related_model
+            field = model._meta.pk if parts[-1] == 'pk' else model._meta.get_field(parts[-1])
+        except FieldDoesNotExist:
+            return True
+        return field.null
+
+    def order_expressions(self, reverse=False):
+        expressions = []
+        for (name, descending), nullable in zip(self.fields, self.nullable):
+            nulls = {}
+            if nullable:
+                nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+            if descending != reverse:
+                expressions.append(F(name).desc(**nulls))
+            else:
+                expressions.append(F(name).asc(**nulls))
+        return expressions
+
+    def seek_filter(self, position, reverse=False):
+        """Rows strictly after `position` in the ordering (strictly before if `reverse`)."""
+        condition = Q(pk__in=[])
+        # Built from the last field outwards: (f0 beyond v0) OR (f0 = v0 AND (rest))
+        for (name, descending), nullable, value in reversed(list(zip(self.fields, self.nullable, position))):
+            if value is None:
+                # NULLs come last: only other NULLs follow; every non-NULL precedes
+                beyond = Q(pk__in=[]) if not reverse else Q(**{f'{name}__isnull': False})
+                equal = Q(**{f'{name}__isnull': True})
+            else:
+                lookup = 'lt' if descending != reverse else 'gt'
+                beyond = Q(**{f'{name}__{lookup}': value})
+                if nullable and not reverse:
+                    beyond |= Q(**{f'{name}__isnull': True})
+                equal = Q(**{name: value})
+            condition = beyond | (equal & condition)
+
+        (name, descending), nullable, value = self.fields[0], self.nullable[0], position[0]
+        if not nullable and value is not None:
+            # Redundant with the condition, but an index range bound unlike the OR chain
+            lookup = 'lte' if descending != reverse else 'gte'
+            condition = Q(**{f'{name}__{lookup}': value}) & condition
+        return condition
+
+    def row_position(self, row):
+        position = []
+        for name, _ in self.fields:
+            value = row
+            for part in name.split('__'):
+                value = value[part] if isinstance(value, dict) else getattr(value, part)
+            position.append(value)
+        return position
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, cls=CursorEncoder)
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': None,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
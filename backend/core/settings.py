@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -164,11 +165,76 @@ REST_FRAMEWORK = {
         # Add BrowsableAPIRenderer back if you want the browsable API in development
         'rest_framework.renderers.BrowsableAPIRenderer', 
     ),
-    # Add pagination settings later if needed
-    # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    # 'PAGE_SIZE': 10
+    # Keyset pagination on each view's `keyset_ordering` (see core/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    # Each view's `query_filters` and `orderings` (see garage/filters.py)
+    'DEFAULT_FILTER_BACKENDS': ('garage.filters.QueryFilterBackend',),
 }
 
+# Logging: JSON lines written by a background thread (see core/log.py), so request
+# threads never block on stdout. DEBUG records are not even formatted unless
+# DJANGO_LOG_LEVEL=DEBUG (the default while DEBUG is on).
+LOG_LEVEL = os.environ.get('DJANGO_LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'core.log.NonBlockingStreamHandler',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'garage': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
+# Half-life (in days) of the exponentially-weighted daily KM estimate stored on Vehicle:
+# a reading this old weighs half as much as a new one
+DAILY_KM_HALF_LIFE_DAYS = 30
+
+# Maximum number of vehicle forecasts kept in memory by each process (LRU, see garage/forecast.py)
+FORECAST_CACHE_SIZE = 1024
+
+# Odometer telemetry (see garage/telemetry.py): one reading kept per vehicle per window,
+# survivors written in batches of TELEMETRY_BATCH_SIZE rows
+TELEMETRY_RESOLUTION_MINUTES = 60
+TELEMETRY_BATCH_SIZE = 5000
+
+# Mileage readings older than this are compacted into daily summaries by the
+# compact_mileage_history command (see garage/rollup.py)
+MILEAGE_RETENTION_DAYS = 365
+
+# Delta sync (see garage/sync.py): rows per type and per call, seconds of changes sent
+# again on the next call (clock drift; on backends other than PostgreSQL, also the
+# longest a write transaction may stay open), the open transaction age that gets
+# logged (it holds every client's horizon back), and tombstone retention
+# (older tokens trigger a full resync; purge with the purge_tombstones command)
+SYNC_PAGE_SIZE = 500
+SYNC_OVERLAP_SECONDS = 5
+SYNC_MAX_TRANSACTION_SECONDS = 600
+SYNC_TOMBSTONE_RETENTION_DAYS = 90
+
+# Quick search (see garage/search.py): total time allowed to the search queries
+SEARCH_TIME_BUDGET_MS = 300
+
 # Simple JWT settings (optional customization)
 # from datetime import timedelta
 # SIMPLE_JWT = {
@@ -0,0 +1,132 @@
+"""Recent activity feed.
+
+`GET /api/v1/activity/?limit=&before=<cursor>` merges the vehicles, service events,
+mileage records and invoices of the caller (all of them for an admin) into one
+timeline, newest first. The timeline is one `UNION ALL` of `(type, id, at)` rows,
+ordered by `(at, type, id)` descending and cut at `limit`: each branch reads its
+`(timestamp, id)` index backwards from the cursor, and where the database accepts
+it (Postgres) each branch is limited to `limit` rows too. Only the rows of the page
+are then loaded, one query per type present. A page costs O(limit), whatever the
+length of the history.
+
+The cursor is the `(at, type, id)` of the last row of the previous page.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db import connections, router
+from django.db.models import CharField, F, Q, Value
+from django.utils import timezone
+
+from .models import Invoice, MileageRecord, ServiceEvent, Vehicle
+from .sync import scoped_queryset
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def vehicle_item(vehicle):
+    return {'registration_number': vehicle.registration_number, 'value': f"{vehicle.make} {vehicle.model}",
+            'user': vehicle.owner.username}
+
+
+def service_item(event):
+    return {'registration_number': event.vehicle.registration_number, 'value': event.service_type.name, 'user': None}
+
+
+def mileage_item(record):
+    return {'registration_number': record.vehicle.registration_number, 'value': record.mileage,
+            'user': record.recorded_by.username if record.recorded_by else None}
+
+
+def invoice_item(invoice):
+    return {'registration_number': invoice.vehicle.registration_number, 'value': invoice.final_amount,
+            'user': invoice.uploaded_by.username if invoice.uploaded_by else None}
+
+
+# Type -> (model, timestamp field, select_related, item builder). Each timestamp
+# field is indexed with the id (see the models' Meta.indexes).
+ACTIVITY_TYPES = {
+    'vehicle': (Vehicle, 'created_at', ('owner',), vehicle_item),
+    'service': (ServiceEvent, 'created_at', ('vehicle', 'service_type'), service_item),
+    'mileage': (MileageRecord, 'recorded_at', ('vehicle', 'recorded_by'), mileage_item),
+    'invoice': (Invoice, 'uploaded_at', ('vehicle', 'uploaded_by'), invoice_item),
+}
+
+
+def encode_cursor(at, kind, pk):
+    payload = json.dumps([at.isoformat(), kind, pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns `(datetime, type, id)`; raises ValueError for a malformed cursor."""
+    try:
+        moment, kind, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        position = (datetime.fromisoformat(moment), kind, int(pk))
+    except (TypeError, ValueError, AttributeError, UnicodeDecodeError):
+        raise ValueError("Curseur invalide.")
+    if kind not in ACTIVITY_TYPES or timezone.is_naive(position[0]):
+        raise ValueError("Curseur invalide.")
+    return position
+
+
+def before_filter(kind, time_field, position):
+    """Rows of `kind` after `position` in `(at, type, id)` descending order.
+
+    The type is constant within a branch, so the condition reduces to a range on
+    `(time_field, id)` that the branch's index serves.
+    """
+    moment, cursor_kind, pk = position
+    if kind < cursor_kind:
+        return Q(**{f'{time_field}__lte': moment})
+    if kind > cursor_kind:
+        return Q(**{f'{time_field}__lt': moment})
+    return Q(**{f'{time_field}__lt': moment}) | Q(**{time_field: moment, 'pk__lt': pk})
+
+
+def activity_feed(user=None, limit=DEFAULT_LIMIT, before=None):
+    """The activity visible to `user` (everything if None) before the `before` cursor.
+
+    Returns `{'results': [{type, id, at, registration_number, value, user}], 'next': cursor}`
+    where `next` is None on the last page. Raises ValueError for an invalid cursor.
+    """
+    position = decode_cursor(before) if before else None
+    connection = connections[router.db_for_read(Vehicle)]
+    branches = []
+    for kind, (model, time_field, _, _) in ACTIVITY_TYPES.items():
+        queryset = model.objects.all() if user is None else scoped_queryset(model, user)
+        if position is not None:
+            queryset = queryset.filter(before_filter(kind, time_field, position))
+        queryset = queryset.annotate(
+            type=Value(kind, output_field=CharField()), at=F(time_field),
+        ).values_list('type', 'id', 'at')
+        if connection.features.supports_slicing_ordering_in_compound:
+            queryset = queryset.order_by(f'-{time_field}', '-id')[:limit + 1]
+        else:
+            queryset = queryset.order_by()
+        branches.append(queryset)
+    timeline = list(branches[0].union(*branches[1:], all=True).order_by('-at', '-type', '-id')[:limit + 1])
+    has_more = len(timeline) > limit
+    timeline = timeline[:limit]
+
+    ids = {}
+    for kind, pk, _ in timeline:
+        ids.setdefault(kind, []).append(pk)
+    rows = {}
+    for kind, pks in ids.items():
+        model, _, related, _ = ACTIVITY_TYPES[kind]
+        rows[kind] = model.objects.select_related(*related).in_bulk(pks)
+
+    results = []
+    for kind, pk, at in timeline:
+        row = rows[kind].get(pk)
+        if row is None: # Deleted between the two queries
+            continue
+        results.append({'type': kind, 'id': pk, 'at': at, **ACTIVITY_TYPES[kind][3](row)})
+    following = None
+    if has_more:
+        kind, pk, at = timeline[-1]
+        following = encode_cursor(at, kind, pk)
+    return {'results': results, 'next': following}
@@ -1,9 +1,11 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from .models import (
-    Vehicle, MileageRecord, ServiceType, ServiceEvent, 
-    PredictionRule, ServicePrediction, CustomerProfile, Invoice # Import CustomerProfile and Invoice
+    Vehicle, MileageRecord, MileageDailySummary, ServiceType, ServiceEvent, 
+    PredictionRule, ServicePrediction, CustomerProfile, Invoice, # Import CustomerProfile and Invoice
+    PredictionJob, Tombstone, GarageStats
 )
 
 # --- Inline Admin for Customer Profile --- 
@@ -44,15 +46,38 @@ class VehicleAdmin(admin.ModelAdmin):
     list_filter = ('make', 'year', 'owner')
     search_fields = ('make', 'model', 'registration_number', 'vin', 'owner__username', 'owner__email')
     raw_id_fields = ('owner',)
+    readonly_fields = Vehicle.MILEAGE_AGGREGATE_FIELDS # Maintained from the mileage records
+
+class MileageRecordAdminForm(forms.ModelForm):
+    """Reports a decreasing mileage on the form instead of failing in save()."""
+    class Meta:
+        model = MileageRecord
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        vehicle, mileage = cleaned_data.get('vehicle'), cleaned_data.get('mileage')
+        if self.instance._state.adding and vehicle and mileage is not None:
+            if vehicle.latest_mileage is not None and mileage < vehicle.latest_mileage:
+                self.add_error('mileage', self.instance.mileage_error(vehicle.latest_mileage).message_dict['mileage'])
+        return cleaned_data
 
 @admin.register(MileageRecord)
 class MileageRecordAdmin(admin.ModelAdmin):
+    form = MileageRecordAdminForm
     list_display = ('vehicle', 'mileage', 'recorded_at', 'source', 'recorded_by')
     list_filter = ('source', 'recorded_at', 'vehicle__make', 'vehicle__owner') # Filter by owner
     search_fields = ('vehicle__registration_number', 'vehicle__make', 'vehicle__model', 'vehicle__owner__username')
     raw_id_fields = ('vehicle', 'recorded_by')
     readonly_fields = ('recorded_at',)
 
+@admin.register(MileageDailySummary)
+class MileageDailySummaryAdmin(admin.ModelAdmin):
+    list_display = ('vehicle', 'day', 'min_mileage', 'max_mileage', 'reading_count')
+    search_fields = ('vehicle__registration_number', 'vehicle__make', 'vehicle__model', 'vehicle__owner__username')
+    raw_id_fields = ('vehicle',)
+    date_hierarchy = 'day'
+
 @admin.register(ServiceType)
 class ServiceTypeAdmin(admin.ModelAdmin):
     list_display = ('name', 'default_interval_km', 'default_interval_months')
@@ -81,6 +106,13 @@ class ServicePredictionAdmin(admin.ModelAdmin):
     raw_id_fields = ('vehicle', 'service_type')
     readonly_fields = ('generated_at',)
 
+@admin.register(PredictionJob)
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = ('vehicle', 'service_type', 'status', 'attempts', 'run_after', 'enqueued_at', 'last_error')
+    list_filter = ('status',)
+    search_fields = ('vehicle__registration_number', 'service_type__name')
+    raw_id_fields = ('vehicle', 'service_type')
+
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
     list_display = ('vehicle', 'final_amount', 'invoice_date', 'uploaded_at', 'uploaded_by', 'pdf_file')
@@ -90,6 +122,20 @@ class InvoiceAdmin(admin.ModelAdmin):
     readonly_fields = ('uploaded_at',)
     date_hierarchy = 'invoice_date'
 
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ('stream', 'object_id', 'owner', 'deleted_at')
+    list_filter = ('stream',)
+    raw_id_fields = ('owner',)
+    date_hierarchy = 'deleted_at'
+
+@admin.register(GarageStats)
+class GarageStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'vehicles', 'service_events', 'invoices', 'invoiced_amount', 'mileage_records')
+    date_hierarchy = 'day'
+    # Deltas from the signal handlers, folded in by ecar_worker; fix drift with the reconcile_garage_stats command
+    readonly_fields = ('day', 'vehicles', 'service_events', 'invoices', 'invoiced_amount', 'mileage_records')
+
 # Alternatively, simple registration:
 # admin.site.register(Vehicle)
 # admin.site.register(MileageRecord)
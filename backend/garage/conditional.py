@@ -0,0 +1,65 @@
+"""Conditional GET for the read endpoints.
+
+`conditional_get` wraps a viewset's `list` or `retrieve`. Before anything is
+serialized it runs one aggregate query over the user-scoped queryset (the same
+filters as the handler): the row count and the latest `updated_at` of the rows and
+of the related rows they embed (`view.conditional_fields`). From these it derives
+a weak ETag (which also covers the URL, so the page, fields and filters, and the
+user) and a Last-Modified date. A request whose `If-None-Match` matches gets an
+empty 304 Not Modified; otherwise the handler runs and the validators are added
+to its response.
+
+The count makes deletions visible to the ETag. Last-Modified cannot see them, so
+`If-Modified-Since` is only honoured on detail endpoints.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+DEFAULT_CONDITIONAL_FIELDS = ('updated_at',)
+
+
+def compute_validators(view, request, detail):
+    """Returns `(etag, last_modified)` for the rows the view would serve."""
+    queryset = view.filter_queryset(view.get_queryset())
+    if detail:
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        queryset = queryset.filter(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+    fields = getattr(view, 'conditional_fields', DEFAULT_CONDITIONAL_FIELDS)
+    state = queryset.order_by().aggregate(
+        count=Count('pk'), **{f'last_{i}': Max(field) for i, field in enumerate(fields)}
+    )
+    changes = [state[f'last_{i}'] for i in range(len(fields)) if state[f'last_{i}'] is not None]
+    last_modified = max(changes) if changes else None
+
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = '|'.join([
+        str(request.user.pk), request.get_full_path(), getattr(renderer, 'format', ''),
+        str(state['count']), last_modified.isoformat() if last_modified else '',
+    ])
+    return f'W/"{hashlib.md5(key.encode()).hexdigest()}"', last_modified
+
+
+def conditional_get(method):
+    """Decorator for `list` / `retrieve`: ETag, Last-Modified and 304 Not Modified."""
+    detail = method.__name__ == 'retrieve'
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = compute_validators(self, request, detail)
+        # HTTP dates have a one second resolution
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp if detail else None)
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            # Cacheable by the browser only, and always revalidated
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
@@ -0,0 +1,125 @@
+"""KPIs of the admin dashboard, computed in the database.
+
+`dashboard_stats()` answers `GET /api/v1/dashboard/` from the per-day counters of
+GarageStats (see stats.py): the period KPIs are sums over one small row per day,
+in one aggregate query (counts with `FILTER (WHERE ...)` on Postgres) plus the
+monthly invoice buckets, each run again on the GarageStatsDelta rows not folded
+yet and added. The ecar_worker command folds the deltas; if it falls behind, the
+dashboard folds them itself first. Only the customer counts and the average mileage still
+read their tables, and the recent activity is the first page of the activity
+feed. The response stays a few hundred bytes, and its cost does not depend on
+how many records the garage has accumulated.
+"""
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .activity import activity_feed
+from .models import GarageStats, GarageStatsDelta, Vehicle
+from .stats import FOLD_ON_READ_THRESHOLD, fold_stats, pending_deltas
+
+User = get_user_model()
+
+INVOICE_MONTHS = 6
+RECENT_ACTIVITY_SIZE = 10
+URGENT_DAYS = 3
+
+
+def month_start(day, months_back=0):
+    """First day of the month `months_back` months before `day`'s."""
+    index = day.year * 12 + day.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def recent_activity(limit=RECENT_ACTIVITY_SIZE):
+    """The latest vehicles, service events, mileage records and invoices, newest first (see activity.py)."""
+    return activity_feed(limit=limit)['results']
+
+
+def dashboard_stats(now=None):
+    """Returns the dashboard KPIs (see DashboardView for the fields)."""
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    month_ago = today - timedelta(days=30)
+    week_ago = now - timedelta(days=7)
+    urgent_until = today + timedelta(days=URGENT_DAYS)
+
+    def total(field, condition=None):
+        return Sum(field, filter=condition, default=0)
+
+    # Without a worker the deltas pile up: keep the reads below small
+    if pending_deltas() > FOLD_ON_READ_THRESHOLD:
+        fold_stats()
+
+    totals = {
+        'vehicles_total': total('vehicles'),
+        'vehicles_last_month': total('vehicles', Q(day__gte=month_ago)),
+        'events_upcoming': total('service_events', Q(day__gte=today)),
+        'events_today': total('service_events', Q(day=today)),
+        'events_urgent': total('service_events', Q(day__gte=today, day__lte=urgent_until)),
+        'events_last_month': total('service_events', Q(day__lt=today, day__gte=month_ago)),
+        'invoices_total': total('invoices'),
+        'invoiced_total': total('invoiced_amount'),
+        'invoiced_last_month': total('invoiced_amount', Q(day__gte=month_ago)),
+    }
+    stats = GarageStats.objects.aggregate(**totals)
+    for key, value in GarageStatsDelta.objects.aggregate(**totals).items():
+        stats[key] += value
+
+    vehicles = {
+        'total': stats['vehicles_total'],
+        'added_last_month': stats['vehicles_last_month'],
+        'average_mileage': Vehicle.objects.aggregate(value=Avg('latest_mileage'))['value'],
+    }
+    previous = vehicles['total'] - vehicles['added_last_month']
+    vehicles['growth_rate'] = round(100 * vehicles['added_last_month'] / previous, 1) if previous else None
+    if vehicles['average_mileage'] is not None:
+        vehicles['average_mileage'] = round(vehicles['average_mileage'])
+
+    service_events = {
+        'upcoming': stats['events_upcoming'],
+        'today': stats['events_today'],
+        'urgent': stats['events_urgent'],
+        'last_month': stats['events_last_month'],
+    }
+
+    customers = User.objects.filter(groups__name='Customers').aggregate(
+        total=Count('pk'),
+        joined_last_week=Count('pk', filter=Q(date_joined__gte=week_ago)),
+    )
+
+    invoices = {
+        'total': stats['invoices_total'],
+        'total_amount': stats['invoiced_total'],
+        'amount_last_month': stats['invoiced_last_month'],
+    }
+    first_month = month_start(today, INVOICE_MONTHS - 1)
+    buckets = {}
+    for model in (GarageStats, GarageStatsDelta):
+        rows = (
+            model.objects.filter(day__gte=first_month)
+            .annotate(month=TruncMonth('day')).values('month')
+            .annotate(count=Sum('invoices'), amount=Sum('invoiced_amount')).order_by()
+        )
+        for row in rows:
+            bucket = buckets.setdefault(row['month'], {'count': 0, 'amount': 0})
+            bucket['count'] += row['count'] or 0
+            bucket['amount'] += row['amount'] or 0
+    invoices['monthly'] = []
+    for months_back in reversed(range(INVOICE_MONTHS)):
+        month = month_start(today, months_back)
+        bucket = buckets.get(month, {})
+        invoices['monthly'].append({
+            'month': month.strftime('%Y-%m'), 'count': bucket.get('count') or 0, 'amount': bucket.get('amount') or 0,
+        })
+
+    return {
+        'vehicles': vehicles,
+        'service_events': service_events,
+        'customers': customers,
+        'invoices': invoices,
+        'recent_activity': recent_activity(),
+    }
@@ -0,0 +1,160 @@
+"""Sparse fieldsets for read endpoints.
+
+A GET can narrow the representation with `?fields=a,b` (only these fields),
+`?omit=c` (all fields but these) or `?view=compact` (the serializer's
+`Meta.compact_fields`: ids and references, without nested objects). Foreign keys
+of the model can always be requested by name (`vehicle`, `service_type`...) and
+come back as plain ids.
+
+The fields left out are not only dropped from the JSON: `restrict_queryset`
+derives from the kept ones the columns and joins they read, and narrows the
+query with `.only()` / `select_related()`. When a kept field reads something that
+cannot be resolved to model columns (a property, a method field without
+`Meta.method_field_sources`), the query is left untouched.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+COMPACT_VIEW = 'compact'
+
+
+def split_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
+def resolve_source(model, attrs):
+    """Returns `(lookups, relations)` for a field source such as `['owner', 'username']`.
+
+    `lookups` are the `.only()` paths read, `relations` the `select_related()`
+    paths traversed. Returns None if a part is not a forward model field.
+    """
+    path, lookups, relations = [], [], []
+    for position, attr in enumerate(attrs):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        path.append(model_field.name)
+        if model_field.is_relation:
+            if not model_field.concrete or model_field.many_to_many:
+                return None
+            lookups.append('__'.join(path))
+            if position < len(attrs) - 1:
+                relations.append('__'.join(path))
+            model = model_field.related_model
+        elif position < len(attrs) - 1:
+            return None
+        else:
+            lookups.append('__'.join(path))
+    return lookups, relations
+
+
+def serializer_columns(serializer, model):
+    """Returns `(lookups, relations)` read by the readable fields of `serializer`, or None."""
+    lookups, relations = set(), set()
+    method_sources = getattr(getattr(serializer, 'Meta', None), 'method_field_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            if name not in method_sources:
+                return None
+            sources = [source.split('.') for source in method_sources[name]]
+        elif field.source == '*' or isinstance(field, serializers.ListSerializer):
+            return None
+        else:
+            sources = [field.source_attrs]
+        for attrs in sources:
+            resolved = resolve_source(model, attrs)
+            if resolved is None:
+                return None
+            lookups.update(resolved[0])
+            relations.update(resolved[1])
+
+        if isinstance(field, serializers.BaseSerializer):
+            # Nested representation: its own columns, under the relation's path
+            related_path = resolved[0][-1]
+            related_model = model._meta.get_field(field.source_attrs[-1]).related_model
+            nested = serializer_columns(field, related_model)
+            if nested is None:
+                return None
+            relations.add(related_path)
+            lookups.update(f'{related_path}__{lookup}' for lookup in nested[0])
+            relations.update(f'{related_path}__{relation}' for relation in nested[1])
+    return lookups, relations
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin applying `?fields=`, `?omit=` and `?view=compact` to GET requests.
+
+    Only a top-level serializer with a request in its context is narrowed; nested
+    serializers keep their full representation.
+    """
+    sparse = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        params = request.query_params
+        fields, omit, view = split_names(params.get('fields')), split_names(params.get('omit')), params.get('view')
+        if not fields and not omit and view != COMPACT_VIEW:
+            return
+
+        if fields:
+            selected = fields
+        elif view == COMPACT_VIEW:
+            selected = list(self.Meta.compact_fields)
+        else:
+            selected = [name for name, field in self.fields.items() if not field.write_only]
+        available = self.selectable_fields()
+        unknown = [name for name in fields + omit if name not in available]
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': [f"Champ(s) inconnu(s) : {', '.join(unknown)}. Champs disponibles : {', '.join(available)}."]
+            })
+
+        kept = [name for name in selected if name not in omit]
+        for name in kept:
+            if name not in self.fields:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        for name in list(self.fields):
+            if name not in kept and not self.fields[name].write_only:
+                self.fields.pop(name)
+        self.sparse = True
+
+    def selectable_fields(self):
+        """Readable fields, then the model's foreign keys not already exposed under their name."""
+        names = [name for name, field in self.fields.items() if not field.write_only]
+        names += [
+            model_field.name for model_field in self.Meta.model._meta.concrete_fields
+            if model_field.many_to_one and model_field.name not in names
+        ]
+        return names
+
+
+def restrict_queryset(queryset, serializer, extra=()):
+    """Narrows `queryset` to the columns the (sparse) `serializer` reads, plus `extra`."""
+    if not getattr(serializer, 'sparse', False):
+        return queryset
+    columns = serializer_columns(serializer, queryset.model)
+    if columns is None:
+        return queryset
+    lookups, relations = columns
+    queryset = queryset.select_related(None)
+    if relations: # select_related() without arguments would follow every foreign key
+        queryset = queryset.select_related(*sorted(relations))
+    return queryset.only(*sorted(lookups), *extra)
+
+
+class SparseFieldsetViewMixin:
+    """View mixin narrowing the SELECT of `list` and `retrieve` to the requested fields."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in ('list', 'retrieve'):
+            # The pagination reads the ordering columns of each row
+            ordering = [field.lstrip('-') for field in getattr(self, 'keyset_ordering', None) or ()]
+            queryset = restrict_queryset(queryset, self.get_serializer(), extra=ordering)
+        return queryset
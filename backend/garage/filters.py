@@ -0,0 +1,180 @@
+"""Declarative query-string filtering and ordering for the list endpoints.
+
+A view declares its filters and orderings:
+
+    query_filters = {
+        'vehicle_id': Filter('vehicle_id', "Filtrer par ID de véhicule"),
+        'recorded_from': DateBoundFilter('recorded_at', 'from', "..."),
+    }
+    orderings = {'recorded_at': ('recorded_at', 'id')}
+
+and QueryFilterBackend (the default filter backend) applies the parameters present
+in the request to the (already user-scoped) queryset, as plain indexed WHERE
+clauses. `?ordering=name` or `?ordering=-name` picks one of the whitelisted
+orderings; it becomes the view's `keyset_ordering`, so the keyset pagination pages
+along it. Every ordering must end with a unique field. Invalid values are a 400.
+
+Filters apply to collection endpoints only (not to detail routes).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import DateTimeField
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+DATE_ERROR = "Doit être une date (AAAA-MM-JJ) ou une date et heure ISO 8601."
+
+
+def parse_bound(value, upper=False):
+    """Parses a date or ISO 8601 datetime into an aware datetime range bound.
+
+    A lower bound is inclusive. An upper bound is exclusive and includes the whole
+    day for a date, the given instant for a datetime. Raises ValueError.
+    """
+    try:
+        # parse_datetime also accepts a plain date: try the day first
+        day = parse_date(value)
+        moment = parse_datetime(value) if day is None else None
+    except ValueError: # Well-formed but impossible (2024-02-30)
+        day = moment = None
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if upper else day, time.min)
+    elif moment is None:
+        raise ValueError(DATE_ERROR)
+    elif upper:
+        moment += timedelta(microseconds=1)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def parse_positive_int(value):
+    number = int(value)
+    if number < 0:
+        raise ValueError
+    return number
+
+
+def parse_decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError
+
+
+class Filter:
+    """A query parameter applied as `queryset.filter(lookup=parse(value))`."""
+    schema_type = 'integer'
+    error = "Valeur invalide."
+
+    def __init__(self, lookup, description, parse=parse_positive_int, schema_type=None, error=None):
+        self.lookup = lookup
+        self.description = description
+        self.parse = parse
+        self.schema_type = schema_type or self.schema_type
+        self.error = error or self.error
+
+    def apply(self, queryset, value):
+        return queryset.filter(**{self.lookup: self.parse(value)})
+
+    def schema(self):
+        return {'type': self.schema_type}
+
+
+class ChoiceFilter(Filter):
+    """Exact match on one of the field's choices (case-insensitive input)."""
+    schema_type = 'string'
+
+    def __init__(self, lookup, choices, description):
+        self.choices = [value for value, _ in choices]
+        super().__init__(lookup, description, parse=self.parse_choice, error=f"Valeurs possibles : {', '.join(self.choices)}.")
+
+    def parse_choice(self, value):
+        value = value.upper()
+        if value not in self.choices:
+            raise ValueError
+        return value
+
+    def schema(self):
+        return {'type': 'string', 'enum': self.choices}
+
+
+class DateBoundFilter(Filter):
+    """Lower (`'from'`) or upper (`'to'`, inclusive) bound on a date or datetime field."""
+    schema_type = 'string'
+    error = DATE_ERROR
+
+    def __init__(self, field, bound, description):
+        super().__init__(field, description)
+        self.field = field
+        self.upper = bound == 'to'
+
+    def apply(self, queryset, value):
+        moment = parse_bound(value, upper=self.upper)
+        if isinstance(queryset.model._meta.get_field(self.field), DateTimeField):
+            return queryset.filter(**{f'{self.field}__{"lt" if self.upper else "gte"}': moment})
+        # Date field: the day of the bound, in the current time zone
+        if self.upper:
+            return queryset.filter(**{f'{self.field}__lte': timezone.localtime(moment - timedelta(microseconds=1)).date()})
+        return queryset.filter(**{f'{self.field}__gte': timezone.localtime(moment).date()})
+
+    def schema(self):
+        return {'type': 'string', 'format': 'date'}
+
+
+class QueryFilterBackend(BaseFilterBackend):
+    """Applies the view's `query_filters` and `orderings` (see module docstring)."""
+    ordering_param = 'ordering'
+
+    def applies_to(self, view):
+        return not getattr(view, 'detail', False)
+
+    def filter_queryset(self, request, queryset, view):
+        if not self.applies_to(view):
+            return queryset
+        errors = {}
+        for name, query_filter in (getattr(view, 'query_filters', None) or {}).items():
+            value = request.query_params.get(name)
+            if value in (None, ''):
+                continue
+            try:
+                queryset = query_filter.apply(queryset, value)
+            except (TypeError, ValueError):
+                errors[name] = [query_filter.error]
+
+        orderings = getattr(view, 'orderings', None) or {}
+        requested = request.query_params.get(self.ordering_param)
+        ordering = None
+        if requested and orderings:
+            fields = orderings.get(requested.lstrip('-'))
+            if fields is None:
+                allowed = ', '.join(f'{name}, -{name}' for name in orderings)
+                errors[self.ordering_param] = [f"Tri inconnu. Valeurs possibles : {allowed}."]
+            else:
+                descending = requested.startswith('-')
+                ordering = tuple(f'-{field}' if descending else field for field in fields)
+        if errors:
+            raise ValidationError(errors)
+        if ordering is not None:
+            # Read by KeysetPagination (and the sparse fieldsets) for this request
+            view.keyset_ordering = ordering
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                'name': name, 'required': False, 'in': 'query',
+                'description': query_filter.description, 'schema': query_filter.schema(),
+            }
+            for name, query_filter in (getattr(view, 'query_filters', None) or {}).items()
+        ]
+        orderings = getattr(view, 'orderings', None)
+        if orderings:
+            parameters.append({
+                'name': self.ordering_param, 'required': False, 'in': 'query',
+                'description': "Tri (préfixe `-` pour l'ordre décroissant)",
+                'schema': {'type': 'string', 'enum': [f'{sign}{name}' for name in orderings for sign in ('', '-')]},
+            })
+        return parameters
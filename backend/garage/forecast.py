@@ -0,0 +1,159 @@
+"""Side-effect-free "as-of" predictions.
+
+`forecast_vehicle` answers "what will be due for this vehicle at date D / mileage M"
+by running the prediction engine (see predictions.py) in memory on the vehicle's
+current inputs: nothing is written and no signal is sent.
+
+Results are memoized in a bounded, per-process LRU cache keyed by the vehicle and a
+fingerprint of all the inputs, read from the database on every call: requested date
+and mileage, stored mileage aggregates and daily KM estimate, number and latest
+`updated_at` of the vehicle's service events, and the active rules. A change made by
+another process (or by a bulk update that sends no signal) therefore changes the key
+instead of relying on an invalidation that only reaches this process.
+`invalidate_vehicle_forecasts`/`clear_forecast_cache`, called from the signal handlers
+once the transaction commits, only free the entries that can no longer be hit.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import PredictionRule, ServiceEvent
+from .predictions import build_predictions, estimate_daily_km, load_prediction_inputs
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class LRUCache:
+    """Thread-safe dict bounded to `maxsize` entries, evicting the least recently used."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, predicate):
+        """Removes the entries whose key matches `predicate`."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+forecast_cache = LRUCache(getattr(settings, 'FORECAST_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+
+
+def invalidate_vehicle_forecasts(vehicle_id):
+    forecast_cache.discard(lambda key: key[0] == vehicle_id)
+
+
+def clear_forecast_cache():
+    forecast_cache.clear()
+
+
+def active_rules():
+    return list(PredictionRule.objects.filter(is_active=True).select_related('service_type').order_by('pk'))
+
+
+def rules_version(rules):
+    """Everything of the active rules that shows in a forecast."""
+    return tuple(
+        (rule.pk, rule.service_type_id, rule.interval_km, rule.interval_months, rule.service_type.name)
+        for rule in rules
+    )
+
+
+def service_history_version(vehicle_id):
+    """Number and latest `updated_at` of the vehicle's service events: any save or
+    delete changes one of them."""
+    history = ServiceEvent.objects.filter(vehicle_id=vehicle_id).aggregate(count=Count('pk'), updated_at=Max('updated_at'))
+    return history['count'], history['updated_at']
+
+
+def projected_mileage(vehicle, avg_km, as_of):
+    """Mileage expected at `as_of` from the latest reading and the daily KM estimate."""
+    mileage = vehicle['latest_mileage'] if vehicle['latest_mileage'] is not None else vehicle['initial_mileage']
+    reading_at = vehicle['latest_mileage_at'] or vehicle['created_at']
+    days = (as_of - timezone.localdate(reading_at)).days
+    if days > 0 and avg_km:
+        mileage += round(avg_km * days)
+    return mileage
+
+
+def forecast_vehicle(vehicle, as_of=None, mileage=None):
+    """Predictions for one Vehicle instance as of `as_of` (today by default) at `mileage`.
+
+    Without `mileage`, the mileage at `as_of` is projected from the latest reading with
+    the daily KM estimate. A cache hit costs two small queries (the rules and the
+    service history fingerprint).
+    """
+    as_of = as_of or timezone.localdate()
+    rules = active_rules()
+    key = (
+        vehicle.pk, as_of, mileage,
+        vehicle.first_mileage, vehicle.first_mileage_at,
+        vehicle.latest_mileage, vehicle.latest_mileage_at, vehicle.daily_km_ewma,
+        service_history_version(vehicle.pk), rules_version(rules),
+    )
+    cached = forecast_cache.get(key)
+    if cached is not None:
+        return cached
+
+    vehicles, last_services = load_prediction_inputs([vehicle.pk])
+    vehicle = vehicles[0]
+    avg_km = estimate_daily_km(vehicle)
+    if mileage is None:
+        mileage = projected_mileage(vehicle, avg_km, as_of)
+
+    service_names = {rule.service_type_id: rule.service_type.name for rule in rules}
+    # Pin the estimate: the first/latest fallback must not see the requested mileage
+    inputs = {**vehicle, 'latest_mileage': mileage, 'daily_km_ewma': avg_km}
+    predictions, _ = build_predictions([inputs], last_services, rules, as_of)
+
+    items = []
+    for prediction in predictions:
+        due_date = prediction.predicted_due_date
+        km_remaining = prediction.predicted_due_mileage - mileage
+        days_remaining = (due_date - as_of).days if due_date else None
+        items.append({
+            'service_type': prediction.service_type_id,
+            'service_type_name': service_names.get(prediction.service_type_id),
+            'predicted_due_mileage': prediction.predicted_due_mileage,
+            'predicted_due_date': due_date,
+            'km_remaining': km_remaining,
+            'days_remaining': days_remaining,
+            'is_due': km_remaining <= 0 or (days_remaining is not None and days_remaining <= 0),
+        })
+    items.sort(key=lambda item: (item['predicted_due_date'] is None, item['predicted_due_date'] or as_of, item['predicted_due_mileage']))
+
+    result = {
+        'vehicle': vehicle['id'],
+        'as_of': as_of,
+        'mileage': mileage,
+        'average_daily_km': avg_km,
+        'predictions': items,
+    }
+    forecast_cache.set(key, result)
+    return result
@@ -0,0 +1,100 @@
+"""Bulk mileage ingestion.
+
+`MileageRecord.save()` runs `full_clean()` (one query), the aggregate UPDATEs and
+the post_save signal for every row. `ingest_mileage_readings` does the same work
+for a whole batch: the vehicles are loaded (and locked) once, readings are grouped
+per vehicle and replayed in chronological order against the stored aggregates in
+memory, the accepted rows are written with `bulk_create` and the new aggregates
+with `bulk_update` (and added to the dashboard counters, see stats.py), and each
+affected vehicle is scheduled for one prediction recompute. A rejected row is reported and does not abort the rest of the batch.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .jobs import schedule_vehicle_recompute
+from .mileage import daily_km_half_life, fold_daily_km
+from .models import MileageRecord, Vehicle
+from .stats import count_created
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BULK_ROWS = 10000
+VEHICLE_STATE_FIELDS = (
+    'first_mileage', 'first_mileage_at', 'latest_mileage', 'latest_mileage_at',
+    'daily_km_ewma', 'daily_km_ewma_mileage', 'daily_km_ewma_at',
+)
+
+
+def fold_reading(state, mileage, recorded_at, half_life_days):
+    """Applies one reading to a vehicle state dict, like `apply_mileage_reading` does in SQL."""
+    # A newer insert wins ties for the latest reading, the existing one for the first
+    if state['latest_mileage_at'] is None or state['latest_mileage_at'] <= recorded_at:
+        state['latest_mileage'], state['latest_mileage_at'] = mileage, recorded_at
+    if state['first_mileage_at'] is None or state['first_mileage_at'] > recorded_at:
+        state['first_mileage'], state['first_mileage_at'] = mileage, recorded_at
+    state['daily_km_ewma'], state['daily_km_ewma_mileage'], state['daily_km_ewma_at'] = fold_daily_km(
+        state['daily_km_ewma'], state['daily_km_ewma_mileage'], state['daily_km_ewma_at'],
+        mileage, recorded_at, half_life_days,
+    )
+
+
+def ingest_mileage_readings(readings, recorded_by=None, source='ADMIN', owner=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Validates and stores readings given as `(row, vehicle_id, mileage, recorded_at)` tuples.
+
+    `row` identifies the reading in the error report. With `owner`, readings for
+    vehicles of other users are rejected. Rows of a vehicle are checked in
+    chronological order: a reading may not be lower than the vehicle's latest one,
+    as in `MileageRecord.clean`. Returns `{'created': n, 'vehicles': n, 'errors': [...]}`
+    where each error is `{'row': row, 'errors': {field: [message]}}`.
+    """
+    errors = []
+    by_vehicle = defaultdict(list)
+    half_life = daily_km_half_life()
+
+    with transaction.atomic():
+        vehicle_ids = sorted({vehicle_id for _, vehicle_id, _, _ in readings})
+        # Locked until commit so concurrent writers cannot interleave readings
+        states = {
+            state['id']: state
+            for state in Vehicle.objects.select_for_update().filter(pk__in=vehicle_ids).order_by('pk').values(
+                'id', 'owner_id', *VEHICLE_STATE_FIELDS
+            )
+        }
+        for row, vehicle_id, mileage, recorded_at in readings:
+            state = states.get(vehicle_id)
+            if state is None:
+                errors.append({'row': row, 'errors': {'vehicle_id': ["Véhicule introuvable."]}})
+            elif owner is not None and state['owner_id'] != owner.pk:
+                errors.append({'row': row, 'errors': {
+                    'vehicle_id': ["Vous ne pouvez ajouter un relevé que pour vos propres véhicules."]
+                }})
+            else:
+                by_vehicle[vehicle_id].append((recorded_at, row, mileage))
+
+        records, changed_states = [], []
+        for vehicle_id, vehicle_readings in by_vehicle.items():
+            state = states[vehicle_id]
+            accepted = 0
+            for recorded_at, row, mileage in sorted(vehicle_readings, key=lambda reading: reading[:2]):
+                latest = state['latest_mileage']
+                if latest is not None and mileage < latest:
+                    errors.append({'row': row, 'errors': {'mileage': [
+                        f'Le kilométrage ({mileage} km) ne peut pas être inférieur au dernier relevé ({latest} km).'
+                    ]}})
+                    continue
+                fold_reading(state, mileage, recorded_at, half_life)
+                records.append(MileageRecord(
+                    vehicle_id=vehicle_id, mileage=mileage, recorded_at=recorded_at,
+                    source=source, recorded_by=recorded_by,
+                ))
+                accepted += 1
+            if accepted:
+                changed_states.append(Vehicle(pk=vehicle_id, **{field: state[field] for field in VEHICLE_STATE_FIELDS}))
+
+        MileageRecord.objects.bulk_create(records, batch_size=batch_size)
+        count_created(records) # bulk_create sends no post_save
+        Vehicle.objects.bulk_update(changed_states, VEHICLE_STATE_FIELDS, batch_size=batch_size)
+        schedule_vehicle_recompute([vehicle.pk for vehicle in changed_states])
+
+    errors.sort(key=lambda error: error['row'])
+    return {'created': len(records), 'vehicles': len(changed_states), 'errors': errors}
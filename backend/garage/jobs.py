@@ -0,0 +1,233 @@
+"""Durable prediction recompute queue.
+
+Signal handlers only call `schedule_vehicle_recompute`: the vehicle ids requested
+during a transaction are collected and deduplicated, then
+`enqueue_vehicle_recompute` upserts one `PredictionJob` row per vehicle once the
+transaction commits (a request that saves a ServiceEvent and two MileageRecords
+queues its vehicle once). `deferred_recomputes` lets bulk code paths hold the
+requests until the end of a block. The `ecar_worker` management command then
+claims ready jobs with `SELECT ... FOR UPDATE SKIP LOCKED` (so several workers can
+run side by side) and feeds them to the set-based engine in batches.
+`enqueue_fleet_recompute` queues whole-fleet requests the same way, so that the API
+never recomputes more than a handful of vehicles inside a request. A PredictionRule
+change queues one job for its service type (`enqueue_service_type_recompute`),
+which the worker runs with `apply_rule_change`. That one spans the fleet: the job
+is leased (RUNNING until `run_after`) in a short transaction, and the recompute
+runs outside it, so that each chunk commits on its own.
+"""
+import threading
+import weakref
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import PredictionJob, Vehicle
+from .predictions import apply_rule_change, recompute_predictions
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+ENQUEUE_BATCH_SIZE = 1000
+# Above this, API recompute requests are queued instead of run in the request
+MAX_INLINE_VEHICLES = 100
+# A service type job whose worker died is claimed again after this
+SERVICE_TYPE_LEASE = timedelta(hours=1)
+
+
+def enqueue_vehicle_recompute(vehicle_ids):
+    """Queues a prediction recompute for each vehicle id. Returns the number of vehicles.
+
+    A vehicle that is already queued keeps a single row; its retry state is reset
+    so that a failed job gets another chance with the new data.
+    """
+    return _enqueue('vehicle', vehicle_ids)
+
+
+def enqueue_service_type_recompute(service_type_ids):
+    """Queues `apply_rule_change` for each service type id. Returns the number of service types."""
+    return _enqueue('service_type', service_type_ids)
+
+
+def _enqueue(target, pks):
+    now = timezone.now()
+    jobs = [
+        PredictionJob(**{f'{target}_id': pk}, status='PENDING', attempts=0, run_after=now, last_error='', enqueued_at=now)
+        for pk in set(pks)
+    ]
+    if not jobs:
+        return 0
+    PredictionJob.objects.bulk_create(
+        jobs,
+        update_conflicts=True,
+        unique_fields=[target],
+        update_fields=['status', 'attempts', 'run_after', 'last_error', 'enqueued_at'],
+        batch_size=ENQUEUE_BATCH_SIZE,
+    )
+    return len(jobs)
+
+
+def enqueue_fleet_recompute(vehicle_ids=None):
+    """Queues a recompute for the given vehicles (all of them if None); unknown ids are ignored.
+
+    Returns the number of vehicles queued.
+    """
+    vehicles = Vehicle.objects.all() if vehicle_ids is None else Vehicle.objects.filter(pk__in=vehicle_ids)
+    return enqueue_vehicle_recompute(vehicles.values_list('pk', flat=True))
+
+
+class PendingRecomputes:
+    """Vehicle ids scheduled during one transaction, queued once by `flush` on commit."""
+
+    def __init__(self):
+        self.vehicle_ids = set()
+        self.flushed = False
+
+    def flush(self):
+        self.flushed = True
+        enqueue_vehicle_recompute(self.vehicle_ids)
+
+
+_local = threading.local()
+
+
+def schedule_vehicle_recompute(vehicle_ids, using=None):
+    """Requests a prediction recompute for each vehicle id.
+
+    Inside `deferred_recomputes`, the ids are held until the block exits. Otherwise
+    they are added to the current transaction's pending set, queued once on commit
+    and dropped on rollback; in autocommit mode they are queued immediately.
+    """
+    if not vehicle_ids:
+        return
+    deferred = getattr(_local, 'deferred', None)
+    if deferred:
+        deferred[-1].update(vehicle_ids)
+        return
+
+    connection = transaction.get_connection(using)
+    # The connection only keeps a weak reference: the on_commit callback holds the
+    # pending set, so it goes away when Django discards the callback on rollback of the
+    # transaction (or of the savepoint it was registered in). Ids from a savepoint
+    # rolled back later stay queued, which only costs recomputing unchanged data.
+    pending_ref = getattr(connection, 'pending_recomputes', None)
+    pending = pending_ref() if pending_ref is not None else None
+    if pending is not None and not pending.flushed:
+        pending.vehicle_ids.update(vehicle_ids)
+        return
+    pending = PendingRecomputes()
+    pending.vehicle_ids.update(vehicle_ids)
+    connection.pending_recomputes = weakref.ref(pending)
+    transaction.on_commit(pending.flush, using=using)
+
+
+@contextmanager
+def deferred_recomputes():
+    """Holds the recomputes scheduled inside the block and schedules them once at the end.
+
+    For bulk imports and other code paths that save many readings or events: each
+    vehicle is recomputed once whatever the number of rows. Nothing is scheduled if
+    the block raises. Blocks can be nested; the outermost one does the scheduling.
+    """
+    stack = _local.__dict__.setdefault('deferred', [])
+    vehicle_ids = set()
+    stack.append(vehicle_ids)
+    try:
+        yield vehicle_ids
+    finally:
+        stack.pop()
+    schedule_vehicle_recompute(vehicle_ids)
+
+
+def backoff_delay(attempts):
+    """Exponential backoff: 30s, 60s, 120s... capped at one hour."""
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def _record_failure(job, exc, now):
+    attempts = job.attempts + 1
+    changes = {'attempts': attempts, 'last_error': f"{exc.__class__.__name__}: {exc}"}
+    if attempts >= MAX_ATTEMPTS:
+        changes['status'] = 'FAILED'
+    else:
+        changes.update(status='PENDING', run_after=now + backoff_delay(attempts))
+    # A job re-enqueued (or deleted) while it ran keeps its new state
+    PredictionJob.objects.filter(pk=job.pk, enqueued_at=job.enqueued_at).update(**changes)
+
+
+def run_pending_jobs(batch_size=100):
+    """Claims up to `batch_size` ready jobs and runs them.
+
+    Vehicle jobs stay locked until their batch commits: concurrent workers skip
+    them and a concurrent enqueue for the same vehicle waits, then re-inserts the
+    job after it has been consumed. They are recomputed together; if that fails,
+    they are retried one by one so a single bad vehicle only delays itself.
+
+    Service type jobs span the fleet: they are only leased in the claim transaction,
+    then run one by one outside it, each chunk of `apply_rule_change` committing on
+    its own. A job re-enqueued meanwhile (another rule change) is kept for the next
+    run rather than deleted.
+    Returns `{'processed': n, 'failed': n}`.
+    """
+    stats = {'processed': 0, 'failed': 0}
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            PredictionJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=('PENDING', 'RUNNING'), run_after__lte=now) # RUNNING: lease expired
+            .order_by('run_after')[:batch_size]
+        )
+        if not jobs:
+            return stats
+
+        vehicle_jobs = [job for job in jobs if job.vehicle_id is not None]
+        service_type_jobs = [job for job in jobs if job.vehicle_id is None]
+        PredictionJob.objects.filter(pk__in=[job.pk for job in service_type_jobs]).update(
+            status='RUNNING', run_after=now + SERVICE_TYPE_LEASE
+        )
+        if vehicle_jobs:
+            try:
+                with transaction.atomic():
+                    recompute_predictions(vehicle_ids=[job.vehicle_id for job in vehicle_jobs])
+                    PredictionJob.objects.filter(pk__in=[job.pk for job in vehicle_jobs]).delete()
+                stats['processed'] = len(vehicle_jobs)
+                vehicle_jobs = []
+            except Exception:
+                pass # Isolate the failing vehicle(s) below
+
+        for job in vehicle_jobs:
+            try:
+                with transaction.atomic():
+                    recompute_predictions(vehicle_ids=[job.vehicle_id])
+                    job.delete()
+                stats['processed'] += 1
+            except Exception as exc:
+                _record_failure(job, exc, now)
+                stats['failed'] += 1
+
+    for job in service_type_jobs:
+        try:
+            apply_rule_change(job.service_type_id)
+        except Exception as exc:
+            _record_failure(job, exc, now)
+            stats['failed'] += 1
+            continue
+        PredictionJob.objects.filter(pk=job.pk, enqueued_at=job.enqueued_at).delete()
+        stats['processed'] += 1
+    return stats
+
+
+def queue_depth():
+    """Queue metrics: pending (running included), ready to run now, failed, age of the oldest ready job (seconds)."""
+    now = timezone.now()
+    counts = PredictionJob.objects.aggregate(
+        pending=Count('pk', filter=Q(status__in=('PENDING', 'RUNNING'))),
+        ready=Count('pk', filter=Q(status='PENDING', run_after__lte=now)),
+        failed=Count('pk', filter=Q(status='FAILED')),
+        oldest=Min('enqueued_at', filter=Q(status='PENDING', run_after__lte=now)),
+    )
+    oldest = counts.pop('oldest')
+    counts['oldest_age_seconds'] = (now - oldest).total_seconds() if oldest else 0
+    return counts
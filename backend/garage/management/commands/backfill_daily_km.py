@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from garage.mileage import DEFAULT_CHUNK_SIZE, rebuild_daily_km_estimates
+
+
+class Command(BaseCommand):
+    help = "Recalcule l'estimation pondérée du kilométrage journalier de chaque véhicule en rejouant l'historique des relevés."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vehicle', type=int, action='append', dest='vehicle_ids',
+            help="ID d'un véhicule à recalculer (peut être répété). Par défaut : tous les véhicules.",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f"Nombre de véhicules traités par lot (défaut : {DEFAULT_CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+
+        def report(done):
+            if verbosity >= 1:
+                self.stdout.write(f"{done} véhicules traités")
+
+        updated = rebuild_daily_km_estimates(
+            vehicle_ids=options['vehicle_ids'],
+            chunk_size=options['chunk_size'],
+            progress=report,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} estimations recalculées. Lancez recompute_predictions pour mettre à jour les prédictions."
+        ))
@@ -0,0 +1,88 @@
+import logging
+import statistics
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.log import NonBlockingStreamHandler
+from garage.models import Vehicle
+
+User = get_user_model()
+
+BENCHMARKED_LOGGERS = ('core', 'garage', 'django.request')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la latence des requêtes avec une journalisation synchrone (équivalente aux anciens print()) "
+        "et avec la journalisation non bloquante, en DEBUG et en INFO."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=300,
+            help="Nombre de requêtes par mode (défaut : 300).",
+        )
+        parser.add_argument(
+            '--output',
+            help="Fichier recevant les journaux pendant la mesure (défaut : fichier temporaire).",
+        )
+
+    def handle(self, *args, **options):
+        modes = [
+            ("synchrone DEBUG (avant)", lambda stream: logging.StreamHandler(stream), logging.DEBUG),
+            ("file d'attente DEBUG", lambda stream: NonBlockingStreamHandler(stream), logging.DEBUG),
+            ("file d'attente INFO (production)", lambda stream: NonBlockingStreamHandler(stream), logging.INFO),
+        ]
+        with tempfile.TemporaryFile('w') if not options['output'] else open(options['output'], 'a') as stream:
+            for label, make_handler, level in modes:
+                handler = make_handler(stream)
+                latencies = self.measure(handler, level, options['requests'])
+                if isinstance(handler, NonBlockingStreamHandler):
+                    handler.stop() # Drain the queue before the next mode
+                handler.close()
+                latencies.sort()
+                self.stdout.write(
+                    f"{label} : médiane {statistics.median(latencies) * 1000:.2f} ms, "
+                    f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f} ms"
+                )
+
+    def measure(self, handler, level, count):
+        """Runs `count` requests with `handler` as the only handler of the app loggers."""
+        loggers = [logging.getLogger(name) for name in BENCHMARKED_LOGGERS]
+        saved = [(logger.handlers, logger.level, logger.propagate) for logger in loggers]
+        for logger in loggers:
+            logger.handlers = [handler]
+            logger.setLevel(level)
+            logger.propagate = False
+
+        latencies = []
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(username='benchmark-logging', is_staff=True, is_superuser=True)
+                vehicle = Vehicle.objects.create(
+                    owner=user, make='Bench', model='Log', registration_number='999TU9999', initial_mileage=0
+                )
+                client = APIClient()
+                client.force_authenticate(user=user)
+                requests = [
+                    lambda i: client.get(reverse('current-user')),
+                    lambda i: client.post(reverse('mileagerecord-list'), {'vehicle_id': vehicle.pk, 'mileage': i + 1}, format='json'),
+                    lambda i: client.post(reverse('mileagerecord-list'), {'vehicle_id': vehicle.pk, 'mileage': -1}, format='json'),
+                ]
+                for i in range(count):
+                    started = time.perf_counter()
+                    requests[i % len(requests)](i)
+                    latencies.append(time.perf_counter() - started)
+                transaction.set_rollback(True)
+        finally:
+            for logger, (handlers, logger_level, propagate) in zip(loggers, saved):
+                logger.handlers = handlers
+                logger.setLevel(logger_level)
+                logger.propagate = propagate
+        return latencies
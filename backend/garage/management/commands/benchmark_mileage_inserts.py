@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from garage.models import Vehicle
+
+User = get_user_model()
+
+# Parallel clients contend for the vehicle row lock: their combined rate should stay
+# at least this fraction of one client's. A lost lock or a retry storm falls below.
+MIN_PARALLEL_RATIO = 0.5
+
+
+def post_readings(user, vehicle_id, count, seed):
+    """POSTs `count` random readings for the vehicle. Returns `(accepted, rejected)`."""
+    client = APIClient()
+    client.force_authenticate(user=user)
+    rng = random.Random(seed)
+    accepted = rejected = 0
+    url = reverse('mileagerecord-list')
+    try:
+        for _ in range(count):
+            response = client.post(url, {'vehicle_id': vehicle_id, 'mileage': rng.randint(1, 100000)}, format='json')
+            if response.status_code == 201:
+                accepted += 1
+            elif response.status_code == 400:
+                rejected += 1
+            else:
+                raise AssertionError(f"Unexpected status {response.status_code}: {response.content[:200]}")
+    finally:
+        connections.close_all()
+    return accepted, rejected
+
+
+def post_in_parallel(user, vehicle_id, clients, readings_per_client):
+    """Runs `post_readings` from `clients` threads. Returns `(accepted, rejected, readings per second)`."""
+    results, errors = [], []
+
+    def run(seed):
+        try:
+            results.append(post_readings(user, vehicle_id, readings_per_client, seed))
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=run, args=(seed,)) for seed in range(clients)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+    accepted, rejected = sum(a for a, _ in results), sum(r for _, r in results)
+    return accepted, rejected, (accepted + rejected) / elapsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit d'enregistrement des relevés kilométriques (POST /mileage-records/) pour un même véhicule : "
+        "un client seul (référence), puis plusieurs clients en parallèle. Crée puis supprime un véhicule de test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients', type=int, default=8,
+            help="Nombre de clients en parallèle (défaut : 8).",
+        )
+        parser.add_argument(
+            '--readings', type=int, default=50,
+            help="Nombre de relevés envoyés par client (défaut : 50).",
+        )
+
+    def handle(self, *args, **options):
+        clients, readings = options['clients'], options['readings']
+        user = User.objects.create_user(username='benchmark-mileage', is_staff=True, is_superuser=True)
+        try:
+            rates = []
+            for run, (label, count) in enumerate((("1 client (référence)", 1), (f"{clients} clients", clients))):
+                vehicle = Vehicle.objects.create(
+                    owner=user, make='Bench', model='Insert', registration_number=f'99{run}TU9999', initial_mileage=0
+                )
+                # The same total number of readings in both runs
+                accepted, rejected, rate = post_in_parallel(user, vehicle.pk, count, readings * clients // count)
+                rates.append(rate)
+                self.stdout.write(f"{label} : {rate:.0f} relevés/s ({accepted} acceptés, {rejected} refusés)")
+        finally:
+            user.delete()
+        ratio = rates[1] / rates[0]
+        message = f"Débit parallèle / référence : {ratio:.2f} (minimum attendu : {MIN_PARALLEL_RATIO})"
+        self.stdout.write(self.style.SUCCESS(message) if ratio >= MIN_PARALLEL_RATIO else self.style.ERROR(message))
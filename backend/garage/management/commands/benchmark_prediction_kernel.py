@@ -0,0 +1,72 @@
+import time
+from datetime import date
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from garage.prediction_kernel import predict_due
+from garage.predictions import predict_service
+
+
+def random_inputs(pairs, seed=0):
+    """Synthetic (vehicle, rule) columns with realistic ranges."""
+    rng = np.random.default_rng(seed)
+    today = date.today()
+    base_mileage = rng.integers(0, 300_000, pairs)
+    return {
+        'base_mileage': base_mileage,
+        'base_date': np.datetime64(today, 'D') - rng.integers(0, 5 * 365, pairs).astype('timedelta64[D]'),
+        'current_mileage': base_mileage + rng.integers(0, 40_000, pairs),
+        'avg_daily_km': np.where(rng.random(pairs) < 0.1, 0.0, rng.uniform(1, 150, pairs)),
+        'interval_km': rng.choice([5_000, 10_000, 15_000, 30_000, 60_000], pairs),
+        'interval_months': rng.choice([0, 6, 12, 24], pairs),
+        'current_date': today,
+    }
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit (prédictions/s) du noyau vectorisé de prédiction comparé au calcul scalaire."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pairs', type=int, default=1_000_000,
+            help="Nombre de couples (véhicule, règle) à calculer (défaut : 1 000 000).",
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help="Nombre de mesures du noyau vectorisé, la meilleure est retenue (défaut : 5).",
+        )
+        parser.add_argument(
+            '--scalar-sample', type=int, default=100_000,
+            help="Nombre de couples calculés avec le code scalaire pour comparaison (défaut : 100 000).",
+        )
+
+    def handle(self, *args, **options):
+        pairs = options['pairs']
+        inputs = random_inputs(pairs)
+
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            predict_due(**inputs)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        self.stdout.write(f"Noyau vectorisé : {pairs} prédictions en {best:.3f}s ({pairs / best:,.0f} prédictions/s)")
+
+        sample = min(options['scalar_sample'], pairs)
+        if not sample:
+            return
+        columns = [
+            inputs['interval_km'][:sample].tolist(),
+            inputs['interval_months'][:sample].tolist(),
+            inputs['base_mileage'][:sample].tolist(),
+            inputs['base_date'][:sample].astype(object).tolist(),
+            inputs['current_mileage'][:sample].tolist(),
+            inputs['avg_daily_km'][:sample].tolist(),
+        ]
+        started = time.perf_counter()
+        for interval_km, interval_months, base_mileage, base_date, current_mileage, avg_daily_km in zip(*columns):
+            predict_service(interval_km, interval_months, base_mileage, base_date, current_mileage, avg_daily_km, inputs['current_date'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Calcul scalaire : {sample} prédictions en {elapsed:.3f}s ({sample / elapsed:,.0f} prédictions/s)")
+        self.stdout.write(self.style.SUCCESS(f"Accélération : x{(pairs / best) / (sample / elapsed):.1f}"))
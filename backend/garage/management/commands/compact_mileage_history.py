@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from garage.rollup import DEFAULT_CHUNK_SIZE, compact_mileage_history, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Regroupe les relevés kilométriques plus anciens que la durée de rétention en résumés journaliers "
+        "(minimum, maximum, nombre de relevés) et supprime les relevés bruts. Chaque lot de véhicules est "
+        "validé séparément : la commande peut être interrompue puis relancée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, dest='days',
+            help="Âge (en jours) à partir duquel les relevés sont regroupés (défaut : MILEAGE_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            '--vehicle', type=int, action='append', dest='vehicle_ids',
+            help="ID d'un véhicule à traiter (peut être répété). Par défaut : tous les véhicules.",
+        )
+        parser.add_argument(
+            '--after-vehicle', type=int, default=0,
+            help="Reprend après ce véhicule (dernier ID affiché par une exécution interrompue).",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f"Nombre de véhicules traités par transaction (défaut : {DEFAULT_CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        cutoff = retention_cutoff(options['days'])
+        self.stdout.write(f"Regroupement des relevés antérieurs au {cutoff:%d/%m/%Y}")
+
+        def report(last_vehicle_id, totals):
+            if verbosity >= 1:
+                self.stdout.write(
+                    f"Véhicules jusqu'à #{last_vehicle_id} : {totals['readings']} relevés regroupés "
+                    f"en {totals['summaries']} résumés"
+                )
+
+        totals = compact_mileage_history(
+            cutoff=cutoff,
+            vehicle_ids=options['vehicle_ids'],
+            after=options['after_vehicle'],
+            chunk_size=options['chunk_size'],
+            progress=report,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['readings']} relevés regroupés en {totals['summaries']} résumés journaliers."
+        ))
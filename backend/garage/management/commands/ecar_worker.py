@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from garage.jobs import queue_depth, run_pending_jobs
+from garage.stats import fold_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Traite la file des recalculs de prédictions (tâches PredictionJob) et reporte les variations "
+        "des compteurs du tableau de bord (GarageStatsDelta) dans GarageStats."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Vide la file une seule fois puis s'arrête.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Nombre maximal de tâches réclamées par transaction (défaut : 100).",
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help="Attente en secondes lorsque la file est vide (défaut : 2).",
+        )
+
+    def report_depth(self):
+        depth = queue_depth()
+        self.stdout.write(
+            f"File : {depth['pending']} en attente ({depth['ready']} prêtes, "
+            f"plus ancienne {depth['oldest_age_seconds']:.0f}s), {depth['failed']} en échec"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.report_depth()
+        try:
+            while True:
+                close_old_connections()
+                fold_stats()
+                stats = run_pending_jobs(batch_size=batch_size)
+                if stats['processed'] or stats['failed']:
+                    self.stdout.write(f"{stats['processed']} tâches traitées, {stats['failed']} échecs")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt demandé.")
+        self.report_depth()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from garage.sync import purge_tombstones, tombstone_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les traces de suppression (tombstones) plus anciennes que SYNC_TOMBSTONE_RETENTION_DAYS. "
+        "Les clients dont le jeton de synchronisation est plus ancien refont une synchronisation complète."
+    )
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} traces de suppression de plus de {tombstone_retention().days} jours supprimées."
+        ))
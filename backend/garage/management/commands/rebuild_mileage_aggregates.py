@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from garage.mileage import DEFAULT_CHUNK_SIZE, rebuild_mileage_aggregates
+
+
+class Command(BaseCommand):
+    help = "Reconstruit le premier et le dernier relevé kilométrique stockés sur chaque véhicule à partir de l'historique."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vehicle', type=int, action='append', dest='vehicle_ids',
+            help="ID d'un véhicule à reconstruire (peut être répété). Par défaut : tous les véhicules.",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f"Nombre de véhicules mis à jour par requête (défaut : {DEFAULT_CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild_mileage_aggregates(
+            vehicle_ids=options['vehicle_ids'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"{updated} véhicules reconstruits."))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from garage.predictions import DEFAULT_CHUNK_SIZE, recompute_predictions
+
+
+class Command(BaseCommand):
+    help = "Recalcule la moyenne kilométrique journalière et les prédictions de service de toute la flotte (ou de certains véhicules)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vehicle', type=int, action='append', dest='vehicle_ids',
+            help="ID d'un véhicule à recalculer (peut être répété). Par défaut : tous les véhicules.",
+        )
+        parser.add_argument(
+            '--service-type', type=int, action='append', dest='service_type_ids',
+            help="ID d'un type de service à recalculer (peut être répété). Par défaut : toutes les règles actives.",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f"Nombre de véhicules traités par lot (défaut : {DEFAULT_CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+
+        def report(stats):
+            if verbosity < 1:
+                return
+            rate = stats['predictions'] / stats['elapsed'] if stats['elapsed'] else 0
+            self.stdout.write(
+                f"{stats['vehicles']}/{stats['total']} véhicules, "
+                f"{stats['predictions']} prédictions ({rate:.0f} prédictions/s)"
+            )
+
+        stats = recompute_predictions(
+            vehicle_ids=options['vehicle_ids'],
+            service_type_ids=options['service_type_ids'],
+            chunk_size=options['chunk_size'],
+            progress=report,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Terminé : {stats['vehicles']} véhicules, {stats['predictions']} prédictions "
+            f"({stats['changed']} modifiées, {stats['unchanged']} inchangées), "
+            f"{stats['avg_km_updated']} moyennes mises à jour en {stats['elapsed']:.2f}s."
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from garage.stats import reconcile_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les compteurs journaliers du tableau de bord (GarageStats) à partir des véhicules, "
+        "interventions, factures et relevés kilométriques, et corrige les jours erronés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Affiche les jours erronés sans les corriger.",
+        )
+
+    def handle(self, *args, **options):
+        days = reconcile_stats(dry_run=options['dry_run'])
+        for day in days:
+            self.stdout.write(f"  {day.isoformat()}")
+        verb = "à corriger" if options['dry_run'] else "corrigés"
+        self.stdout.write(self.style.SUCCESS(f"{len(days)} jours {verb}."))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 01:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0008_vehicle_average_daily_km_alter_mileagerecord_source_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('FAILED', 'Échec')], default='PENDING', max_length=10, verbose_name='Statut')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentatives')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Exécuter après')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Dernière erreur')),
+                ('enqueued_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Mis en file le')),
+                ('vehicle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='prediction_job', to='garage.vehicle', verbose_name='Véhicule')),
+            ],
+            options={
+                'verbose_name': 'Tâche de Recalcul',
+                'verbose_name_plural': 'Tâches de Recalcul',
+                'ordering': ['run_after'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='predictionjob_ready_idx')],
+            },
+        ),
+    ]
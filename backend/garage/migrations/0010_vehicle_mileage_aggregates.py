@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 01:47
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# Backfill the aggregates from the existing mileage history
+def backfill_mileage_aggregates(apps, schema_editor):
+    Vehicle = apps.get_model('garage', 'Vehicle')
+    MileageRecord = apps.get_model('garage', 'MileageRecord')
+    first_records = MileageRecord.objects.filter(vehicle=OuterRef('pk')).order_by('recorded_at', 'id')
+    last_records = MileageRecord.objects.filter(vehicle=OuterRef('pk')).order_by('-recorded_at', '-id')
+    Vehicle.objects.update(
+        first_mileage=Subquery(first_records.values('mileage')[:1]),
+        first_mileage_at=Subquery(first_records.values('recorded_at')[:1]),
+        latest_mileage=Subquery(last_records.values('mileage')[:1]),
+        latest_mileage_at=Subquery(last_records.values('recorded_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0009_predictionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='first_mileage',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Premier relevé (km)'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='first_mileage_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Date du premier relevé'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='latest_mileage',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Dernier relevé (km)'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='latest_mileage_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Date du dernier relevé'),
+        ),
+        migrations.RunPython(backfill_mileage_aggregates, migrations.RunPython.noop),
+    ]
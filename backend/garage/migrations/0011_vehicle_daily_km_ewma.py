@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0010_vehicle_mileage_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='daily_km_ewma',
+            field=models.FloatField(blank=True, null=True, verbose_name='Estimation pondérée (km/jour)'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='daily_km_ewma_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Date de l'estimation"),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='daily_km_ewma_mileage',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name="Kilométrage de l'estimation"),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 01:55
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+# Backfill from the current vehicle mileage
+def backfill_km_remaining(apps, schema_editor):
+    Vehicle = apps.get_model('garage', 'Vehicle')
+    ServicePrediction = apps.get_model('garage', 'ServicePrediction')
+    vehicles = Vehicle.objects.filter(pk=OuterRef('vehicle_id'))
+    current_mileage = Subquery(vehicles.values(mileage=Coalesce('latest_mileage', 'initial_mileage'))[:1])
+    ServicePrediction.objects.filter(predicted_due_mileage__isnull=False).update(
+        km_remaining=F('predicted_due_mileage') - current_mileage
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0011_vehicle_daily_km_ewma'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprediction',
+            name='km_remaining',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Kilomètres restants'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprediction',
+            index=models.Index(fields=['predicted_due_date', 'km_remaining', 'id'], name='prediction_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprediction',
+            index=models.Index(fields=['km_remaining'], name='prediction_km_remaining_idx'),
+        ),
+        migrations.RunPython(backfill_km_remaining, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0012_serviceprediction_km_remaining'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mileagerecord',
+            name='source',
+            field=models.CharField(choices=[('CUSTOMER', 'Client'), ('ADMIN', 'Admin'), ('MECHANIC', 'Mécanicien'), ('INITIAL', 'Initial'), ('SERVICE', 'Service'), ('TELEMETRY', 'Télémétrie')], default='ADMIN', max_length=10, verbose_name='Source'),
+        ),
+    ]
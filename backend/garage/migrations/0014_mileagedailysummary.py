@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 02:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0013_mileagerecord_telemetry_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MileageDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('min_mileage', models.PositiveIntegerField(verbose_name='Kilométrage minimum')),
+                ('max_mileage', models.PositiveIntegerField(verbose_name='Kilométrage maximum')),
+                ('reading_count', models.PositiveIntegerField(verbose_name='Nombre de relevés')),
+                ('first_recorded_at', models.DateTimeField(verbose_name='Premier relevé')),
+                ('last_recorded_at', models.DateTimeField(verbose_name='Dernier relevé')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mileage_summaries', to='garage.vehicle', verbose_name='Véhicule')),
+            ],
+            options={
+                'verbose_name': 'Résumé Journalier de Kilométrage',
+                'verbose_name_plural': 'Résumés Journaliers de Kilométrage',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('vehicle', 'day'), name='unique_mileage_summary_per_vehicle_day')],
+            },
+        ),
+    ]
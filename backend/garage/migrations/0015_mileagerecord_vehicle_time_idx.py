@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 02:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0014_mileagedailysummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mileagerecord',
+            index=models.Index(fields=['vehicle', 'recorded_at', 'id'], name='mileage_vehicle_time_idx'),
+        ),
+    ]
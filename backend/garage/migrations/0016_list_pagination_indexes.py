@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 02:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0015_mileagerecord_vehicle_time_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['uploaded_at', 'id'], name='invoice_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mileagerecord',
+            index=models.Index(fields=['recorded_at', 'id'], name='mileage_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceevent',
+            index=models.Index(fields=['event_date', 'id'], name='serviceevent_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['created_at', 'id'], name='vehicle_created_idx'),
+        ),
+    ]
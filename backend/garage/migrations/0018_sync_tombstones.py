@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-17 02:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0017_change_tracking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stream', models.CharField(max_length=30, verbose_name="Type d'objet")),
+                ('object_id', models.BigIntegerField(verbose_name="ID de l'objet")),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de suppression')),
+            ],
+            options={
+                'verbose_name': 'Suppression',
+                'verbose_name_plural': 'Suppressions',
+                'ordering': ['-deleted_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['updated_at', 'id'], name='invoice_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mileagerecord',
+            index=models.Index(fields=['updated_at', 'id'], name='mileage_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceevent',
+            index=models.Index(fields=['updated_at', 'id'], name='serviceevent_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['updated_at', 'id'], name='vehicle_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propriétaire'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['owner', 'deleted_at', 'id'], name='tombstone_owner_time_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-17 02:28
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+# `registration_number__istartswith` is `UPPER(registration_number::text) LIKE 'X%'`:
+# a prefix scan needs an expression index with text_pattern_ops (Postgres only)
+def create_plate_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS vehicle_plate_prefix_idx '
+            'ON garage_vehicle (UPPER(registration_number::text) text_pattern_ops)'
+        )
+
+
+def drop_plate_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS vehicle_plate_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0018_sync_tombstones'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['vehicle', 'uploaded_at', 'id'], name='invoice_vehicle_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['invoice_date', 'id'], name='invoice_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['final_amount', 'id'], name='invoice_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mileagerecord',
+            index=models.Index(fields=['source', 'recorded_at', 'id'], name='mileage_source_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceevent',
+            index=models.Index(fields=['vehicle', 'event_date', 'id'], name='serviceevent_vehicle_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceevent',
+            index=models.Index(fields=['service_type', 'event_date', 'id'], name='serviceevent_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='vehicle_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(django.db.models.functions.text.Upper('make'), django.db.models.functions.text.Upper('model'), models.F('year'), name='vehicle_make_model_idx'),
+        ),
+        migrations.RunPython(create_plate_prefix_index, drop_plate_prefix_index),
+    ]
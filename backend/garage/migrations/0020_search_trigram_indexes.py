@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+# Trigram GIN indexes for garage/search.py, on the expressions the lookups compile to
+# on Postgres: `icontains` is `UPPER(col::text) LIKE UPPER('%q%')`. Other databases
+# (SQLite in tests) fall back to prefix matches on the plain indexes.
+TRIGRAM_INDEXES = {
+    'vehicle_plate_trgm_idx': ('garage_vehicle', 'UPPER(registration_number::text)'),
+    'vehicle_vin_trgm_idx': ('garage_vehicle', 'UPPER(vin::text)'),
+    'vehicle_make_trgm_idx': ('garage_vehicle', 'UPPER(make::text)'),
+    'vehicle_model_trgm_idx': ('garage_vehicle', 'UPPER(model::text)'),
+    'user_username_trgm_idx': ('auth_user', 'UPPER(username::text)'),
+    'user_first_name_trgm_idx': ('auth_user', 'UPPER(first_name::text)'),
+    'user_last_name_trgm_idx': ('auth_user', 'UPPER(last_name::text)'),
+    # Phone numbers are compared without their spaces and country code
+    'profile_phone_trgm_idx': ('garage_customerprofile', "REPLACE(REPLACE(phone_number::text, ' ', ''), '+216', '')"),
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, (table, expression) in TRIGRAM_INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (({expression}) gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('garage', '0019_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-17 02:37
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+# Same counts as garage.stats.computed_stats, on the historical models
+def backfill_garage_stats(apps, schema_editor):
+    get = lambda name: apps.get_model('garage', name)
+    stats = defaultdict(lambda: defaultdict(int))
+    queries = (
+        ('vehicles', get('Vehicle').objects.annotate(day=TruncDate('created_at')).values('day').annotate(value=Count('pk'))),
+        ('service_events', get('ServiceEvent').objects.values(day=F('event_date')).annotate(value=Count('pk'))),
+        ('mileage_records', get('MileageRecord').objects.annotate(day=TruncDate('recorded_at')).values('day').annotate(value=Count('pk'))),
+        ('mileage_records', get('MileageDailySummary').objects.values('day').annotate(value=Sum('reading_count'))),
+    )
+    for field, query in queries:
+        for row in query.order_by():
+            stats[row['day']][field] += row['value']
+    invoices = get('Invoice').objects.annotate(
+        day=Coalesce('invoice_date', TruncDate('uploaded_at'))
+    ).values('day').annotate(count=Count('pk'), amount=Sum('final_amount')).order_by()
+    for row in invoices:
+        stats[row['day']]['invoices'] += row['count']
+        stats[row['day']]['invoiced_amount'] += row['amount'] or 0
+    GarageStats = get('GarageStats')
+    GarageStats.objects.bulk_create([GarageStats(day=day, **counters) for day, counters in stats.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0020_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GarageStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='Jour')),
+                ('vehicles', models.IntegerField(default=0, verbose_name='Nouveaux véhicules')),
+                ('service_events', models.IntegerField(default=0, verbose_name='Interventions')),
+                ('invoices', models.IntegerField(default=0, verbose_name='Factures')),
+                ('invoiced_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Montant facturé (DT)')),
+                ('mileage_records', models.IntegerField(default=0, verbose_name='Relevés de kilométrage')),
+            ],
+            options={
+                'verbose_name': 'Statistiques du jour',
+                'verbose_name_plural': 'Statistiques par jour',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.RunPython(backfill_garage_stats, migrations.RunPython.noop),
+    ]
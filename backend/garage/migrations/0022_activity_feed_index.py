@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0021_garage_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceevent',
+            index=models.Index(fields=['created_at', 'id'], name='serviceevent_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 02:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0022_activity_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='service_type',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='prediction_job', to='garage.servicetype', verbose_name='Type de Service'),
+        ),
+        migrations.AlterField(
+            model_name='predictionjob',
+            name='vehicle',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='prediction_job', to='garage.vehicle', verbose_name='Véhicule'),
+        ),
+        migrations.AddConstraint(
+            model_name='predictionjob',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('service_type__isnull', True), ('vehicle__isnull', False)), models.Q(('service_type__isnull', False), ('vehicle__isnull', True)), _connector='OR'), name='predictionjob_one_target'),
+        ),
+    ]
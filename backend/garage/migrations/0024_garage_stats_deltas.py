@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0023_service_type_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GarageStatsDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vehicles', models.IntegerField(default=0, verbose_name='Nouveaux véhicules')),
+                ('service_events', models.IntegerField(default=0, verbose_name='Interventions')),
+                ('invoices', models.IntegerField(default=0, verbose_name='Factures')),
+                ('invoiced_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Montant facturé (DT)')),
+                ('mileage_records', models.IntegerField(default=0, verbose_name='Relevés de kilométrage')),
+                ('day', models.DateField(verbose_name='Jour')),
+            ],
+            options={
+                'verbose_name': 'Variation des statistiques',
+                'verbose_name_plural': 'Variations des statistiques',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0024_garage_stats_deltas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='predictionjob',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('FAILED', 'Échec')], default='PENDING', max_length=10, verbose_name='Statut'),
+        ),
+    ]
@@ -0,0 +1,232 @@
+"""Mileage aggregates stored on Vehicle.
+
+`Vehicle.first_mileage`/`first_mileage_at` and `latest_mileage`/`latest_mileage_at`
+mirror the first and the latest MileageRecord (ordered by `recorded_at`, then id).
+They are updated in constant time inside the transaction that inserts a reading,
+so the average daily KM, the monotonic-mileage check and the current mileage are
+plain column reads. `rebuild_mileage_aggregates` recomputes them from the history
+(after an edit or a delete, or from the `rebuild_mileage_aggregates` command).
+
+The monotonic-mileage rule is enforced by the same conditional UPDATE that moves
+the latest reading (`... WHERE latest_mileage <= %s`): the row lock it takes
+serializes concurrent inserts for a vehicle, so two readings can never both pass
+a check made against a stale value, and no read is needed before the insert.
+
+`Vehicle.daily_km_ewma` is a streaming estimate of the daily KM: each new reading
+folds the km/day since the previous one into an exponentially-weighted moving
+average whose half-life is the DAILY_KM_HALF_LIFE_DAYS setting, so recent driving
+weighs more than the early history. `daily_km_ewma_mileage`/`daily_km_ewma_at` keep
+the last reading folded in. `rebuild_daily_km_estimates` replays the history (after
+an edit or a delete, or from the `backfill_daily_km` command).
+
+Readings older than the retention age are compacted into MileageDailySummary rows
+(see rollup.py). `iter_mileage_points` merges both tiers into one chronological
+stream, and the rebuilds above read it, so compaction is invisible to them.
+"""
+import heapq
+
+from django.conf import settings
+from django.db.models import Case, Count, DateTimeField, Exists, F, OuterRef, PositiveIntegerField, Q, Subquery, Value, When
+
+from .models import MileageDailySummary, MileageRecord, Vehicle
+from .predictions import iter_vehicle_id_chunks
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_HALF_LIFE_DAYS = 30
+SECONDS_PER_DAY = 86400
+
+
+def daily_km_half_life():
+    return getattr(settings, 'DAILY_KM_HALF_LIFE_DAYS', DEFAULT_HALF_LIFE_DAYS)
+
+
+def fold_daily_km(estimate, last_mileage, last_at, mileage, recorded_at, half_life_days):
+    """One step of the estimator: returns the new `(estimate, mileage, recorded_at)` state.
+
+    The km/day since the previous reading weighs `1 - 0.5 ** (elapsed_days / half_life)`,
+    which keeps irregularly spaced readings consistent. Readings that are not newer than
+    the state (back-dated or duplicates) leave it unchanged.
+    """
+    if last_at is None:
+        return estimate, mileage, recorded_at
+    elapsed_days = (recorded_at - last_at).total_seconds() / SECONDS_PER_DAY
+    if elapsed_days <= 0:
+        return estimate, last_mileage, last_at
+    rate = max(mileage - last_mileage, 0) / elapsed_days
+    if estimate is None:
+        estimate = rate
+    else:
+        estimate += (1 - 0.5 ** (elapsed_days / half_life_days)) * (rate - estimate)
+    return estimate, mileage, recorded_at
+
+
+def apply_mileage_reading(vehicle_id, mileage, recorded_at):
+    """Folds one new reading into the vehicle aggregates and the daily KM estimate.
+
+    Must run in the transaction that inserts the reading, before the insert. Returns
+    False, leaving the vehicle untouched, if `mileage` is lower than the latest mileage.
+    """
+    vehicles = Vehicle.objects.filter(pk=vehicle_id)
+    # Same tie-breaking as ordering by ('-recorded_at', '-id'): a newer insert wins ties
+    is_latest = Q(latest_mileage_at__isnull=True) | Q(latest_mileage_at__lte=recorded_at)
+    # Check and update in one statement; a back-dated reading is checked without moving the latest
+    accepted = vehicles.filter(Q(latest_mileage__isnull=True) | Q(latest_mileage__lte=mileage)).update(
+        latest_mileage=Case(
+            When(is_latest, then=Value(mileage)), default=F('latest_mileage'), output_field=PositiveIntegerField()
+        ),
+        latest_mileage_at=Case(
+            When(is_latest, then=Value(recorded_at)), default=F('latest_mileage_at'), output_field=DateTimeField()
+        ),
+    )
+    if not accepted:
+        return False
+    # ... and by ('recorded_at', 'id'): the existing first reading wins ties
+    vehicles.filter(Q(first_mileage_at__isnull=True) | Q(first_mileage_at__gt=recorded_at)).update(
+        first_mileage=mileage, first_mileage_at=recorded_at
+    )
+    update_daily_km_estimate(vehicle_id, mileage, recorded_at)
+    return True
+
+
+def update_daily_km_estimate(vehicle_id, mileage, recorded_at):
+    """Folds one reading into the daily KM estimate (locks the vehicle row, constant time)."""
+    vehicles = Vehicle.objects.filter(pk=vehicle_id)
+    state = vehicles.select_for_update().values_list('daily_km_ewma', 'daily_km_ewma_mileage', 'daily_km_ewma_at').first()
+    if state is None:
+        return
+    estimate, last_mileage, last_at = fold_daily_km(*state, mileage, recorded_at, daily_km_half_life())
+    if last_at != state[2]:
+        vehicles.update(daily_km_ewma=estimate, daily_km_ewma_mileage=last_mileage, daily_km_ewma_at=last_at)
+
+
+def rebuild_mileage_aggregates(vehicle_ids=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Recomputes the aggregates from MileageRecord for `vehicle_ids` (all vehicles by default).
+
+    Runs one set-based UPDATE per chunk of vehicles. Returns the number of vehicles updated.
+    """
+    first_records = MileageRecord.objects.filter(vehicle=OuterRef('pk')).order_by('recorded_at', 'id')
+    last_records = MileageRecord.objects.filter(vehicle=OuterRef('pk')).order_by('-recorded_at', '-id')
+    aggregates = {
+        'first_mileage': Subquery(first_records.values('mileage')[:1]),
+        'first_mileage_at': Subquery(first_records.values('recorded_at')[:1]),
+        'latest_mileage': Subquery(last_records.values('mileage')[:1]),
+        'latest_mileage_at': Subquery(last_records.values('recorded_at')[:1]),
+    }
+
+    chunks = [vehicle_ids] if vehicle_ids is not None else iter_vehicle_id_chunks(chunk_size)
+    updated = 0
+    for ids in chunks:
+        updated += Vehicle.objects.filter(pk__in=ids).update(**aggregates)
+        apply_summary_aggregates(Vehicle.objects.filter(pk__in=ids))
+    return updated
+
+
+def apply_summary_aggregates(vehicles):
+    """Takes the first/latest reading from the daily summaries where they are older/newer
+    than the remaining MileageRecord rows (two conditional UPDATEs)."""
+    summaries = MileageDailySummary.objects.filter(vehicle=OuterRef('pk'))
+    first = summaries.order_by('day')
+    last = summaries.order_by('-day')
+    vehicles.filter(Exists(summaries)).filter(
+        Q(first_mileage_at__isnull=True) | Q(first_mileage_at__gt=Subquery(first.values('first_recorded_at')[:1]))
+    ).update(
+        first_mileage=Subquery(first.values('min_mileage')[:1]),
+        first_mileage_at=Subquery(first.values('first_recorded_at')[:1]),
+    )
+    vehicles.filter(Exists(summaries)).filter(
+        Q(latest_mileage_at__isnull=True) | Q(latest_mileage_at__lt=Subquery(last.values('last_recorded_at')[:1]))
+    ).update(
+        latest_mileage=Subquery(last.values('max_mileage')[:1]),
+        latest_mileage_at=Subquery(last.values('last_recorded_at')[:1]),
+    )
+
+
+def iter_summary_points(summaries):
+    """Yields `(vehicle_id, mileage, recorded_at)` for the first and last reading of each summarized day."""
+    for vehicle_id, min_mileage, first_at, max_mileage, last_at in summaries:
+        yield vehicle_id, min_mileage, first_at
+        if last_at != first_at:
+            yield vehicle_id, max_mileage, last_at
+
+
+def count_mileage_points(vehicle_ids, start=None, end=None):
+    """Number of points `iter_mileage_points` yields for the same arguments (two queries)."""
+    def in_range(field):
+        condition = Q()
+        if start is not None:
+            condition &= Q(**{f'{field}__gte': start})
+        if end is not None:
+            condition &= Q(**{f'{field}__lt': end})
+        return condition
+
+    readings = MileageRecord.objects.filter(in_range('recorded_at'), vehicle_id__in=vehicle_ids).count()
+    summaries = MileageDailySummary.objects.filter(vehicle_id__in=vehicle_ids).aggregate(
+        first=Count('pk', filter=in_range('first_recorded_at')),
+        last=Count('pk', filter=in_range('last_recorded_at') & ~Q(last_recorded_at=F('first_recorded_at'))),
+    )
+    return readings + summaries['first'] + summaries['last']
+
+
+def iter_mileage_points(vehicle_ids, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Streams the readings of `vehicle_ids` as `(vehicle_id, mileage, recorded_at)`,
+    ordered by vehicle then date, from both MileageRecord and MileageDailySummary.
+
+    A summarized day contributes its first (minimum) and last (maximum) reading.
+    `start`/`end` bound `recorded_at` (inclusive/exclusive).
+    """
+    readings = MileageRecord.objects.filter(vehicle_id__in=vehicle_ids)
+    summaries = MileageDailySummary.objects.filter(vehicle_id__in=vehicle_ids)
+    if start is not None:
+        readings = readings.filter(recorded_at__gte=start)
+        summaries = summaries.filter(last_recorded_at__gte=start)
+    if end is not None:
+        readings = readings.filter(recorded_at__lt=end)
+        summaries = summaries.filter(first_recorded_at__lt=end)
+    readings = readings.order_by('vehicle_id', 'recorded_at', 'id').values_list('vehicle_id', 'mileage', 'recorded_at')
+    summaries = summaries.order_by('vehicle_id', 'day').values_list(
+        'vehicle_id', 'min_mileage', 'first_recorded_at', 'max_mileage', 'last_recorded_at'
+    )
+    points = heapq.merge(
+        iter_summary_points(summaries.iterator(chunk_size=chunk_size)),
+        readings.iterator(chunk_size=chunk_size),
+        key=lambda point: (point[0], point[2]),
+    )
+    for point in points:
+        if (start is None or point[2] >= start) and (end is None or point[2] < end):
+            yield point
+
+
+def rebuild_daily_km_estimates(vehicle_ids=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Replays the whole history of `vehicle_ids` (all vehicles by default) through the estimator.
+
+    The readings are streamed with `.iterator()` in one pass ordered by vehicle then
+    date, so memory stays constant whatever the history size; the states are written
+    back with one bulk_update per chunk of vehicles. `progress`, if given, is called
+    with the running number of vehicles after each chunk. Returns that number.
+    """
+    half_life = daily_km_half_life()
+    chunks = [vehicle_ids] if vehicle_ids is not None else iter_vehicle_id_chunks(chunk_size)
+    updated = 0
+    for ids in chunks:
+        states = {pk: (None, None, None) for pk in ids}
+        current_id, estimate, last_mileage, last_at = None, None, None, None
+        for vehicle_id, mileage, recorded_at in iter_mileage_points(ids, chunk_size=chunk_size):
+            if vehicle_id != current_id:
+                if current_id is not None:
+                    states[current_id] = (estimate, last_mileage, last_at)
+                current_id, estimate, last_mileage, last_at = vehicle_id, None, None, None
+            estimate, last_mileage, last_at = fold_daily_km(estimate, last_mileage, last_at, mileage, recorded_at, half_life)
+        if current_id is not None:
+            states[current_id] = (estimate, last_mileage, last_at)
+
+        Vehicle.objects.bulk_update(
+            [
+                Vehicle(pk=pk, daily_km_ewma=estimate, daily_km_ewma_mileage=last_mileage, daily_km_ewma_at=last_at)
+                for pk, (estimate, last_mileage, last_at) in states.items()
+            ],
+            ['daily_km_ewma', 'daily_km_ewma_mileage', 'daily_km_ewma_at'], batch_size=chunk_size,
+        )
+        updated += len(states)
+        if progress:
+            progress(updated)
+    return updated
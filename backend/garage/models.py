@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Upper
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.conf import settings # To reference AUTH_USER_MODEL
@@ -20,6 +21,16 @@ tunisian_phone_validator = RegexValidator(
     message="Le numéro de téléphone doit être au format tunisien (ex: +216 20 123 456)."
 )
 
+class TrackedQuerySet(models.QuerySet):
+    """QuerySet whose update() (and so bulk_update()) also sets `updated_at`.
+
+    auto_now is only applied by Model.save(); the API's ETag / Last-Modified
+    validators (see garage/conditional.py) rely on `updated_at` changing on every write.
+    """
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
 class Vehicle(models.Model):
     """Represents a vehicle in the garage."""
     owner = models.ForeignKey(
@@ -46,17 +57,55 @@ class Vehicle(models.Model):
         default=None, # Default to None (unknown/not calculated)
         verbose_name="Moyenne Kilométrage Journalier (km/jour)"
     )
+    # Mileage aggregates, maintained by MileageRecord.save() (see mileage.py)
+    first_mileage = models.PositiveIntegerField(null=True, blank=True, verbose_name="Premier relevé (km)")
+    first_mileage_at = models.DateTimeField(null=True, blank=True, verbose_name="Date du premier relevé")
+    latest_mileage = models.PositiveIntegerField(null=True, blank=True, verbose_name="Dernier relevé (km)")
+    latest_mileage_at = models.DateTimeField(null=True, blank=True, verbose_name="Date du dernier relevé")
+    # Exponentially-weighted daily KM estimate and the reading it was last updated with (see mileage.py)
+    daily_km_ewma = models.FloatField(null=True, blank=True, verbose_name="Estimation pondérée (km/jour)")
+    daily_km_ewma_mileage = models.PositiveIntegerField(null=True, blank=True, verbose_name="Kilométrage de l'estimation")
+    daily_km_ewma_at = models.DateTimeField(null=True, blank=True, verbose_name="Date de l'estimation")
     # Add owner relationship if needed, e.g., ForeignKey to User or a Customer model
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TrackedQuerySet.as_manager()
+
+    # Written only by the conditional UPDATEs of mileage.py
+    MILEAGE_AGGREGATE_FIELDS = (
+        'first_mileage', 'first_mileage_at', 'latest_mileage', 'latest_mileage_at',
+        'daily_km_ewma', 'daily_km_ewma_mileage', 'daily_km_ewma_at',
+    )
+
     def __str__(self):
         return f"{self.make} {self.model} ({self.registration_number}) - {self.owner.username}"
 
+    def save(self, *args, **kwargs):
+        """Updates leave the mileage aggregates alone.
+
+        They hold the values read when the instance was loaded: writing them back
+        would undo a reading inserted in the meantime (and let a lower one pass the
+        `latest_mileage <= mileage` guard).
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MILEAGE_AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Véhicule"
         verbose_name_plural = "Véhicules"
         ordering = ['owner', 'make', 'model'] # Order by owner then make/model
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='vehicle_created_idx'), # API list (keyset pagination)
+            models.Index(fields=['updated_at', 'id'], name='vehicle_sync_idx'), # Delta sync (see garage/sync.py)
+            # List filters (see garage/filters.py); the plate prefix index is Postgres-only, see migration 0019
+            models.Index(fields=['owner', 'created_at', 'id'], name='vehicle_owner_created_idx'),
+            models.Index(Upper('make'), Upper('model'), 'year', name='vehicle_make_model_idx'), # make/model__iexact
+        ]
 
 class MileageRecord(models.Model):
     """Represents a mileage reading for a vehicle."""
@@ -66,6 +115,7 @@ class MileageRecord(models.Model):
         ('MECHANIC', 'Mécanicien'),
         ('INITIAL', 'Initial'), 
         ('SERVICE', 'Service'), # Add Service source
+        ('TELEMETRY', 'Télémétrie'), # Pushed by a connected vehicle (see garage/telemetry.py)
     ]
 
     vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='mileage_records', verbose_name="Véhicule")
@@ -73,18 +123,43 @@ class MileageRecord(models.Model):
     recorded_at = models.DateTimeField(default=timezone.now, verbose_name="Date d'enregistrement")
     source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='ADMIN', verbose_name="Source")
     recorded_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, verbose_name="Enregistré par") # Optional link to user who recorded it
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TrackedQuerySet.as_manager()
 
     def clean(self):
-        """Validate that mileage is not less than the previous record for the same vehicle."""
-        latest_record = MileageRecord.objects.filter(vehicle=self.vehicle).order_by('-recorded_at', '-id').first()
-        if latest_record and self.mileage < latest_record.mileage:
-            raise ValidationError({
-                'mileage': f'Le kilométrage ({self.mileage} km) ne peut pas être inférieur au dernier relevé ({latest_record.mileage} km).'
-            })
+        """Validate that an edited mileage is not less than the latest record for the same vehicle.
+
+        New records are checked atomically in save() (see garage.mileage.apply_mileage_reading).
+        """
+        if self._state.adding:
+            return
+        latest_mileage = Vehicle.objects.filter(pk=self.vehicle_id).values_list('latest_mileage', flat=True).first()
+        if latest_mileage is not None and self.mileage < latest_mileage:
+            raise self.mileage_error(latest_mileage)
+
+    def mileage_error(self, latest_mileage):
+        return ValidationError({
+            'mileage': f'Le kilométrage ({self.mileage} km) ne peut pas être inférieur au dernier relevé ({latest_mileage} km).'
+        })
 
     def save(self, *args, **kwargs):
+        from .mileage import apply_mileage_reading, rebuild_daily_km_estimates, rebuild_mileage_aggregates
         self.full_clean() # Call clean() before saving
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            if adding:
+                # Monotonic check and aggregate update in one conditional UPDATE (locks the vehicle row)
+                if not apply_mileage_reading(self.vehicle_id, self.mileage, self.recorded_at):
+                    raise self.mileage_error(
+                        Vehicle.objects.filter(pk=self.vehicle_id).values_list('latest_mileage', flat=True).first()
+                    )
+                super().save(*args, **kwargs)
+            else:
+                super().save(*args, **kwargs)
+                # An edited reading may have been the first or the latest one
+                rebuild_mileage_aggregates([self.vehicle_id])
+                rebuild_daily_km_estimates([self.vehicle_id])
 
     def __str__(self):
         return f"{self.vehicle}: {self.mileage} km at {self.recorded_at.strftime('%d/%m/%Y %H:%M')}"
@@ -93,6 +168,34 @@ class MileageRecord(models.Model):
         verbose_name = "Relevé de Kilométrage"
         verbose_name_plural = "Relevés de Kilométrage"
         ordering = ['-recorded_at'] # Show newest first
+        indexes = [
+            # Per-vehicle history in date order (mileage series, estimate replays)
+            models.Index(fields=['vehicle', 'recorded_at', 'id'], name='mileage_vehicle_time_idx'),
+            models.Index(fields=['recorded_at', 'id'], name='mileage_time_idx'), # API list (keyset pagination)
+            models.Index(fields=['updated_at', 'id'], name='mileage_sync_idx'), # Delta sync (see garage/sync.py)
+            models.Index(fields=['source', 'recorded_at', 'id'], name='mileage_source_time_idx'), # ?source= filter
+        ]
+
+class MileageDailySummary(models.Model):
+    """Daily rollup of MileageRecord rows older than the retention age (see garage/rollup.py)."""
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='mileage_summaries', verbose_name="Véhicule")
+    day = models.DateField(verbose_name="Jour")
+    min_mileage = models.PositiveIntegerField(verbose_name="Kilométrage minimum")
+    max_mileage = models.PositiveIntegerField(verbose_name="Kilométrage maximum")
+    reading_count = models.PositiveIntegerField(verbose_name="Nombre de relevés")
+    first_recorded_at = models.DateTimeField(verbose_name="Premier relevé")
+    last_recorded_at = models.DateTimeField(verbose_name="Dernier relevé")
+
+    def __str__(self):
+        return f"{self.vehicle}: {self.min_mileage}-{self.max_mileage} km le {self.day.strftime('%d/%m/%Y')}"
+
+    class Meta:
+        verbose_name = "Résumé Journalier de Kilométrage"
+        verbose_name_plural = "Résumés Journaliers de Kilométrage"
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['vehicle', 'day'], name='unique_mileage_summary_per_vehicle_day')
+        ]
 
 class ServiceType(models.Model):
     """Represents a type of service offered by the garage."""
@@ -101,6 +204,9 @@ class ServiceType(models.Model):
     # Default interval for rule-based prediction (Phase 1)
     default_interval_km = models.PositiveIntegerField(null=True, blank=True, verbose_name="Intervalle par défaut (km)")
     default_interval_months = models.PositiveIntegerField(null=True, blank=True, verbose_name="Intervalle par défaut (mois)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TrackedQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -120,6 +226,9 @@ class ServiceEvent(models.Model):
     # Link to Invoice model if created later
     # invoice = models.ForeignKey('Invoice', null=True, blank=True, on_delete=models.SET_NULL)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TrackedQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.service_type} for {self.vehicle} on {self.event_date.strftime('%d/%m/%Y')}"
@@ -128,6 +237,14 @@ class ServiceEvent(models.Model):
         verbose_name = "Intervention de Service"
         verbose_name_plural = "Interventions de Service"
         ordering = ['-event_date', '-id']
+        indexes = [
+            models.Index(fields=['event_date', 'id'], name='serviceevent_date_idx'), # API list (keyset pagination)
+            models.Index(fields=['updated_at', 'id'], name='serviceevent_sync_idx'), # Delta sync (see garage/sync.py)
+            models.Index(fields=['created_at', 'id'], name='serviceevent_created_idx'), # Activity feed (see garage/activity.py)
+            # List filters (see garage/filters.py)
+            models.Index(fields=['vehicle', 'event_date', 'id'], name='serviceevent_vehicle_date_idx'),
+            models.Index(fields=['service_type', 'event_date', 'id'], name='serviceevent_type_date_idx'),
+        ]
 
 # For Phase 1: Rule-Based Predictions
 class PredictionRule(models.Model):
@@ -161,8 +278,13 @@ class ServicePrediction(models.Model):
     service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE, related_name='service_predictions')
     predicted_due_date = models.DateField(null=True, blank=True, verbose_name="Date d'échéance prévue")
     predicted_due_mileage = models.PositiveIntegerField(null=True, blank=True, verbose_name="Kilométrage prévu")
+    # Due mileage minus the vehicle mileage when the prediction was computed (negative if overdue)
+    km_remaining = models.IntegerField(null=True, blank=True, verbose_name="Kilomètres restants")
     prediction_source = models.CharField(max_length=10, choices=PREDICTION_SOURCE_CHOICES, default='RULE')
     generated_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True) # Also set by upsert_predictions when a row changes
+
+    objects = TrackedQuerySet.as_manager()
     # Optional: Add confidence score later for ML models
     # confidence_score = models.FloatField(null=True, blank=True)
 
@@ -182,6 +304,57 @@ class ServicePrediction(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['vehicle', 'service_type'], name='unique_prediction_per_vehicle_service')
         ]
+        indexes = [
+            # "Due soon" worklist: range scans in urgency order (see ServicePredictionViewSet.due)
+            models.Index(fields=['predicted_due_date', 'km_remaining', 'id'], name='prediction_due_date_idx'),
+            models.Index(fields=['km_remaining'], name='prediction_km_remaining_idx'),
+        ]
+
+class PredictionJob(models.Model):
+    """Queued request to recompute the predictions of one vehicle, or of one service
+    type across the fleet after a PredictionRule change (see garage/jobs.py).
+
+    There is at most one row per vehicle or service type: enqueueing one that is
+    already queued only refreshes the existing row, so duplicate requests collapse.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'En attente'),
+        ('RUNNING', 'En cours'), # Service type job leased by a worker until run_after
+        ('FAILED', 'Échec'),
+    ]
+    vehicle = models.OneToOneField(
+        Vehicle, on_delete=models.CASCADE, null=True, blank=True, related_name='prediction_job', verbose_name="Véhicule"
+    )
+    service_type = models.OneToOneField(
+        ServiceType, on_delete=models.CASCADE, null=True, blank=True, related_name='prediction_job',
+        verbose_name="Type de Service"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', verbose_name="Statut")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentatives")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Exécuter après")
+    last_error = models.TextField(blank=True, default='', verbose_name="Dernière erreur")
+    enqueued_at = models.DateTimeField(default=timezone.now, verbose_name="Mis en file le")
+
+    def __str__(self):
+        target = f"vehicle {self.vehicle_id}" if self.vehicle_id else f"service type {self.service_type_id}"
+        return f"Recompute job for {target} ({self.status}, {self.attempts} attempts)"
+
+    class Meta:
+        verbose_name = "Tâche de Recalcul"
+        verbose_name_plural = "Tâches de Recalcul"
+        ordering = ['run_after']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='predictionjob_ready_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(vehicle__isnull=False, service_type__isnull=True)
+                    | models.Q(vehicle__isnull=True, service_type__isnull=False)
+                ),
+                name='predictionjob_one_target',
+            )
+        ]
 
 # --- Customer Profile Model --- 
 
@@ -244,6 +417,9 @@ class Invoice(models.Model):
     invoice_date = models.DateField(null=True, blank=True, verbose_name="Date de Facture")
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Date d'Upload")
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='uploaded_invoices', verbose_name="Uploadé par")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TrackedQuerySet.as_manager()
 
     def __str__(self):
         return f"Invoice for {self.vehicle} - {self.uploaded_at.strftime('%Y-%m-%d')}"
@@ -252,3 +428,80 @@ class Invoice(models.Model):
         verbose_name = "Facture"
         verbose_name_plural = "Factures"
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['uploaded_at', 'id'], name='invoice_uploaded_idx'), # API list (keyset pagination)
+            models.Index(fields=['updated_at', 'id'], name='invoice_sync_idx'), # Delta sync (see garage/sync.py)
+            # List filters and orderings (see garage/filters.py)
+            models.Index(fields=['vehicle', 'uploaded_at', 'id'], name='invoice_vehicle_uploaded_idx'),
+            models.Index(fields=['invoice_date', 'id'], name='invoice_date_idx'),
+            models.Index(fields=['final_amount', 'id'], name='invoice_amount_idx'),
+        ]
+
+class Tombstone(models.Model):
+    """Trace of a deleted vehicle, mileage record, service event or invoice.
+
+    Lets the sync endpoint report hard deletes (see garage/sync.py), and vehicles
+    given to another owner, which are gone for the previous one. Rows older than
+    SYNC_TOMBSTONE_RETENTION_DAYS are removed by the purge_tombstones command.
+    """
+    stream = models.CharField(max_length=30, verbose_name="Type d'objet") # Key of the sync response, e.g. 'vehicles'
+    object_id = models.BigIntegerField(verbose_name="ID de l'objet")
+    # No database constraint: the owner may be deleted in the same cascade, and admins still sync the deletion
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False,
+        related_name='+', verbose_name="Propriétaire"
+    )
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="Date de suppression")
+
+    def __str__(self):
+        return f"{self.stream} #{self.object_id} supprimé le {self.deleted_at.strftime('%d/%m/%Y %H:%M')}"
+
+    class Meta:
+        verbose_name = "Suppression"
+        verbose_name_plural = "Suppressions"
+        ordering = ['-deleted_at']
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_time_idx'),
+            models.Index(fields=['owner', 'deleted_at', 'id'], name='tombstone_owner_time_idx'),
+        ]
+
+class DailyCounters(models.Model):
+    """Dashboard counters of one day (see garage/stats.py)."""
+    vehicles = models.IntegerField(default=0, verbose_name="Nouveaux véhicules")
+    service_events = models.IntegerField(default=0, verbose_name="Interventions")
+    invoices = models.IntegerField(default=0, verbose_name="Factures")
+    invoiced_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Montant facturé (DT)")
+    mileage_records = models.IntegerField(default=0, verbose_name="Relevés de kilométrage")
+
+    class Meta:
+        abstract = True
+
+class GarageStats(DailyCounters):
+    """Dashboard counters of one day, with the GarageStatsDelta rows folded in so far (see garage/stats.py).
+
+    Rebuilt from the source rows by the reconcile_garage_stats command.
+    """
+    day = models.DateField(unique=True, verbose_name="Jour")
+
+    def __str__(self):
+        return f"Statistiques du {self.day.strftime('%d/%m/%Y')}"
+
+    class Meta:
+        verbose_name = "Statistiques du jour"
+        verbose_name_plural = "Statistiques par jour"
+        ordering = ['-day']
+
+class GarageStatsDelta(DailyCounters):
+    """Change of a day's counters written by one write, not yet folded into GarageStats.
+
+    Append-only, so that concurrent writers never wait on the row of the day; the
+    ecar_worker command folds them (see garage/stats.py).
+    """
+    day = models.DateField(verbose_name="Jour")
+
+    def __str__(self):
+        return f"Variation du {self.day.strftime('%d/%m/%Y')}"
+
+    class Meta:
+        verbose_name = "Variation des statistiques"
+        verbose_name_plural = "Variations des statistiques"
@@ -0,0 +1,26 @@
+import codecs
+import csv
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """Parses a `text/csv` body with a header row into a list of dicts.
+
+    The stream is decoded incrementally, so the raw body is never duplicated as a
+    string. Empty cells are dropped so optional columns fall back to their defaults.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        try:
+            reader = csv.DictReader(codecs.getreader(encoding)(stream))
+            return [
+                {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                for row in reader
+            ]
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ParseError(f"CSV invalide : {exc}")
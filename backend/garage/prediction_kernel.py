@@ -0,0 +1,62 @@
+"""Vectorized rule-based prediction kernel.
+
+Pure NumPy (no ORM): takes one array element per (vehicle, rule) pair and computes
+all due mileages and due dates in a single pass. It reproduces
+`predictions.predict_service` exactly, which remains the scalar reference:
+
+- due mileage = base mileage + interval_km
+- rule date = base date + interval_months (day clipped to the month end, like
+  relativedelta), never before the current date; no rule date if interval_months is 0
+- estimated date = current date + int(km remaining / avg daily KM) when the average
+  is positive (the current date once the due mileage is reached)
+- due date = earliest of the two, NaT when neither exists
+"""
+import numpy as np
+
+# Last day representable by datetime.date: later estimates overflow in the scalar code
+MAX_DATE = np.datetime64('9999-12-31', 'D')
+NAT = np.datetime64('NaT', 'D')
+
+
+def add_months(dates, months):
+    """`dates + relativedelta(months=months)` for datetime64[D] arrays."""
+    month_start = dates.astype('datetime64[M]')
+    day_index = (dates - month_start.astype('datetime64[D]')).astype(np.int64)
+    target_month = month_start + months.astype('timedelta64[M]')
+    target_start = target_month.astype('datetime64[D]')
+    month_length = ((target_month + 1).astype('datetime64[D]') - target_start).astype(np.int64)
+    return target_start + np.minimum(day_index, month_length - 1)
+
+
+def predict_due(base_mileage, base_date, current_mileage, avg_daily_km, interval_km, interval_months, current_date):
+    """Computes `(due_mileage, due_date)` arrays for aligned input columns.
+
+    `base_mileage`, `current_mileage`, `interval_km` and `interval_months` are integer
+    arrays (0 months meaning no time interval), `avg_daily_km` a float array, `base_date`
+    a datetime64[D] array and `current_date` a scalar date. `due_date` is datetime64[D]
+    with NaT where no date can be predicted.
+    """
+    base_mileage = np.asarray(base_mileage, dtype=np.int64)
+    current_mileage = np.asarray(current_mileage, dtype=np.int64)
+    interval_km = np.asarray(interval_km, dtype=np.int64)
+    interval_months = np.asarray(interval_months, dtype=np.int64)
+    avg_daily_km = np.asarray(avg_daily_km, dtype=np.float64)
+    base_date = np.asarray(base_date, dtype='datetime64[D]')
+    today = np.datetime64(current_date, 'D')
+
+    due_mileage = base_mileage + interval_km
+
+    has_interval = interval_months > 0
+    rule_date = add_months(base_date, np.where(has_interval, interval_months, 0))
+    rule_date = np.where(has_interval, np.maximum(rule_date, today), NAT)
+
+    km_remaining = due_mileage - current_mileage
+    has_avg = avg_daily_km > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = np.where(has_avg & (km_remaining > 0), km_remaining / np.where(has_avg, avg_daily_km, 1.0), 0.0)
+    # Dates past year 9999 raise OverflowError in the scalar code and give no estimate
+    in_range = days <= (MAX_DATE - today).astype(np.int64)
+    offsets = np.where(in_range, days, 0).astype(np.int64).astype('timedelta64[D]')
+    estimated_date = np.where(has_avg & in_range, today + offsets, NAT)
+
+    return due_mileage, np.fmin(rule_date, estimated_date)
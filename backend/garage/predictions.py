@@ -0,0 +1,304 @@
+"""Set-based service prediction engine.
+
+Predictions are refreshed for many vehicles at once: all the inputs of a chunk
+of vehicles are loaded with a couple of grouped queries (the mileage inputs are
+the aggregates stored on Vehicle, see mileage.py), predictions are computed in
+memory by the vectorized kernel (prediction_kernel.py) and written back with
+bulk upserts that skip the rows whose values did not change.
+"""
+import time
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.db import connections, router, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import ServiceEvent, PredictionRule, ServicePrediction, Vehicle
+from .prediction_kernel import predict_due
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def compute_avg_daily_km(first_mileage, first_recorded_at, last_mileage, last_recorded_at):
+    """Average daily KM between the first and the last mileage reading (0 if not enough data)."""
+    if first_recorded_at is None or last_recorded_at is None:
+        return 0
+    delta_km = last_mileage - first_mileage
+    # Compare date parts only to avoid issues with timezones/DST
+    delta_days = (last_recorded_at.date() - first_recorded_at.date()).days
+    if delta_days <= 0 or delta_km < 0: # Avoid division by zero and negative averages
+        return 0
+    return delta_km / delta_days
+
+
+def predict_service(interval_km, interval_months, base_mileage, base_date, current_mileage, avg_daily_km, current_date):
+    """Applies one PredictionRule to a vehicle.
+
+    Returns a `(predicted_due_mileage, predicted_due_date)` tuple. The due date is the
+    earliest of the rule date (base date + interval_months, never in the past) and the
+    date at which the average daily KM reaches the due mileage.
+    """
+    predicted_mileage = base_mileage + interval_km
+
+    rule_date = None
+    if interval_months:
+        if isinstance(base_date, datetime):
+            base_date = base_date.date()
+        rule_date = base_date + relativedelta(months=interval_months)
+        if rule_date < current_date:
+            rule_date = current_date
+
+    estimated_date = None
+    if avg_daily_km and avg_daily_km > 0:
+        km_remaining = predicted_mileage - current_mileage
+        if km_remaining > 0:
+            try:
+                estimated_date = current_date + timedelta(days=int(km_remaining / avg_daily_km))
+            except OverflowError:
+                estimated_date = None
+        else:
+            # Mileage target is already met or passed
+            estimated_date = current_date
+
+    possible_dates = [d for d in (rule_date, estimated_date) if d is not None]
+    return predicted_mileage, (min(possible_dates) if possible_dates else None)
+
+
+def estimate_daily_km(vehicle):
+    """Daily KM of a `load_prediction_inputs` vehicle dict: the exponentially-weighted
+    estimate (see mileage.py), else the average between the first and latest readings."""
+    if vehicle['daily_km_ewma'] is not None:
+        return vehicle['daily_km_ewma']
+    return compute_avg_daily_km(
+        vehicle['first_mileage'], vehicle['first_mileage_at'],
+        vehicle['latest_mileage'], vehicle['latest_mileage_at'],
+    )
+
+
+def load_prediction_inputs(vehicle_ids, service_type_ids=None):
+    """Loads everything the engine needs for `vehicle_ids` in two queries.
+
+    Returns `(vehicles, last_services)`: `vehicles` is a list of dicts with the vehicle
+    columns (including the first/latest mileage aggregates and the daily KM estimate),
+    `last_services` maps `(vehicle_id, service_type_id)` to the
+    `(mileage_at_service, event_date)` of the latest ServiceEvent.
+    """
+    vehicles = list(
+        Vehicle.objects.filter(pk__in=vehicle_ids).values(
+            'id', 'initial_mileage', 'created_at', 'average_daily_km',
+            'first_mileage', 'first_mileage_at', 'latest_mileage', 'latest_mileage_at', 'daily_km_ewma',
+        )
+    )
+
+    events = ServiceEvent.objects.filter(vehicle_id__in=vehicle_ids)
+    if service_type_ids is not None:
+        events = events.filter(service_type_id__in=service_type_ids)
+    latest_events = events.annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=[F('vehicle_id'), F('service_type_id')],
+            order_by=[F('event_date').desc(), F('mileage_at_service').desc()],
+        )
+    ).filter(row_number=1).values_list('vehicle_id', 'service_type_id', 'mileage_at_service', 'event_date')
+    last_services = {(v, s): (mileage, event_date) for v, s, mileage, event_date in latest_events}
+    return vehicles, last_services
+
+
+def build_predictions(vehicles, last_services, rules, current_date):
+    """Computes predictions in memory with the vectorized kernel (see prediction_kernel.py).
+
+    Returns `(predictions, avg_km_changes)`: unsaved ServicePrediction instances and a
+    `{vehicle_id: average_daily_km}` dict of the averages that changed.
+    """
+    avg_km_changes = {}
+    # One column entry per (vehicle, rule) pair
+    vehicle_ids, service_type_ids = [], []
+    base_mileage, base_date, current_mileage, avg_daily_km, interval_km, interval_months = [], [], [], [], [], []
+    for vehicle in vehicles:
+        avg_km = estimate_daily_km(vehicle)
+        if vehicle['average_daily_km'] != avg_km:
+            avg_km_changes[vehicle['id']] = avg_km
+
+        vehicle_mileage = vehicle['latest_mileage'] if vehicle['latest_mileage'] is not None else vehicle['initial_mileage']
+        default_base = (vehicle['initial_mileage'], vehicle['created_at'].date())
+        for rule in rules:
+            mileage, date = last_services.get((vehicle['id'], rule.service_type_id), default_base)
+            vehicle_ids.append(vehicle['id'])
+            service_type_ids.append(rule.service_type_id)
+            base_mileage.append(mileage)
+            base_date.append(date.date() if isinstance(date, datetime) else date)
+            current_mileage.append(vehicle_mileage)
+            avg_daily_km.append(avg_km)
+            interval_km.append(rule.interval_km)
+            interval_months.append(rule.interval_months or 0)
+
+    if not vehicle_ids:
+        return [], avg_km_changes
+
+    due_mileages, due_dates = predict_due(
+        base_mileage, base_date, current_mileage, avg_daily_km, interval_km, interval_months, current_date,
+    )
+    predictions = [
+        ServicePrediction(
+            vehicle_id=vehicle_id,
+            service_type_id=service_type_id,
+            predicted_due_mileage=due_mileage,
+            predicted_due_date=due_date,
+            km_remaining=due_mileage - mileage,
+            prediction_source='RULE',
+        )
+        for vehicle_id, service_type_id, due_mileage, due_date, mileage in zip(
+            vehicle_ids, service_type_ids, due_mileages.tolist(), due_dates.astype(object).tolist(), current_mileage
+        )
+    ]
+    return predictions, avg_km_changes
+
+
+# Columns written by upsert_predictions; the last ones are compared to skip unchanged rows
+UPSERT_KEY_FIELDS = ('vehicle', 'service_type')
+UPSERT_VALUE_FIELDS = ('predicted_due_mileage', 'predicted_due_date', 'km_remaining', 'prediction_source')
+
+
+def upsert_predictions(predictions, batch_size=DEFAULT_CHUNK_SIZE):
+    """Inserts or updates predictions, writing only the rows whose values changed.
+
+    Each batch is one `INSERT ... ON CONFLICT (vehicle, service_type) DO UPDATE ... WHERE`
+    statement: the WHERE clause skips rows whose stored values are identical, so an
+    unchanged prediction costs no row version and no WAL. Returns the number of rows
+    inserted or updated.
+    """
+    if not predictions:
+        return 0
+    connection = connections[router.db_for_write(ServicePrediction)]
+    opts = ServicePrediction._meta
+    key_fields = [opts.get_field(name) for name in UPSERT_KEY_FIELDS]
+    value_fields = [opts.get_field(name) for name in UPSERT_VALUE_FIELDS]
+    generated_at, updated_at = opts.get_field('generated_at'), opts.get_field('updated_at')
+    fields = key_fields + value_fields + [generated_at, updated_at]
+
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    distinct = 'IS DISTINCT FROM' if connection.vendor == 'postgresql' else 'IS NOT'
+    columns = ', '.join(quote(field.column) for field in fields)
+    updates = ', '.join(f'{quote(field.column)} = EXCLUDED.{quote(field.column)}' for field in value_fields + [updated_at])
+    changed = ' OR '.join(
+        f'{table}.{quote(field.column)} {distinct} EXCLUDED.{quote(field.column)}' for field in value_fields
+    )
+    row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, predictions))
+    written = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(predictions), batch_size):
+            batch = predictions[start:start + batch_size]
+            params = []
+            for prediction in batch:
+                generated_at.pre_save(prediction, add=True)
+                updated_at.pre_save(prediction, add=True)
+                params.extend(
+                    field.get_db_prep_save(getattr(prediction, field.attname), connection) for field in fields
+                )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([row] * len(batch))} '
+                f'ON CONFLICT ({", ".join(quote(field.column) for field in key_fields)}) '
+                f'DO UPDATE SET {updates} WHERE {changed}',
+                params,
+            )
+            # Rows skipped by the WHERE clause are not counted
+            written += cursor.rowcount
+    return written
+
+
+def save_predictions(predictions, avg_km_changes, batch_size=DEFAULT_CHUNK_SIZE):
+    """Persists the output of `build_predictions`. Returns the number of predictions written."""
+    with transaction.atomic():
+        if avg_km_changes:
+            Vehicle.objects.bulk_update(
+                [Vehicle(pk=pk, average_daily_km=value) for pk, value in avg_km_changes.items()],
+                ['average_daily_km'], batch_size=batch_size,
+            )
+        return upsert_predictions(predictions, batch_size=batch_size)
+
+
+def iter_vehicle_id_chunks(chunk_size=DEFAULT_CHUNK_SIZE, after=0):
+    """Yields lists of vehicle ids (greater than `after`) using keyset pagination on the primary key."""
+    last_id = after
+    while True:
+        ids = list(Vehicle.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def recompute_predictions(vehicle_ids=None, service_type_ids=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Recomputes the average daily KM and every rule-based prediction.
+
+    `vehicle_ids` restricts the run to some vehicles (the whole fleet by default) and
+    `service_type_ids` to the active rules of some service types (all by default).
+    `progress`, if given, is called after each chunk with the running stats dict.
+    Returns the stats: vehicles and predictions processed, predictions actually written
+    (`changed`) or left alone because identical (`unchanged`), averages updated, elapsed seconds.
+    """
+    rules = PredictionRule.objects.filter(is_active=True)
+    if service_type_ids is not None:
+        rules = rules.filter(service_type_id__in=service_type_ids)
+    rules = list(rules)
+    current_date = timezone.now().date()
+
+    if vehicle_ids is None:
+        total = Vehicle.objects.count()
+        chunks = iter_vehicle_id_chunks(chunk_size)
+    else:
+        vehicle_ids = sorted(set(vehicle_ids))
+        total = len(vehicle_ids)
+        chunks = (vehicle_ids[i:i + chunk_size] for i in range(0, total, chunk_size))
+
+    stats = {
+        'total': total, 'vehicles': 0, 'predictions': 0, 'changed': 0, 'unchanged': 0,
+        'avg_km_updated': 0, 'elapsed': 0.0,
+    }
+    started = time.monotonic()
+    for ids in chunks:
+        vehicles, last_services = load_prediction_inputs(ids, service_type_ids)
+        predictions, avg_km_changes = build_predictions(vehicles, last_services, rules, current_date)
+        changed = save_predictions(predictions, avg_km_changes, batch_size=chunk_size)
+
+        stats['vehicles'] += len(vehicles)
+        stats['predictions'] += len(predictions)
+        stats['changed'] += changed
+        stats['unchanged'] += len(predictions) - changed
+        stats['avg_km_updated'] += len(avg_km_changes)
+        stats['elapsed'] = time.monotonic() - started
+        if progress is not None:
+            progress(stats)
+    return stats
+
+
+def delete_service_type_predictions(service_type_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Deletes the predictions of a service type in chunks of primary keys.
+
+    Each chunk is its own short DELETE so the table is never locked for long.
+    Returns the number of rows deleted.
+    """
+    deleted = 0
+    predictions = ServicePrediction.objects.filter(service_type_id=service_type_id)
+    while True:
+        ids = list(predictions.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += ServicePrediction.objects.filter(pk__in=ids).delete()[0]
+
+
+def apply_rule_change(service_type_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Brings the predictions of one service type in line with its PredictionRule.
+
+    With an active rule, only that service type is recomputed across the fleet (one
+    bulk upsert per chunk of vehicles). Without one (rule deactivated or deleted),
+    its now orphaned predictions are deleted in chunks.
+    """
+    if PredictionRule.objects.filter(service_type_id=service_type_id, is_active=True).exists():
+        return recompute_predictions(service_type_ids=[service_type_id], chunk_size=chunk_size)
+    return {'deleted': delete_service_type_predictions(service_type_id, chunk_size=chunk_size)}
@@ -0,0 +1,165 @@
+"""Mileage history retention.
+
+Readings older than MILEAGE_RETENTION_DAYS are compacted into one
+MileageDailySummary row per vehicle and (local) day, holding the minimum and
+maximum mileage, the number of readings and the first/last timestamps. The raw
+rows are then deleted, so MileageRecord only holds the recent ("hot") history
+while the old one stays queryable at day resolution.
+
+Compaction runs by chunks of vehicles, one transaction each: an interrupted run
+leaves every chunk either fully compacted or untouched, and can simply be started
+again (or resumed after the last reported vehicle). Vehicle aggregates and the
+daily KM estimate are not affected: the first and the last reading of a day are
+kept in the summary, and the rebuilds read both tiers (see mileage.py).
+
+The raw rows go with one SQL DELETE, without loading them or sending the
+post_delete signals: compaction is not a deletion for the handlers (aggregate
+rebuild, recompute, sync tombstone, dashboard counters), the readings live on in
+their daily summaries.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import MileageDailySummary, MileageRecord, Vehicle
+from .predictions import iter_vehicle_id_chunks
+
+DEFAULT_RETENTION_DAYS = 365
+DEFAULT_CHUNK_SIZE = 500
+SUMMARY_FIELDS = ('min_mileage', 'max_mileage', 'reading_count', 'first_recorded_at', 'last_recorded_at')
+
+
+def retention_cutoff(days=None, now=None):
+    """Start of the local day `days` days ago (MILEAGE_RETENTION_DAYS by default).
+
+    Aligned on a day boundary so that a compacted day is always complete.
+    """
+    if days is None:
+        days = getattr(settings, 'MILEAGE_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    day = timezone.localdate(now) - timedelta(days=days)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def merge_summary(summary, day):
+    """Folds the aggregates of newly compacted readings into an existing summary."""
+    summary.min_mileage = min(summary.min_mileage, day['min_mileage'])
+    summary.max_mileage = max(summary.max_mileage, day['max_mileage'])
+    summary.reading_count += day['reading_count']
+    summary.first_recorded_at = min(summary.first_recorded_at, day['first_recorded_at'])
+    summary.last_recorded_at = max(summary.last_recorded_at, day['last_recorded_at'])
+
+
+def delete_readings_before(vehicle_ids, cutoff):
+    """Deletes the readings of `vehicle_ids` recorded before `cutoff` with one DELETE, without signals.
+
+    Returns the number of rows deleted.
+    """
+    connection = connections[router.db_for_write(MileageRecord)]
+    opts = MileageRecord._meta
+    quote = connection.ops.quote_name
+    vehicle_field, recorded_at_field = opts.get_field('vehicle'), opts.get_field('recorded_at')
+    ids = list(vehicle_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(opts.db_table)} WHERE {quote(vehicle_field.column)} IN ({", ".join(["%s"] * len(ids))}) '
+            f'AND {quote(recorded_at_field.column)} < %s',
+            [*ids, recorded_at_field.get_db_prep_value(cutoff, connection)],
+        )
+        return cursor.rowcount
+
+
+def compact_vehicles(vehicle_ids, cutoff):
+    """Compacts the readings of `vehicle_ids` recorded before `cutoff`, in one transaction.
+
+    Returns `(readings deleted, summaries written)`.
+    """
+    with transaction.atomic():
+        # Inserts lock the vehicle row too (see mileage.apply_mileage_reading): no reading
+        # can slip in between the aggregation and the delete
+        list(Vehicle.objects.select_for_update().filter(pk__in=vehicle_ids).values_list('pk', flat=True))
+        old = MileageRecord.objects.filter(vehicle_id__in=vehicle_ids, recorded_at__lt=cutoff)
+        days = list(
+            old.annotate(day=TruncDate('recorded_at')).values('vehicle_id', 'day').annotate(
+                min_mileage=Min('mileage'), max_mileage=Max('mileage'), reading_count=Count('id'),
+                first_recorded_at=Min('recorded_at'), last_recorded_at=Max('recorded_at'),
+            ).order_by()
+        )
+        if not days:
+            return 0, 0
+
+        # A day may already be summarized if back-dated readings were added after a run
+        existing = {
+            (summary.vehicle_id, summary.day): summary
+            for summary in MileageDailySummary.objects.filter(
+                vehicle_id__in={day['vehicle_id'] for day in days},
+                day__lte=max(day['day'] for day in days),
+            )
+        }
+        summaries = []
+        for day in days:
+            summary = existing.get((day['vehicle_id'], day['day']))
+            if summary is None:
+                summary = MileageDailySummary(**day)
+            else:
+                merge_summary(summary, day)
+            summaries.append(summary)
+        MileageDailySummary.objects.bulk_create(
+            summaries, update_conflicts=True, unique_fields=['vehicle', 'day'], update_fields=SUMMARY_FIELDS,
+        )
+        deleted = delete_readings_before(vehicle_ids, cutoff)
+    return deleted, len(summaries)
+
+
+def daily_mileage_history(vehicle_id, start=None, end=None):
+    """Per-day `{day, min_mileage, max_mileage, reading_count}` of a vehicle, oldest first.
+
+    Reads the summaries for the compacted days and aggregates the raw readings of the
+    others, so callers see one continuous history. `start`/`end` are inclusive dates.
+    """
+    summaries = MileageDailySummary.objects.filter(vehicle_id=vehicle_id)
+    readings = MileageRecord.objects.filter(vehicle_id=vehicle_id).annotate(day=TruncDate('recorded_at'))
+    if start is not None:
+        summaries, readings = summaries.filter(day__gte=start), readings.filter(day__gte=start)
+    if end is not None:
+        summaries, readings = summaries.filter(day__lte=end), readings.filter(day__lte=end)
+
+    history = {
+        row['day']: row
+        for row in summaries.values('day', 'min_mileage', 'max_mileage', 'reading_count')
+    }
+    raw_days = readings.values('day').annotate(
+        min_mileage=Min('mileage'), max_mileage=Max('mileage'), reading_count=Count('id'),
+    ).order_by()
+    for row in raw_days:
+        summary = history.get(row['day'])
+        if summary is None:
+            history[row['day']] = row
+        else:
+            # Readings back-dated into an already compacted day
+            summary['min_mileage'] = min(summary['min_mileage'], row['min_mileage'])
+            summary['max_mileage'] = max(summary['max_mileage'], row['max_mileage'])
+            summary['reading_count'] += row['reading_count']
+    return [history[day] for day in sorted(history)]
+
+
+def compact_mileage_history(cutoff=None, vehicle_ids=None, after=0, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Compacts the readings older than `cutoff` (see `retention_cutoff`) of all vehicles.
+
+    Vehicles are processed by ascending id, from the first one after `after`, in
+    chunks of `chunk_size`. `progress`, if given, is called after each chunk with the
+    last vehicle id and the running totals. Returns `{'readings': n, 'summaries': n}`.
+    """
+    cutoff = cutoff or retention_cutoff()
+    chunks = [sorted(vehicle_ids)] if vehicle_ids is not None else iter_vehicle_id_chunks(chunk_size, after=after)
+    totals = {'readings': 0, 'summaries': 0}
+    for ids in chunks:
+        deleted, written = compact_vehicles(ids, cutoff)
+        totals['readings'] += deleted
+        totals['summaries'] += written
+        if progress:
+            progress(ids[-1], totals)
+    return totals
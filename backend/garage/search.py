@@ -0,0 +1,155 @@
+"""Quick search over vehicles and customers.
+
+`GET /api/v1/search/?q=` matches the query against the plate, VIN, make and model
+of the vehicles the user may see and, for admins, against the username, names
+and phone number of the customers. Hits are typed (`vehicle` / `customer`) and
+ranked: an exact match of a field scores 3, a prefix 2, a substring 1.
+
+On Postgres, substring matches are served by the pg_trgm GIN indexes of
+migration 0020 (`UPPER(col) LIKE '%Q%'` is a trigram index scan). Elsewhere
+(SQLite in tests) only prefixes are matched, which plain B-tree indexes can serve.
+
+The searches run one after the other within SEARCH_TIME_BUDGET_MS: on Postgres
+each statement gets the remaining time as `statement_timeout`, and a search that
+runs out of time is dropped from the response, which is then marked `partial`.
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest, Replace
+
+from .models import Vehicle
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+MIN_QUERY_LENGTH = 3 # Shorter queries have no trigram to look up
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+DEFAULT_TIME_BUDGET_MS = 300
+PHONE_PREFIX = '+216'
+QUERY_CANCELED = '57014' # Postgres SQLSTATE of a statement cancelled by statement_timeout
+
+VEHICLE_FIELDS = ('registration_number', 'vin', 'make', 'model')
+CUSTOMER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@contextmanager
+def statement_timeout(seconds):
+    """On Postgres, cancels the statements of the block running longer than `seconds`."""
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'SET LOCAL statement_timeout = {max(1, int(seconds * 1000))}')
+        yield
+        # SET LOCAL outlives a released savepoint: restore it for the rest of the transaction
+        cursor.execute('SET LOCAL statement_timeout TO DEFAULT')
+
+
+def match_filter(fields, q, substring):
+    lookup = 'icontains' if substring else 'istartswith'
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__{lookup}': q})
+    return condition
+
+
+def match_score(terms):
+    """Best match quality over `{field: value}`: 3 exact, 2 prefix, 1 substring, 0 none."""
+    scores = [
+        Case(
+            When(**{f'{field}__iexact': value}, then=Value(3)),
+            When(**{f'{field}__istartswith': value}, then=Value(2)),
+            When(**{f'{field}__icontains': value}, then=Value(1)),
+            default=Value(0), output_field=IntegerField(),
+        )
+        for field, value in terms.items()
+    ]
+    return Greatest(*scores) if len(scores) > 1 else scores[0]
+
+
+def search_vehicles(user, q, substring, limit):
+    queryset = Vehicle.objects.all()
+    if not (user.is_staff or user.is_superuser):
+        queryset = queryset.filter(owner=user)
+    rows = (
+        queryset.filter(match_filter(VEHICLE_FIELDS, q, substring))
+        .annotate(score=match_score({field: q for field in VEHICLE_FIELDS}))
+        .order_by('-score', 'registration_number')
+        .values('id', 'registration_number', 'make', 'model', 'year', 'owner__username', 'score')[:limit]
+    )
+    return [
+        {
+            'type': 'vehicle', 'id': row['id'], 'label': row['registration_number'],
+            'detail': ' '.join(str(part) for part in (row['make'], row['model'], row['year']) if part),
+            'owner': row['owner__username'], 'score': row['score'],
+        }
+        for row in rows
+    ]
+
+
+def search_customers(user, q, substring, limit):
+    if not (user.is_staff or user.is_superuser):
+        return []
+    terms = {field: q for field in CUSTOMER_FIELDS}
+    # Phone numbers are stored as +216 and 8 digits, with optional spaces: compare the 8 digits
+    queryset = User.objects.filter(groups__name='Customers').annotate(
+        phone=Replace(Replace('customer_profile__phone_number', Value(' '), Value('')), Value(PHONE_PREFIX), Value(''))
+    )
+    digits = q.replace(' ', '').removeprefix(PHONE_PREFIX)
+    condition = match_filter(CUSTOMER_FIELDS, q, substring)
+    if digits.isdigit():
+        condition |= Q(**{'phone__contains' if substring else 'phone__startswith': digits})
+        terms['phone'] = digits
+    rows = (
+        queryset.filter(condition)
+        .annotate(score=match_score(terms))
+        .order_by('-score', 'username')
+        .values('id', 'username', 'first_name', 'last_name', 'customer_profile__phone_number', 'score')[:limit]
+    )
+    return [
+        {
+            'type': 'customer', 'id': row['id'],
+            'label': ' '.join(part for part in (row['first_name'], row['last_name']) if part) or row['username'],
+            'detail': row['customer_profile__phone_number'] or '', 'username': row['username'], 'score': row['score'],
+        }
+        for row in rows
+    ]
+
+
+SEARCHES = (search_vehicles, search_customers)
+
+
+def search(user, q, limit=DEFAULT_LIMIT, substring=None):
+    """Returns `{'query', 'partial', 'results'}`, at most `limit` hits, best first.
+
+    `substring` defaults to True on Postgres only (see module docstring).
+    """
+    q = q.strip()
+    if substring is None:
+        substring = connection.vendor == 'postgresql'
+    budget = getattr(settings, 'SEARCH_TIME_BUDGET_MS', DEFAULT_TIME_BUDGET_MS) / 1000
+    deadline = time.monotonic() + budget
+    results, partial = [], False
+    for run in SEARCHES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            partial = True
+            break
+        try:
+            with statement_timeout(remaining):
+                results += run(user, q, substring, limit)
+        except OperationalError as e:
+            cause = e.__cause__
+            if getattr(cause, 'sqlstate', None) != QUERY_CANCELED and getattr(cause, 'pgcode', None) != QUERY_CANCELED:
+                raise
+            logger.warning("Search %s cancelled after %.0f ms (q=%r)", run.__name__, budget * 1000, q)
+            partial = True
+    results.sort(key=lambda hit: (-hit['score'], hit['label']))
+    return {'query': q, 'partial': partial, 'results': results[:limit]}
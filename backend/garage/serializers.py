@@ -1,3 +1,5 @@
+import logging
+
 from rest_framework import serializers
 from .models import Vehicle, MileageRecord, ServiceType, ServiceEvent, PredictionRule, ServicePrediction, CustomerProfile, tunisian_phone_validator, Invoice
 from django.conf import settings # Use settings.AUTH_USER_MODEL
@@ -8,10 +10,14 @@ from django.db import transaction
 from django.core.exceptions import ValidationError
 from datetime import datetime
 
+from .fieldsets import SparseFieldsetMixin
+
 # Get the actual User model class
 User = get_user_model()
 
-class VehicleSerializer(serializers.ModelSerializer):
+logger = logging.getLogger(__name__)
+
+class VehicleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Sérialiseur pour le modèle Vehicle.
     Gère la conversion entre les objets Vehicle et leur représentation JSON.
     Utilisé pour afficher les détails des véhicules et pour la création/mise à jour (validation).
@@ -39,13 +45,16 @@ class VehicleSerializer(serializers.ModelSerializer):
             'vin', 
             'initial_mileage', # Add initial_mileage
             'average_daily_km', # <--- Add the new field here
+            'latest_mileage', # Current mileage (maintained aggregate)
+            'latest_mileage_at',
             'created_at', 
             'updated_at'
         ]
         # Owner is now writable via owner_id
-        read_only_fields = ['id', 'owner_username', 'average_daily_km', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'owner_username', 'average_daily_km', 'latest_mileage', 'latest_mileage_at', 'created_at', 'updated_at']
+        compact_fields = ['id', 'owner', 'registration_number'] # ?view=compact
 
-class MileageRecordSerializer(serializers.ModelSerializer):
+class MileageRecordSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for the MileageRecord model."""
     # Display username instead of user ID for better readability (optional)
     recorded_by_username = serializers.CharField(source='recorded_by.username', read_only=True, allow_null=True)
@@ -67,6 +76,7 @@ class MileageRecordSerializer(serializers.ModelSerializer):
             'recorded_by_username' # Readable username
         ]
         read_only_fields = ['id', 'recorded_at', 'vehicle']
+        compact_fields = ['id', 'vehicle', 'mileage', 'recorded_at']
 
     # Optional: Add depth for nested vehicle representation on read
     # depth = 1 
@@ -78,19 +88,13 @@ class MileageRecordSerializer(serializers.ModelSerializer):
         if request and hasattr(request, "user") and request.user.is_authenticated:
             validated_data['recorded_by'] = request.user
             
-        # Create the instance first (without saving to DB yet)
-        instance = MileageRecord(**validated_data)
-        
-        # Perform model-level validation (including mileage check)
+        # Model-level validation (including the mileage check) runs in MileageRecord.save()
+        # The view's perform_create will override recorded_by and set source
         try:
-            instance.full_clean()
+            return super().create(validated_data)
         except ValidationError as e:
             # Convert Django ValidationError to DRF ValidationError
             raise serializers.ValidationError(serializers.as_serializer_error(e))
-            
-        # If validation passes, let super().create handle the actual DB save
-        # The view's perform_create will override recorded_by and set source
-        return super().create(validated_data)
 
     def validate_mileage(self, value):
         """Ensure mileage is positive."""
@@ -98,6 +102,18 @@ class MileageRecordSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Le kilométrage doit être un nombre positif.")
         return value 
 
+
+class MileageReadingSerializer(serializers.Serializer):
+    """One row of a bulk mileage import (validated field by field, stored by garage.ingest)."""
+    vehicle_id = serializers.IntegerField(min_value=1)
+    mileage = serializers.IntegerField(max_value=2147483647)
+    recorded_at = serializers.DateTimeField(required=False)
+
+    def validate_mileage(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Le kilométrage doit être un nombre positif.")
+        return value
+
 # --- New Serializers --- 
 
 class ServiceTypeSerializer(serializers.ModelSerializer):
@@ -106,7 +122,7 @@ class ServiceTypeSerializer(serializers.ModelSerializer):
         model = ServiceType
         fields = '__all__' # Include all fields
 
-class ServiceEventSerializer(serializers.ModelSerializer):
+class ServiceEventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for the ServiceEvent model."""
     vehicle_id = serializers.PrimaryKeyRelatedField(
         queryset=Vehicle.objects.all(), source='vehicle', write_only=True
@@ -132,6 +148,12 @@ class ServiceEventSerializer(serializers.ModelSerializer):
             'service_type_info',
         ]
         read_only_fields = ['id', 'created_at']
+        compact_fields = ['id', 'vehicle', 'service_type', 'event_date']
+        # What the method fields read, so that sparse fieldsets can narrow the query
+        method_field_sources = {
+            'vehicle_info': ['vehicle.id', 'vehicle.registration_number', 'vehicle.make', 'vehicle.model'],
+            'service_type_info': ['service_type.id', 'service_type.name', 'service_type.description'],
+        }
 
     def get_vehicle_info(self, obj):
         if not obj.vehicle:
@@ -154,13 +176,14 @@ class ServiceEventSerializer(serializers.ModelSerializer):
     
     def to_representation(self, instance):
         # Convertir le champ event_date en datetime si c'est un date
+        # (en mémoire seulement : une lecture ne doit pas écrire ni changer updated_at)
         from datetime import date
         if hasattr(instance, 'event_date') and isinstance(instance.event_date, date) and not isinstance(instance.event_date, datetime):
             instance.event_date = datetime.combine(instance.event_date, datetime.min.time())
-            instance.save(update_fields=['event_date'])
         
         return super().to_representation(instance)
 
+    @transaction.atomic # One transaction: the vehicle's predictions are recomputed once on commit
     def create(self, validated_data):
         service_event = super().create(validated_data)
         mileage = validated_data.get('mileage_at_service')
@@ -193,7 +216,7 @@ class PredictionRuleSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id']
 
-class ServicePredictionSerializer(serializers.ModelSerializer):
+class ServicePredictionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for the ServicePrediction model."""
     vehicle_id = serializers.PrimaryKeyRelatedField(
         queryset=Vehicle.objects.all(), source='vehicle', write_only=True
@@ -212,6 +235,7 @@ class ServicePredictionSerializer(serializers.ModelSerializer):
             'service_type_id', 
             'predicted_due_date', 
             'predicted_due_mileage', 
+            'km_remaining',
             'prediction_source', 
             'generated_at',
             # Read-only representations
@@ -219,10 +243,30 @@ class ServicePredictionSerializer(serializers.ModelSerializer):
             'service_type_info'
         ]
         # Typically predictions are generated by the system, so make them read-only by default
-        read_only_fields = ['id', 'generated_at', 'prediction_source']
+        read_only_fields = ['id', 'generated_at', 'prediction_source', 'km_remaining']
+        compact_fields = ['id', 'vehicle', 'service_type', 'predicted_due_date', 'predicted_due_mileage']
 
     # Add validation if needed, e.g., ensure due date or mileage is present 
 
+class DuePredictionSerializer(serializers.ModelSerializer):
+    """Compact, flat representation of a prediction for the workshop "due soon" worklist."""
+    registration_number = serializers.CharField(source='vehicle.registration_number', read_only=True)
+    vehicle_label = serializers.SerializerMethodField()
+    owner_username = serializers.CharField(source='vehicle.owner.username', read_only=True)
+    service_type_name = serializers.CharField(source='service_type.name', read_only=True)
+
+    class Meta:
+        model = ServicePrediction
+        fields = [
+            'id', 'vehicle_id', 'registration_number', 'vehicle_label', 'owner_username',
+            'service_type_id', 'service_type_name',
+            'predicted_due_date', 'predicted_due_mileage', 'km_remaining',
+        ]
+        read_only_fields = fields
+
+    def get_vehicle_label(self, obj):
+        return f"{obj.vehicle.make} {obj.vehicle.model}"
+
 # --- User Serializer --- 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -326,7 +370,7 @@ class RegisterSerializer(serializers.ModelSerializer):
             customer_group = Group.objects.get(name='Customers')
             user.groups.add(customer_group)
         except Group.DoesNotExist:
-            print("ERROR: 'Customers' group not found during registration.")
+            logger.error("'Customers' group not found during registration")
             pass 
 
         # Ensure the created user instance is returned
@@ -334,7 +378,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 # --- Invoice Serializer --- 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for the Invoice model."""
     # Use PrimaryKeyRelatedField for writing vehicle/service_event IDs
     vehicle_id = serializers.PrimaryKeyRelatedField(
@@ -367,5 +411,6 @@ class InvoiceSerializer(serializers.ModelSerializer):
         ]
         # pdf_file is handled by upload parsers, uploaded_by is set in view
         read_only_fields = ['id', 'uploaded_at', 'uploaded_by']
+        compact_fields = ['id', 'vehicle', 'service_event', 'invoice_date']
 
     # Add validation if final_amount should be required, etc. 
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""Downsampled mileage time series for charts.
+
+`mileage_series` reads a vehicle's history in date order (raw readings and daily
+summaries, see mileage.iter_mileage_points) and keeps at most `points` of them with
+Largest-Triangle-Three-Buckets: the series is cut into equal buckets and each one
+keeps the point forming the largest triangle with the previously kept point and the
+average of the next bucket, which preserves the shape of the curve (plateaus and
+slope changes) far better than taking every n-th point.
+
+The implementation streams: only two buckets are held in memory, so the cost is
+one pass over an index-ordered cursor and the output size is bounded by `points`
+whatever the length of the history.
+"""
+import json
+from itertools import islice
+
+from django.utils import timezone
+
+from .mileage import count_mileage_points, iter_mileage_points
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+STREAM_CHUNK_SIZE = 250
+
+
+def triangle_area(a, b, c):
+    return abs((a[0] - c[0]) * (b[1] - a[1]) - (a[0] - b[0]) * (c[1] - a[1]))
+
+
+def lttb(points, count, threshold):
+    """Yields `threshold` of the `count` `(x, y)` points of the iterator `points` (x ascending).
+
+    The first and last points are always kept. If the iterator turns out shorter or
+    longer than `count` (rows inserted meanwhile), the output stays valid.
+    """
+    points = iter(points)
+    if count <= threshold or threshold < 3:
+        yield from points
+        return
+    previous = next(points, None)
+    if previous is None:
+        return
+    yield previous
+
+    # Bucket i holds the points bounds[i] to bounds[i + 1] - 1; the last point stands alone
+    every = (count - 2) / (threshold - 2)
+    bounds = [int(i * every) + 1 for i in range(threshold - 1)]
+    bucket = list(islice(points, bounds[1] - bounds[0]))
+    last = bucket[-1] if bucket else None
+    for i in range(threshold - 2):
+        following = list(islice(points, bounds[i + 2] - bounds[i + 1] if i + 2 < len(bounds) else 1))
+        if following:
+            last = following[-1]
+        if not bucket:
+            break
+        if following:
+            average = (
+                sum(point[0] for point in following) / len(following),
+                sum(point[1] for point in following) / len(following),
+            )
+        else:
+            average = bucket[-1]
+        previous = max(bucket, key=lambda point: triangle_area(previous, point, average))
+        yield previous
+        bucket = following
+
+    for last in points:
+        pass
+    if last is not None and last is not previous:
+        yield last
+
+
+def mileage_series(vehicle_id, start=None, end=None, points=DEFAULT_POINTS):
+    """Returns `(count, iterator)`: the number of stored points in `[start, end)` and the
+    downsampled `[timestamp in ms, mileage]` pairs."""
+    count = count_mileage_points([vehicle_id], start=start, end=end)
+    samples = (
+        (recorded_at.timestamp() * 1000, mileage)
+        for _, mileage, recorded_at in iter_mileage_points([vehicle_id], start=start, end=end)
+    )
+    return count, ([int(timestamp), mileage] for timestamp, mileage in lttb(samples, count, points))
+
+
+def stream_series_envelope(count, series, points):
+    """Yields the series as JSON chunks, in the `{metadata, data, error}` shape of CustomJSONRenderer."""
+    metadata = {'timestamp': timezone.now().isoformat(), 'count': count, 'points': min(count, points)}
+    yield '{"metadata": %s, "data": [' % json.dumps(metadata)
+    separator = ''
+    while True:
+        # A few hundred pairs per chunk rather than one write per point
+        chunk = ', '.join(json.dumps(pair) for pair in islice(series, STREAM_CHUNK_SIZE))
+        if not chunk:
+            break
+        yield separator + chunk
+        separator = ', '
+    yield '], "error": null}'
@@ -0,0 +1,253 @@
+"""Per-day dashboard counters (GarageStats).
+
+Each GarageStats row holds, for one (local) day, the number of vehicles created,
+service events, invoices and mileage readings dated that day, and the invoiced
+amount. The signal handlers keep them up to date in the transaction of the write:
+a create adds the row's contribution to its day, a delete subtracts it, and an
+update that moves a row to another day (or changes an invoice amount) does both.
+
+A write does not update the day's row, which every writer of the day would wait
+on until the others commit: it appends its changes as GarageStatsDelta rows, one
+per day, with a single INSERT. `fold_stats` (run by the ecar_worker command) sums
+the deltas into GarageStats with one `INSERT ... ON CONFLICT (day) DO UPDATE` and
+deletes them, in one transaction; readers add the deltas not folded yet
+(`stored_stats`, and the dashboard's aggregates). The dashboard folds itself when
+more than FOLD_ON_READ_THRESHOLD deltas are waiting, so that its reads stay small
+when no worker runs. Folds and `reconcile_stats` take the same advisory lock: a
+fold committing in the middle of a reconciliation would otherwise have its deltas
+counted in neither table, and the reconciliation write a wrong correction.
+
+Days are: the creation date of a vehicle, the date of a service event, the date
+of an invoice (its upload date when it has none), and the reading date of a
+mileage record. Compacted readings (see rollup.py) still count, through their
+daily summaries. Writes that bypass the signals (queryset `update()`, raw SQL)
+are not seen: `reconcile_garage_stats` rebuilds the table from the source rows.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import GarageStats, GarageStatsDelta, Invoice, MileageDailySummary, MileageRecord, ServiceEvent, Vehicle
+
+COUNTER_FIELDS = ('vehicles', 'service_events', 'invoices', 'invoiced_amount', 'mileage_records')
+
+# Model -> fields whose change can move the row's contribution (see signals.py)
+TRACKED_FIELDS = {
+    MileageRecord: ('recorded_at',),
+    ServiceEvent: ('event_date',),
+    Invoice: ('invoice_date', 'uploaded_at', 'final_amount'),
+}
+
+FOLD_BATCH_SIZE = 5000
+FOLD_ON_READ_THRESHOLD = 10000
+# pg_advisory_xact_lock key shared by fold_stats and reconcile_stats
+STATS_LOCK_ID = 2024
+
+
+def local_day(value):
+    """The local date of a datetime (dates are returned as is)."""
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def contribution(instance):
+    """Returns `(day, {counter: value})` for a vehicle, mileage record, service event or invoice."""
+    if isinstance(instance, Vehicle):
+        return local_day(instance.created_at), {'vehicles': 1}
+    if isinstance(instance, MileageRecord):
+        return local_day(instance.recorded_at), {'mileage_records': 1}
+    if isinstance(instance, ServiceEvent):
+        return local_day(instance.event_date), {'service_events': 1}
+    if isinstance(instance, Invoice):
+        return local_day(instance.invoice_date or instance.uploaded_at), {
+            'invoices': 1, 'invoiced_amount': Decimal(str(instance.final_amount or 0)),
+        }
+    if isinstance(instance, MileageDailySummary):
+        return instance.day, {'mileage_records': instance.reading_count}
+    raise TypeError(f"No counters for {type(instance).__name__}")
+
+
+def add_contribution(changes, day, counters, sign=1):
+    for field, value in counters.items():
+        changes[day][field] += sign * value
+
+
+def nonzero_rows(changes):
+    return [
+        (day, [deltas.get(field, 0) for field in COUNTER_FIELDS])
+        for day, deltas in sorted(changes.items()) if any(deltas.values())
+    ]
+
+
+def apply_changes(changes):
+    """Records `{day: {counter: delta}}` as GarageStatsDelta rows (one INSERT, no lock on GarageStats)."""
+    GarageStatsDelta.objects.bulk_create([
+        GarageStatsDelta(day=day, **dict(zip(COUNTER_FIELDS, values))) for day, values in nonzero_rows(changes)
+    ])
+
+
+def upsert_counters(changes):
+    """Adds `{day: {counter: delta}}` to the GarageStats rows, creating the missing days."""
+    rows = nonzero_rows(changes)
+    if not rows:
+        return
+    connection = connections[router.db_for_write(GarageStats)]
+    opts = GarageStats._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    fields = [opts.get_field('day')] + [opts.get_field(name) for name in COUNTER_FIELDS]
+    columns = ', '.join(quote(field.column) for field in fields)
+    updates = ', '.join(
+        f'{quote(field.column)} = {table}.{quote(field.column)} + EXCLUDED.{quote(field.column)}' for field in fields[1:]
+    )
+    row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    params = []
+    for day, values in rows:
+        params.extend(field.get_db_prep_save(value, connection) for field, value in zip(fields, [day, *values]))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) VALUES {", ".join([row] * len(rows))} '
+            f'ON CONFLICT ({quote(fields[0].column)}) DO UPDATE SET {updates}',
+            params,
+        )
+
+
+def new_changes():
+    return defaultdict(lambda: defaultdict(int))
+
+
+def lock_stats():
+    """Waits for the folds and reconciliations of other transactions (PostgreSQL; until the transaction ends)."""
+    connection = connections[router.db_for_write(GarageStats)]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [STATS_LOCK_ID])
+
+
+def pending_deltas():
+    """Upper bound of the number of deltas not folded yet (folds delete them oldest first)."""
+    bounds = GarageStatsDelta.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    return bounds['last'] - bounds['first'] + 1 if bounds['last'] is not None else 0
+
+
+def fold_stats(batch_size=FOLD_BATCH_SIZE):
+    """Moves the pending GarageStatsDelta rows into GarageStats. Returns the number folded.
+
+    Each batch is summed, upserted and deleted in one transaction; the deltas are
+    locked with SKIP LOCKED, so folds running side by side take different rows.
+    """
+    folded = 0
+    while True:
+        with transaction.atomic():
+            lock_stats()
+            deltas = list(
+                GarageStatsDelta.objects.select_for_update(skip_locked=True)
+                .order_by('pk').values('pk', 'day', *COUNTER_FIELDS)[:batch_size]
+            )
+            changes = new_changes()
+            for delta in deltas:
+                add_contribution(changes, delta['day'], {field: delta[field] for field in COUNTER_FIELDS})
+            upsert_counters(changes)
+            GarageStatsDelta.objects.filter(pk__in=[delta['pk'] for delta in deltas]).delete()
+        folded += len(deltas)
+        if len(deltas) < batch_size:
+            return folded
+
+
+def stored_stats():
+    """`{day: {counter: value}}` as the dashboard sees it: GarageStats plus the deltas not folded yet.
+
+    Both tables are read by one statement, so that a fold committing meanwhile is
+    seen entirely or not at all.
+    """
+    stats = new_changes()
+    fields = ('day', *COUNTER_FIELDS)
+    rows = GarageStats.objects.values_list(*fields).order_by().union(
+        GarageStatsDelta.objects.values_list(*fields).order_by(), all=True
+    )
+    for day, *values in rows:
+        add_contribution(stats, day, dict(zip(COUNTER_FIELDS, values)))
+    return stats
+
+
+def count_created(instances):
+    """Adds the contribution of rows created without signals (bulk_create)."""
+    changes = new_changes()
+    for instance in instances:
+        add_contribution(changes, *contribution(instance))
+    apply_changes(changes)
+
+
+def record_change(instance, previous=None, deleted=False):
+    """Updates the counters for a saved (`previous`: contribution before the save, None
+    if created) or deleted row."""
+    changes = new_changes()
+    if previous is not None:
+        add_contribution(changes, *previous, sign=-1)
+    add_contribution(changes, *contribution(instance), sign=-1 if deleted else 1)
+    apply_changes(changes)
+
+
+def computed_stats(vehicle_ids=None):
+    """`{day: {counter: value}}` computed from the source rows (of `vehicle_ids` only if given)."""
+    def rows(model):
+        if vehicle_ids is None:
+            return model.objects.all()
+        return model.objects.filter(**{'pk__in' if model is Vehicle else 'vehicle_id__in': vehicle_ids})
+
+    stats = new_changes()
+    queries = (
+        ('vehicles', rows(Vehicle).annotate(day=TruncDate('created_at')).values('day').annotate(value=Count('pk'))),
+        ('service_events', rows(ServiceEvent).values(day=F('event_date')).annotate(value=Count('pk'))),
+        ('mileage_records', rows(MileageRecord).annotate(day=TruncDate('recorded_at')).values('day').annotate(value=Count('pk'))),
+        ('mileage_records', rows(MileageDailySummary).values('day').annotate(value=Sum('reading_count'))),
+    )
+    for field, query in queries:
+        for row in query.order_by():
+            stats[row['day']][field] += row['value']
+    invoices = rows(Invoice).annotate(
+        day=Coalesce('invoice_date', TruncDate('uploaded_at'))
+    ).values('day').annotate(count=Count('pk'), amount=Sum('final_amount')).order_by()
+    for row in invoices:
+        stats[row['day']]['invoices'] += row['count']
+        stats[row['day']]['invoiced_amount'] += row['amount'] or 0
+    return stats
+
+
+def record_vehicle_deletion(vehicle_ids):
+    """Subtracts the vehicles and everything deleted with them (called from pre_delete).
+
+    One aggregate per table instead of one counter update per cascaded row: the
+    post_delete handlers skip the rows deleted along with their vehicle.
+    """
+    changes = new_changes()
+    for day, counters in computed_stats(vehicle_ids).items():
+        add_contribution(changes, day, counters, sign=-1)
+    apply_changes(changes)
+
+
+def reconcile_stats(dry_run=False):
+    """Brings GarageStats in line with the source rows. Returns the days that were wrong.
+
+    The differences are recorded as deltas, like the signal handlers do, so writes
+    running at the same time are not lost.
+    """
+    with transaction.atomic():
+        lock_stats()
+        expected = computed_stats()
+        stored = stored_stats()
+        changes = new_changes()
+        for day in set(expected) | set(stored):
+            for field in COUNTER_FIELDS:
+                delta = expected.get(day, {}).get(field, 0) - stored.get(day, {}).get(field, 0)
+                if delta:
+                    changes[day][field] = delta
+        if not dry_run:
+            apply_changes(changes)
+    return sorted(changes)
@@ -0,0 +1,220 @@
+"""Delta sync for API clients.
+
+`GET /api/v1/sync/?since=<token>` returns the vehicles, mileage records, service
+events and invoices of the caller (all of them for an admin, as in the viewsets)
+created or updated since the token, and the ids deleted since then, read from the
+Tombstone table filled by the post_delete handlers. Without a token, everything is
+returned. Each response carries the token of the next call.
+
+Every stream is read in `(updated_at, id)` order from its own keyset position, at
+most SYNC_PAGE_SIZE rows at a time (`has_more` then asks the client to call again
+right away). A transaction can commit after a later one, with an older
+`updated_at`: positions never move past a horizon, so rows written after it are
+sent again on the next call. Clients upsert by id, so a row seen twice is
+harmless; they apply `deleted` after `changes`.
+
+The horizon is `now - SYNC_OVERLAP_SECONDS`, moved back on PostgreSQL to the start
+of the oldest open transaction: a row's `updated_at` is set inside its
+transaction, so it is never older than the start of that transaction, however long
+the bulk ingest, compaction or recompute runs. Other backends only get the fixed
+overlap: there, writers must commit within SYNC_OVERLAP_SECONDS. A transaction
+held open longer than SYNC_MAX_TRANSACTION_SECONDS is logged, since it holds the
+horizon (and every client) back.
+
+Deleting a vehicle deletes its records, events and invoices: only the vehicle gets
+a tombstone. When a vehicle changes owner, the previous owner gets a tombstone for
+it, and its rows are touched so that the new owner receives them. Mileage history
+compaction (see rollup.py) is not a deletion and leaves no tombstone.
+"""
+import base64
+import json
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from .models import Invoice, MileageRecord, ServiceEvent, Tombstone, Vehicle
+from .serializers import InvoiceSerializer, MileageRecordSerializer, ServiceEventSerializer, VehicleSerializer
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_OVERLAP_SECONDS = 5
+DEFAULT_MAX_TRANSACTION_SECONDS = 600
+DEFAULT_TOMBSTONE_RETENTION_DAYS = 90
+DELETED_STREAM = 'deleted'
+
+# Response key -> (model, serializer, select_related)
+SYNC_STREAMS = {
+    'vehicles': (Vehicle, VehicleSerializer, ('owner',)),
+    'mileage_records': (MileageRecord, MileageRecordSerializer, ('vehicle', 'recorded_by')),
+    'service_events': (ServiceEvent, ServiceEventSerializer, ('vehicle', 'service_type')),
+    'invoices': (Invoice, InvoiceSerializer, ('vehicle__owner', 'uploaded_by')),
+}
+STREAM_NAMES = {model: name for name, (model, _, _) in SYNC_STREAMS.items()}
+
+logger = logging.getLogger(__name__)
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', DEFAULT_TOMBSTONE_RETENTION_DAYS))
+
+
+def record_deletion(instance, origin=None):
+    """Stores the tombstone of a deleted synced row (called from post_delete).
+
+    Rows deleted along with their vehicle are skipped: the vehicle's tombstone covers them.
+    """
+    stream = STREAM_NAMES[type(instance)]
+    if isinstance(instance, Vehicle):
+        owner_id = instance.owner_id
+    else:
+        deleted_directly = isinstance(origin, type(instance)) or (
+            isinstance(origin, QuerySet) and origin.model is type(instance)
+        )
+        if not deleted_directly:
+            return
+        owner_id = Vehicle.objects.filter(pk=instance.vehicle_id).values_list('owner_id', flat=True).first()
+    Tombstone.objects.create(stream=stream, object_id=instance.pk, owner_id=owner_id)
+
+
+def record_reassignment(vehicle, previous_owner_id):
+    """Called from post_save when a vehicle changed owner.
+
+    For the previous owner the vehicle is gone: a tombstone (its rows go with it on
+    the client). The new owner must receive the rows as well as the vehicle: they
+    are touched, without signals.
+    """
+    Tombstone.objects.create(stream=STREAM_NAMES[Vehicle], object_id=vehicle.pk, owner_id=previous_owner_id)
+    now = timezone.now()
+    for model in (MileageRecord, ServiceEvent, Invoice):
+        model.objects.filter(vehicle=vehicle).update(updated_at=now)
+
+
+def purge_tombstones(now=None):
+    """Deletes the tombstones older than the retention. Returns the number deleted."""
+    cutoff = (now or timezone.now()) - tombstone_retention()
+    return Tombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
+
+
+def oldest_open_transaction():
+    """Start of the oldest other transaction open on the database, or None (none open, or not PostgreSQL).
+
+    pg_stat_activity shows `xact_start` for the sessions of the same role, i.e. the application's.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND pid <> pg_backend_pid()"
+        )
+        return cursor.fetchone()[0]
+
+
+def sync_horizon(now):
+    """Latest position a token may reach: rows committed later are never older than this."""
+    horizon = now
+    oldest = oldest_open_transaction()
+    if oldest is not None and oldest < horizon:
+        horizon = oldest
+        lag = (now - oldest).total_seconds()
+        if lag > getattr(settings, 'SYNC_MAX_TRANSACTION_SECONDS', DEFAULT_MAX_TRANSACTION_SECONDS):
+            logger.warning("Sync horizon held back %.0f s by an open transaction", lag)
+    # The overlap also absorbs clock drift between the application servers and the database
+    return horizon - timedelta(seconds=getattr(settings, 'SYNC_OVERLAP_SECONDS', DEFAULT_OVERLAP_SECONDS))
+
+
+def encode_token(positions):
+    payload = json.dumps({name: [moment.isoformat(), pk] for name, (moment, pk) in positions.items()})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_token(token):
+    """Returns `{stream: (datetime, id)}`; raises ValueError for a malformed token."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        positions = {
+            name: (datetime.fromisoformat(moment), int(pk)) for name, (moment, pk) in payload.items()
+            if name in SYNC_STREAMS or name == DELETED_STREAM
+        }
+    except (TypeError, ValueError, AttributeError, UnicodeDecodeError):
+        raise ValueError("Jeton de synchronisation invalide.")
+    if any(timezone.is_naive(moment) for moment, _ in positions.values()):
+        raise ValueError("Jeton de synchronisation invalide.")
+    return positions
+
+
+def scoped_queryset(model, user):
+    """Rows of `model` the user may see, like the viewsets' get_queryset."""
+    if user.is_staff or user.is_superuser:
+        return model.objects.all()
+    if model is Vehicle:
+        return Vehicle.objects.filter(owner=user)
+    return model.objects.filter(vehicle__owner=user)
+
+
+def read_stream(queryset, time_field, position, limit, horizon):
+    """Returns `(rows, has_more, next position)` for the rows after `position` in `(time_field, id)` order."""
+    if position is not None:
+        moment, pk = position
+        queryset = queryset.filter(Q(**{f'{time_field}__gt': moment}) | Q(**{time_field: moment, 'pk__gt': pk}))
+    rows = list(queryset.order_by(time_field, 'pk')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    following = (horizon, 0)
+    if has_more:
+        last = (getattr(rows[-1], time_field), rows[-1].pk)
+        # Past the horizon the position cannot move: the rest comes once the horizon has
+        has_more = last < following
+        following = min(following, last)
+    if position is not None:
+        following = max(following, position)
+    return rows, has_more, following
+
+
+def sync_changes(user, token=None, context=None, limit=None, now=None):
+    """Changes visible to `user` since `token` (None for a full sync).
+
+    Returns `{'token', 'has_more', 'reset', 'changes': {stream: [...]}, 'deleted': {stream: [ids]}}`.
+    `reset` is true when the token is older than the tombstone retention: deletions
+    may have been missed, so everything is sent again and the client must drop the
+    rows it holds that are not in the response. Raises ValueError for an invalid token.
+    """
+    now = now or timezone.now()
+    limit = limit or getattr(settings, 'SYNC_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    horizon = sync_horizon(now)
+    positions = decode_token(token) if token else {}
+    reset = bool(positions) and min(moment for moment, _ in positions.values()) < now - tombstone_retention()
+    if reset:
+        positions = {}
+
+    result = {'has_more': False, 'reset': reset, 'changes': {}, 'deleted': {name: [] for name in SYNC_STREAMS}}
+    following = {}
+    for name, (model, serializer_class, related) in SYNC_STREAMS.items():
+        queryset = scoped_queryset(model, user).select_related(*related)
+        rows, has_more, following[name] = read_stream(queryset, 'updated_at', positions.get(name), limit, horizon)
+        result['changes'][name] = serializer_class(rows, many=True, context=context or {}).data
+        result['has_more'] |= has_more
+
+    # A full sync has nothing to delete on the client
+    if positions:
+        tombstones = Tombstone.objects.all()
+        if not (user.is_staff or user.is_superuser):
+            tombstones = tombstones.filter(owner=user)
+        # A vehicle the user sees again (an admin, or an owner it came back to) is not deleted for them
+        tombstones = tombstones.exclude(
+            stream=STREAM_NAMES[Vehicle], object_id__in=scoped_queryset(Vehicle, user).values('pk')
+        )
+        rows, has_more, following[DELETED_STREAM] = read_stream(
+            tombstones, 'deleted_at', positions.get(DELETED_STREAM), limit, horizon
+        )
+        for tombstone in rows:
+            result['deleted'][tombstone.stream].append(tombstone.object_id)
+        result['has_more'] |= has_more
+    else:
+        following[DELETED_STREAM] = (horizon, 0)
+
+    result['token'] = encode_token(following)
+    return result
@@ -0,0 +1,140 @@
+"""Streaming odometer telemetry ingest.
+
+Connected vehicles push readings as NDJSON (one `{"vehicle_id", "mileage",
+"recorded_at"}` object per line). `ingest_telemetry` reads the body line by line,
+so memory stays bounded whatever its size, and keeps one reading per vehicle per
+TELEMETRY_RESOLUTION_MINUTES bucket: the highest mileage, i.e. the last position of
+the odometer in that window. Survivors are stored in batches of TELEMETRY_BATCH_SIZE
+through `garage.ingest.ingest_mileage_readings` (bulk insert, monotonic check, one
+recompute per vehicle), so a high-frequency feed costs neither one row nor one
+signal per reading.
+
+Devices are expected to send each vehicle's readings in chronological order: a
+reading for a bucket older than the one being collected is dropped.
+"""
+import json
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .ingest import ingest_mileage_readings
+
+DEFAULT_RESOLUTION_MINUTES = 60
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+MAX_MILEAGE = 2147483647
+
+
+def telemetry_resolution():
+    return getattr(settings, 'TELEMETRY_RESOLUTION_MINUTES', DEFAULT_RESOLUTION_MINUTES) * 60
+
+
+def parse_reading(line, now):
+    """Returns `(vehicle_id, mileage, recorded_at)` for one NDJSON line.
+
+    Raises ValueError with a `{field: [message]}` dict. Deliberately lighter than a
+    DRF serializer: this runs once per telemetry point.
+    """
+    try:
+        data = json.loads(line)
+    except ValueError:
+        raise ValueError({'non_field_errors': ["JSON invalide."]})
+    if not isinstance(data, dict):
+        raise ValueError({'non_field_errors': ["Un objet JSON est attendu."]})
+
+    errors = {}
+    vehicle_id, mileage = data.get('vehicle_id'), data.get('mileage')
+    if type(vehicle_id) is not int or vehicle_id < 1:
+        errors['vehicle_id'] = ["Un identifiant de véhicule entier est requis."]
+    if type(mileage) is not int or not 0 < mileage <= MAX_MILEAGE:
+        errors['mileage'] = ["Le kilométrage doit être un nombre positif."]
+    recorded_at = data.get('recorded_at')
+    if recorded_at is None:
+        recorded_at = now
+    else:
+        try:
+            recorded_at = parse_datetime(recorded_at) if isinstance(recorded_at, str) else None
+        except ValueError:
+            recorded_at = None
+        if recorded_at is None:
+            errors['recorded_at'] = ["Date invalide (ISO 8601 attendu)."]
+        elif timezone.is_naive(recorded_at):
+            recorded_at = timezone.make_aware(recorded_at)
+    if errors:
+        raise ValueError(errors)
+    return vehicle_id, mileage, recorded_at
+
+
+class TelemetryIngest:
+    """Downsamples a stream of readings and stores the survivors in batches."""
+
+    def __init__(self, recorded_by=None, owner=None, resolution=None, batch_size=None):
+        self.recorded_by = recorded_by
+        self.owner = owner
+        self.resolution = resolution or telemetry_resolution()
+        self.batch_size = batch_size or getattr(settings, 'TELEMETRY_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.buckets = {} # vehicle_id -> (bucket, line, mileage, recorded_at) being collected
+        self.pending = []
+        self.stats = {'lines': 0, 'created': 0, 'downsampled': 0, 'error_count': 0, 'errors': []}
+
+    def add_error(self, line, errors):
+        self.stats['error_count'] += 1
+        if len(self.stats['errors']) < MAX_REPORTED_ERRORS:
+            self.stats['errors'].append({'line': line, 'errors': errors})
+
+    def add(self, line, vehicle_id, mileage, recorded_at):
+        bucket = int(recorded_at.timestamp()) // self.resolution
+        current = self.buckets.get(vehicle_id)
+        if current is None or bucket > current[0]:
+            if current is not None:
+                self.pending.append((current[1], vehicle_id, current[2], current[3]))
+                if len(self.pending) >= self.batch_size:
+                    self.flush()
+            self.buckets[vehicle_id] = (bucket, line, mileage, recorded_at)
+            return
+        self.stats['downsampled'] += 1
+        if bucket == current[0] and (mileage, recorded_at) > (current[2], current[3]):
+            self.buckets[vehicle_id] = (bucket, line, mileage, recorded_at)
+
+    def flush(self):
+        if not self.pending:
+            return
+        readings, self.pending = self.pending, []
+        result = ingest_mileage_readings(
+            readings, recorded_by=self.recorded_by, source='TELEMETRY', owner=self.owner,
+        )
+        self.stats['created'] += result['created']
+        for error in result['errors']:
+            self.add_error(error['row'], error['errors'])
+
+    def close(self):
+        """Stores the readings of the buckets still being collected and returns the stats."""
+        for vehicle_id, (_, line, mileage, recorded_at) in self.buckets.items():
+            self.pending.append((line, vehicle_id, mileage, recorded_at))
+        self.buckets = {}
+        self.flush()
+        self.stats['errors'].sort(key=lambda error: error['line'])
+        return self.stats
+
+
+def ingest_telemetry(stream, recorded_by=None, owner=None, resolution=None, batch_size=None):
+    """Reads NDJSON readings from a binary `stream` and stores one per vehicle per bucket.
+
+    With `owner`, readings for vehicles of other users are rejected. Returns
+    `{'lines', 'created', 'downsampled', 'error_count', 'errors'}`; at most
+    MAX_REPORTED_ERRORS errors are listed, each as `{'line': n, 'errors': {...}}`.
+    """
+    ingest = TelemetryIngest(recorded_by=recorded_by, owner=owner, resolution=resolution, batch_size=batch_size)
+    now = timezone.now()
+    for number, line in enumerate(iter(stream.readline, b''), start=1):
+        ingest.stats['lines'] = number
+        if not line.strip():
+            continue
+        try:
+            vehicle_id, mileage, recorded_at = parse_reading(line, now)
+        except ValueError as exc:
+            ingest.add_error(number, exc.args[0])
+            continue
+        ingest.add(number, vehicle_id, mileage, recorded_at)
+    return ingest.close()
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..activity import activity_feed
+from ..models import Vehicle, MileageRecord, ServiceType, ServiceEvent, Invoice
+
+User = get_user_model()
+
+class ActivityFeedTests(APITestCase):
+    """Tests for the merged activity feed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='activityowner', password='testpassword123')
+        cls.other = User.objects.create_user(username='activityother', password='testpassword123')
+        cls.admin_user = User.objects.create_user(
+            username='activityadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Act', model='A1', registration_number='81TU8181', initial_mileage=0
+        )
+        cls.foreign = Vehicle.objects.create(
+            owner=cls.other, make='Act', model='A2', registration_number='82TU8282', initial_mileage=0
+        )
+        now = timezone.now()
+        for days_ago in range(6, 0, -1):
+            MileageRecord.objects.create(
+                vehicle=cls.vehicle, mileage=1000 * (7 - days_ago), recorded_at=now - timedelta(days=days_ago),
+                recorded_by=cls.owner,
+            )
+        MileageRecord.objects.create(vehicle=cls.foreign, mileage=500, recorded_at=now - timedelta(hours=1))
+        ServiceEvent.objects.create(
+            vehicle=cls.vehicle, service_type=ServiceType.objects.create(name="Vidange Activité"), mileage_at_service=6000
+        )
+        Invoice.objects.create(
+            vehicle=cls.vehicle, final_amount=Decimal('120.00'),
+            pdf_file=SimpleUploadedFile('facture.pdf', b'%PDF-1.4', content_type='application/pdf'),
+        )
+        cls.url = reverse('activity')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.owner)
+
+    def test_pages_follow_the_timeline(self):
+        self.client.force_authenticate(user=self.admin_user)
+        everything = activity_feed(limit=50)['results']
+        # 2 vehicles, 7 readings, 1 event, 1 invoice
+        self.assertEqual(len(everything), 11)
+        keys = [(item['at'], item['type'], item['id']) for item in everything]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+        seen, before = [], None
+        while True:
+            params = {'limit': 4, **({'before': before} if before else {})}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url, params)
+            # The union, then one query per type on the page
+            self.assertLessEqual(len(queries), 5)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [(item['type'], item['id']) for item in response.data['results']]
+            before = response.data['next']
+            if before is None:
+                break
+        self.assertEqual(seen, [(item['type'], item['id']) for item in everything])
+
+    def test_items_and_scope(self):
+        results = self.client.get(self.url).data['results']
+        self.assertNotIn('82TU8282', {item['registration_number'] for item in results})
+        self.assertEqual(results[-1], {
+            'type': 'mileage', 'id': MileageRecord.objects.filter(vehicle=self.vehicle).earliest('recorded_at').pk,
+            'at': results[-1]['at'], 'registration_number': '81TU8181', 'value': 1000, 'user': 'activityowner',
+        })
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'before': 'pas-un-curseur'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('before', response.data)
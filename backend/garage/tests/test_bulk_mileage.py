@@ -0,0 +1,133 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Vehicle, MileageRecord
+from .. import jobs
+
+User = get_user_model()
+
+class BulkMileageTests(APITestCase):
+    """Tests for the bulk mileage import endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='bulkowner', password='testpassword123')
+        cls.other = User.objects.create_user(username='bulkother', password='testpassword123')
+        cls.admin_user = User.objects.create_user(
+            username='bulkadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Bulk', model='B1', registration_number='31TU3131', initial_mileage=1000
+        )
+        cls.other_vehicle = Vehicle.objects.create(
+            owner=cls.other, make='Bulk', model='B2', registration_number='32TU3232', initial_mileage=2000
+        )
+        cls.url = reverse('mileagerecord-bulk')
+        cls.now = timezone.now().replace(microsecond=0)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def at(self, days_ago):
+        return (self.now - timedelta(days=days_ago)).isoformat()
+
+    def test_json_rows_are_sorted_per_vehicle(self):
+        rows = [
+            {'vehicle_id': self.vehicle.pk, 'mileage': 1600, 'recorded_at': self.at(0)},
+            {'vehicle_id': self.other_vehicle.pk, 'mileage': 2500, 'recorded_at': self.at(3)},
+            {'vehicle_id': self.vehicle.pk, 'mileage': 1200, 'recorded_at': self.at(10)},
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'created': 3, 'vehicles': 2, 'errors': []})
+
+        self.vehicle.refresh_from_db()
+        self.assertEqual((self.vehicle.first_mileage, self.vehicle.latest_mileage), (1200, 1600))
+        self.assertEqual(MileageRecord.objects.filter(vehicle=self.other_vehicle, source='ADMIN').count(), 1)
+
+    def test_matches_sequential_saves(self):
+        """Aggregates and daily KM estimate are the same as with one save per row."""
+        readings = [(1100, 30), (1400, 20), (1900, 5), (2000, 1)]
+        self.client.post(self.url, [
+            {'vehicle_id': self.vehicle.pk, 'mileage': mileage, 'recorded_at': self.at(days)}
+            for mileage, days in readings
+        ], format='json')
+        for mileage, days in readings:
+            MileageRecord.objects.create(
+                vehicle=self.other_vehicle, mileage=mileage, recorded_at=self.now - timedelta(days=days)
+            )
+        fields = ('first_mileage', 'first_mileage_at', 'latest_mileage', 'latest_mileage_at',
+                  'daily_km_ewma', 'daily_km_ewma_mileage', 'daily_km_ewma_at')
+        bulk, sequential = (
+            Vehicle.objects.filter(pk=pk).values(*fields).get() for pk in (self.vehicle.pk, self.other_vehicle.pk)
+        )
+        self.assertEqual(bulk, sequential)
+
+    def test_invalid_rows_are_reported_without_aborting(self):
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=5000, recorded_at=self.now - timedelta(days=5))
+        rows = [
+            {'vehicle_id': self.vehicle.pk, 'mileage': 5200, 'recorded_at': self.at(1)},
+            {'vehicle_id': self.vehicle.pk, 'mileage': 4000, 'recorded_at': self.at(2)},
+            {'vehicle_id': self.vehicle.pk, 'mileage': -3},
+            {'vehicle_id': 999999, 'mileage': 100},
+            'pas un objet',
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4, 5])
+        self.assertIn('mileage', response.data['errors'][0]['errors'])
+        self.assertIn('vehicle_id', response.data['errors'][2]['errors'])
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.latest_mileage, 5200)
+
+    def test_csv_upload(self):
+        body = (
+            "vehicle_id,mileage,recorded_at\n"
+            f"{self.vehicle.pk},1300,{self.at(2)}\n"
+            f"{self.vehicle.pk},1350,\n"
+            f"{self.vehicle.pk},abc,{self.at(1)}\n"
+        )
+        response = self.client.post(self.url, body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3])
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.latest_mileage, 1350)
+
+    def test_customer_can_only_import_own_vehicles(self):
+        self.client.force_authenticate(user=self.owner)
+        rows = [
+            {'vehicle_id': self.vehicle.pk, 'mileage': 1500},
+            {'vehicle_id': self.other_vehicle.pk, 'mileage': 2500},
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertEqual(MileageRecord.objects.get(vehicle=self.vehicle).source, 'CUSTOMER')
+        self.assertFalse(MileageRecord.objects.filter(vehicle=self.other_vehicle).exists())
+
+    def test_one_recompute_per_vehicle_and_bounded_queries(self):
+        rows = [
+            {'vehicle_id': vehicle.pk, 'mileage': 3000 + i * 10, 'recorded_at': self.at(100 - i)}
+            for i in range(50) for vehicle in (self.vehicle, self.other_vehicle)
+        ]
+        with mock.patch.object(jobs, 'enqueue_vehicle_recompute') as enqueue:
+            # Savepoint, lock, insert, update, dashboard counter upsert, release
+            with self.assertNumQueries(6):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.data['created'], 100)
+        enqueue.assert_called_once()
+        self.assertEqual(sorted(enqueue.call_args.args[0]), sorted([self.vehicle.pk, self.other_vehicle.pk]))
+
+    def test_rejects_non_list_body(self):
+        response = self.client.post(self.url, {'vehicle_id': self.vehicle.pk, 'mileage': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Vehicle, MileageRecord, ServiceType, ServiceEvent, ServicePrediction
+from ..predictions import upsert_predictions
+
+User = get_user_model()
+
+class ConditionalGetTests(APITestCase):
+    """Tests for the ETag / Last-Modified validators of the read endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='etagowner', password='testpassword123')
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Etag', model='E1', registration_number='61TU6161', initial_mileage=100
+        )
+        cls.record = MileageRecord.objects.create(
+            vehicle=cls.vehicle, mileage=1000, recorded_at=timezone.now() - timedelta(days=2)
+        )
+        cls.service_type = ServiceType.objects.create(name="Vidange Etag")
+        cls.event = ServiceEvent.objects.create(
+            vehicle=cls.vehicle, service_type=cls.service_type, event_date=timezone.now().date(), mileage_at_service=900
+        )
+        cls.url = reverse('mileagerecord-list')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.owner)
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        # One aggregate query, nothing serialized
+        with self.assertNumQueries(1):
+            response = self.revalidate(self.url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500)
+        response = self.revalidate(self.url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        MileageRecord.objects.filter(pk=self.record.pk).update(mileage=1001)
+        response = self.revalidate(self.url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        MileageRecord.objects.filter(pk=self.record.pk).delete()
+        self.assertEqual(self.revalidate(self.url, etag).status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query_parameters(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.revalidate(self.url, etag, fields='id')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_embedded_vehicle_changes_invalidate_events(self):
+        url = reverse('serviceevent-list')
+        etag = self.client.get(url)['ETag']
+        # Reading does not write: the validators are stable
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        before = ServiceEvent.objects.get(pk=self.event.pk).updated_at
+
+        # The mileage aggregates are written with queryset.update(), which bumps updated_at
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=2000)
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(ServiceEvent.objects.get(pk=self.event.pk).updated_at, before)
+
+    def test_detail_if_modified_since(self):
+        url = reverse('vehicle-detail', args=[self.vehicle.pk])
+        response = self.client.get(url)
+        self.assertEqual(response['Last-Modified'], http_date(self.vehicle.updated_at.timestamp()))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_other_users_rows_are_not_visible_in_the_validators(self):
+        etag = self.client.get(self.url)['ETag']
+        other = User.objects.create_user(username='etagother', password='testpassword123')
+        other_vehicle = Vehicle.objects.create(
+            owner=other, make='Etag', model='E2', registration_number='62TU6262', initial_mileage=100
+        )
+        MileageRecord.objects.create(vehicle=other_vehicle, mileage=500)
+        self.assertEqual(self.revalidate(self.url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_upsert_only_touches_changed_predictions(self):
+        prediction = ServicePrediction(
+            vehicle=self.vehicle, service_type=self.service_type, predicted_due_mileage=5000, km_remaining=4000,
+        )
+        upsert_predictions([prediction])
+        stored = ServicePrediction.objects.get(vehicle=self.vehicle)
+        upsert_predictions([ServicePrediction(
+            vehicle=self.vehicle, service_type=self.service_type, predicted_due_mileage=5000, km_remaining=4000,
+        )])
+        self.assertEqual(ServicePrediction.objects.get(pk=stored.pk).updated_at, stored.updated_at)
+        upsert_predictions([ServicePrediction(
+            vehicle=self.vehicle, service_type=self.service_type, predicted_due_mileage=6000, km_remaining=5000,
+        )])
+        self.assertGreater(ServicePrediction.objects.get(pk=stored.pk).updated_at, stored.updated_at)
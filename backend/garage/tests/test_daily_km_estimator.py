@@ -0,0 +1,75 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..mileage import fold_daily_km
+from ..models import Vehicle, MileageRecord
+
+User = get_user_model()
+
+@override_settings(DAILY_KM_HALF_LIFE_DAYS=10)
+class DailyKmEstimatorTests(TestCase):
+    """Tests for the exponentially-weighted daily KM estimate stored on Vehicle."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='ewmaowner', password='testpassword123')
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Ewma', model='E1', registration_number='31TU3131', initial_mileage=0
+        )
+        cls.start = timezone.now() - timedelta(days=100)
+
+    def record(self, day, mileage):
+        return MileageRecord.objects.create(vehicle=self.vehicle, mileage=mileage, recorded_at=self.start + timedelta(days=day))
+
+    def estimate(self):
+        self.vehicle.refresh_from_db()
+        return self.vehicle.daily_km_ewma
+
+    def test_fold_weights_by_half_life(self):
+        now = timezone.now()
+        self.assertEqual(fold_daily_km(None, None, None, 100, now, 10), (None, 100, now))
+        # First interval: the estimate is the observed rate
+        self.assertEqual(fold_daily_km(None, 100, now, 600, now + timedelta(days=10), 10)[0], 50)
+        # One half-life later, the new rate weighs half
+        self.assertEqual(fold_daily_km(50, 600, now, 1600, now + timedelta(days=10), 10)[0], 75)
+        # Back-dated readings leave the state unchanged
+        self.assertEqual(fold_daily_km(50, 600, now, 500, now - timedelta(days=1), 10), (50, 600, now))
+
+    def test_estimate_follows_recent_driving(self):
+        self.record(0, 0)
+        self.assertIsNone(self.estimate())
+        for day in range(10, 60, 10):
+            self.record(day, day * 20)
+        self.assertAlmostEqual(self.estimate(), 20)
+        for day in range(60, 100, 10):
+            self.record(day, 1000 + (day - 50) * 80)
+        # Much closer to the new 80 km/day than the 38 km/day first/last average
+        self.assertGreater(self.estimate(), 70)
+
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.daily_km_ewma_mileage, self.vehicle.latest_mileage)
+        self.assertEqual(self.vehicle.daily_km_ewma_at, self.vehicle.latest_mileage_at)
+
+    def test_backfill_command_replays_history(self):
+        for day in range(0, 100, 7):
+            self.record(day, day * day)
+        expected = self.estimate()
+        Vehicle.objects.update(daily_km_ewma=None, daily_km_ewma_mileage=None, daily_km_ewma_at=None)
+
+        out = StringIO()
+        call_command('backfill_daily_km', stdout=out)
+        self.assertIn('1 estimations recalculées', out.getvalue())
+        self.assertAlmostEqual(self.estimate(), expected)
+
+    def test_delete_replays_history(self):
+        self.record(0, 0)
+        self.record(10, 200)
+        latest = self.record(20, 2000)
+        latest.delete()
+        self.assertAlmostEqual(self.estimate(), 20)
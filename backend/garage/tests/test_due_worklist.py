@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from ..models import Vehicle, ServiceType, ServicePrediction
+
+User = get_user_model()
+
+class DueWorklistTests(APITestCase):
+    """Tests for the keyset-paginated "due soon" worklist."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='dueowner', password='testpassword123')
+        cls.other = User.objects.create_user(username='dueother', password='testpassword123')
+        cls.admin_user = User.objects.create_user(
+            username='dueadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        today = timezone.localdate()
+        # (owner, days until due or None, km remaining)
+        rows = [
+            (cls.owner, 10, 5000), (cls.owner, 10, 200), (cls.other, 3, 8000), (cls.owner, None, 500),
+            (cls.owner, 90, -100), (cls.other, 45, 3000), (cls.owner, None, 2000), (cls.owner, -5, 9000),
+        ]
+        cls.expected = {}
+        for i, (owner, days, km) in enumerate(rows):
+            service_type = ServiceType.objects.create(name=f"Service Due {i}")
+            vehicle = Vehicle.objects.create(
+                owner=owner, make='Due', model=f'D{i}', registration_number=f'{i + 1}TU500{i}', initial_mileage=0
+            )
+            prediction = ServicePrediction.objects.create(
+                vehicle=vehicle, service_type=service_type, km_remaining=km, predicted_due_mileage=10000 + km,
+                predicted_due_date=today + timedelta(days=days) if days is not None else None,
+            )
+            cls.expected[(days, km)] = prediction.pk
+        cls.url = reverse('serviceprediction-due')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def key(self, pk):
+        return next(key for key, value in self.expected.items() if value == pk)
+
+    def test_worklist_is_filtered_and_sorted_by_urgency(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        keys = [self.key(row['id']) for row in response.data['results']]
+        self.assertEqual(keys, [(-5, 9000), (3, 8000), (10, 200), (10, 5000), (90, -100), (None, 500)])
+        row = response.data['results'][0]
+        self.assertEqual(row['vehicle_label'], 'Due D7')
+        self.assertEqual(row['owner_username'], 'dueowner')
+        self.assertNotIn('vehicle_info', row)
+
+        response = self.client.get(self.url, {'within_days': 0, 'within_km': 0})
+        self.assertEqual([self.key(row['id']) for row in response.data['results']], [(-5, 9000), (90, -100)])
+
+    def test_keyset_pages_forward_and_back(self):
+        response = self.client.get(self.url, {'within_days': 60, 'within_km': 3000, 'page_size': 3})
+        pagination = response.json()['metadata']['pagination']
+        self.assertIsNone(pagination['previous'])
+        seen = [row['id'] for row in response.data['results']]
+        while response.data['next']:
+            next_url = response.data['next']
+            response = self.client.get(next_url)
+            seen += [row['id'] for row in response.data['results']]
+        self.assertEqual([self.key(pk) for pk in seen], [
+            (-5, 9000), (3, 8000), (10, 200), (10, 5000), (45, 3000), (90, -100), (None, 500), (None, 2000),
+        ])
+
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual([row['id'] for row in previous.data['results']], seen[3:6])
+        self.assertEqual(self.client.get(self.url, {'cursor': 'abc'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_client_sees_only_own_vehicles(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url)
+        owners = {row['owner_username'] for row in response.data['results']}
+        self.assertEqual(owners, {'dueowner'})
+        self.assertEqual(self.client.get(self.url, {'within_km': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from ..forecast import forecast_cache
+from ..models import Vehicle, MileageRecord, ServiceType, ServiceEvent, PredictionRule, ServicePrediction, PredictionJob
+
+User = get_user_model()
+
+class ForecastAPITests(APITestCase):
+    """Tests for the side-effect-free vehicle forecast endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='forecastowner', password='testpassword123')
+        cls.other = User.objects.create_user(username='forecastother', password='testpassword123')
+        cls.vidange = ServiceType.objects.create(name="Vidange Prévision")
+        PredictionRule.objects.create(service_type=cls.vidange, interval_km=10000, interval_months=12)
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Forecast', model='F1', registration_number='41TU4141', initial_mileage=10000
+        )
+        now = timezone.now()
+        MileageRecord.objects.create(vehicle=cls.vehicle, mileage=10000, recorded_at=now - timedelta(days=100), source='INITIAL')
+        MileageRecord.objects.create(vehicle=cls.vehicle, mileage=15000, recorded_at=now, source='ADMIN')
+        cls.url = reverse('vehicle-forecast', kwargs={'pk': cls.vehicle.pk})
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+        forecast_cache.clear()
+
+    def test_forecast_is_computed_without_writing(self):
+        jobs = PredictionJob.objects.count()
+        as_of = timezone.localdate() + timedelta(days=20)
+        response = self.client.get(self.url, {'as_of': as_of.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # 50 km/day projected over 20 days
+        self.assertEqual(response.data['mileage'], 16000)
+        prediction, = response.data['predictions']
+        self.assertEqual(prediction['service_type_name'], "Vidange Prévision")
+        self.assertEqual(prediction['predicted_due_mileage'], 20000)
+        self.assertEqual(prediction['predicted_due_date'], as_of + timedelta(days=80))
+        self.assertFalse(prediction['is_due'])
+        self.assertFalse(ServicePrediction.objects.exists())
+        self.assertEqual(PredictionJob.objects.count(), jobs)
+
+        response = self.client.get(self.url, {'as_of': as_of.isoformat(), 'mileage': 21000})
+        self.assertTrue(response.data['predictions'][0]['is_due'])
+
+    def test_forecast_is_cached_and_invalidated(self):
+        with self.assertNumQueries(5):
+            self.client.get(self.url, {'mileage': 17000})
+        self.assertEqual(len(forecast_cache), 1)
+        # Hit: the vehicle lookup and the rules and service history fingerprints
+        with self.assertNumQueries(3):
+            cached = self.client.get(self.url, {'mileage': 17000})
+        self.assertEqual(cached.data['predictions'][0]['predicted_due_mileage'], 20000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceEvent.objects.create(
+                vehicle=self.vehicle, service_type=self.vidange, event_date=date.today(), mileage_at_service=15000
+            )
+        self.assertEqual(len(forecast_cache), 0)
+        response = self.client.get(self.url, {'mileage': 17000})
+        self.assertEqual(response.data['predictions'][0]['predicted_due_mileage'], 25000)
+
+    def test_changes_from_other_processes_miss_the_cache(self):
+        """Without the on_commit invalidation (another process wrote), the fingerprint still changes."""
+        self.client.get(self.url, {'mileage': 17000})
+        event = ServiceEvent.objects.create(
+            vehicle=self.vehicle, service_type=self.vidange, event_date=date.today(), mileage_at_service=15000
+        )
+        self.assertEqual(len(forecast_cache), 1) # Not invalidated here
+        response = self.client.get(self.url, {'mileage': 17000})
+        self.assertEqual(response.data['predictions'][0]['predicted_due_mileage'], 25000)
+
+        ServiceEvent.objects.filter(pk=event.pk).delete()
+        response = self.client.get(self.url, {'mileage': 17000})
+        self.assertEqual(response.data['predictions'][0]['predicted_due_mileage'], 20000)
+
+        PredictionRule.objects.filter(service_type=self.vidange).update(interval_km=12000)
+        response = self.client.get(self.url, {'mileage': 17000})
+        self.assertEqual(response.data['predictions'][0]['predicted_due_mileage'], 22000)
+
+        ServiceType.objects.filter(pk=self.vidange.pk).update(name="Vidange Renommée")
+        response = self.client.get(self.url, {'mileage': 17000})
+        self.assertEqual(response.data['predictions'][0]['service_type_name'], "Vidange Renommée")
+
+    def test_invalid_parameters_and_permissions(self):
+        response = self.client.get(self.url, {'as_of': '01/02/2024', 'mileage': -5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
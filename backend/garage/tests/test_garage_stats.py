@@ -0,0 +1,210 @@
+import threading
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from ..ingest import ingest_mileage_readings
+from ..models import GarageStats, GarageStatsDelta, Vehicle, MileageRecord, ServiceType, ServiceEvent, Invoice
+from ..rollup import compact_mileage_history
+from .. import dashboard, stats
+from ..stats import COUNTER_FIELDS, computed_stats, fold_stats, reconcile_stats, stored_stats
+
+User = get_user_model()
+
+class GarageStatsTests(TestCase):
+    """Tests for the per-day dashboard counters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='statsowner', password='testpassword123')
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Stat', model='S1', registration_number='71TU7171', initial_mileage=0
+        )
+        cls.service_type = ServiceType.objects.create(name="Vidange Stats")
+        cls.today = timezone.localdate()
+
+    def counters(self, day):
+        counters = stored_stats().get(day)
+        return {field: counters[field] for field in COUNTER_FIELDS} if counters else {}
+
+    def assertMatchesSource(self):
+        self.assertEqual(reconcile_stats(dry_run=True), [])
+
+    def test_create_update_and_delete(self):
+        self.assertEqual(self.counters(self.today)['vehicles'], 1)
+        event = ServiceEvent.objects.create(
+            vehicle=self.vehicle, service_type=self.service_type, event_date=self.today, mileage_at_service=0
+        )
+        invoice = Invoice.objects.create(
+            vehicle=self.vehicle, final_amount=Decimal('80.00'), invoice_date=self.today,
+            pdf_file=SimpleUploadedFile('facture.pdf', b'%PDF-1.4', content_type='application/pdf'),
+        )
+        self.assertEqual(self.counters(self.today)['invoiced_amount'], Decimal('80.00'))
+
+        # Moving a row to another day moves its contribution
+        later = self.today + timedelta(days=5)
+        event.event_date = later
+        event.save()
+        invoice.final_amount = Decimal('95.50')
+        invoice.save()
+        self.assertEqual(self.counters(self.today)['service_events'], 0)
+        self.assertEqual(self.counters(later)['service_events'], 1)
+        self.assertEqual(self.counters(self.today)['invoiced_amount'], Decimal('95.50'))
+
+        invoice.delete()
+        self.assertEqual(self.counters(self.today)['invoices'], 0)
+        self.assertMatchesSource()
+
+    def test_writes_append_deltas_until_folded(self):
+        fold_stats()
+        self.assertFalse(GarageStatsDelta.objects.exists())
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=100)
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=200)
+        # The day's row is not touched by the writes
+        self.assertEqual(GarageStats.objects.get(day=self.today).mileage_records, 0)
+        self.assertEqual(GarageStatsDelta.objects.count(), 2)
+        self.assertEqual(self.counters(self.today)['mileage_records'], 2)
+
+        self.assertEqual(fold_stats(batch_size=1), 2)
+        self.assertFalse(GarageStatsDelta.objects.exists())
+        self.assertEqual(GarageStats.objects.get(day=self.today).mileage_records, 2)
+        self.assertMatchesSource()
+
+    def test_fold_during_reconcile(self):
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=100)
+        self.assertTrue(GarageStatsDelta.objects.exists())
+        # Both tables in one statement: a fold is seen entirely or not at all
+        with self.assertNumQueries(1):
+            self.assertEqual(stored_stats()[self.today]['mileage_records'], 1)
+
+        def computed_then_folded(*args, **kwargs):
+            expected = computed_stats(*args, **kwargs)
+            fold_stats()
+            return expected
+        with mock.patch.object(stats, 'computed_stats', side_effect=computed_then_folded):
+            self.assertEqual(reconcile_stats(), [])
+        self.assertFalse(GarageStatsDelta.objects.exists())
+        self.assertMatchesSource()
+
+    def test_dashboard_folds_when_the_worker_lags(self):
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=100)
+        with mock.patch.object(dashboard, 'FOLD_ON_READ_THRESHOLD', 0):
+            dashboard.dashboard_stats()
+        self.assertFalse(GarageStatsDelta.objects.exists())
+        self.assertEqual(GarageStats.objects.get(day=self.today).mileage_records, 1)
+
+    def test_vehicle_cascade_subtracts_everything(self):
+        vehicle = Vehicle.objects.create(
+            owner=self.owner, make='Stat', model='S2', registration_number='72TU7272', initial_mileage=0
+        )
+        MileageRecord.objects.create(vehicle=vehicle, mileage=100)
+        ServiceEvent.objects.create(
+            vehicle=vehicle, service_type=self.service_type, event_date=self.today, mileage_at_service=100
+        )
+        vehicle.delete()
+        self.assertEqual(self.counters(self.today), {
+            'vehicles': 1, 'service_events': 0, 'invoices': 0, 'invoiced_amount': 0, 'mileage_records': 0,
+        })
+        self.assertMatchesSource()
+
+    def test_bulk_ingest_and_compaction_are_counted(self):
+        now = timezone.now()
+        readings = [(row, self.vehicle.pk, 1000 + row, now - timedelta(days=60 - row)) for row in range(4)]
+        self.assertEqual(ingest_mileage_readings(readings)['created'], 4)
+        self.assertMatchesSource()
+        compact_mileage_history(cutoff=now - timedelta(days=30))
+        self.assertFalse(MileageRecord.objects.filter(recorded_at__lt=now - timedelta(days=30)).exists())
+        self.assertMatchesSource()
+        self.assertEqual(sum(day['mileage_records'] for day in computed_stats().values()), 4)
+
+    def test_reconcile_command(self):
+        # Queryset updates bypass the signals
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(created_at=timezone.now() - timedelta(days=400))
+        old_day = timezone.localdate(Vehicle.objects.get(pk=self.vehicle.pk).created_at)
+        out = StringIO()
+        call_command('reconcile_garage_stats', '--dry-run', stdout=out)
+        self.assertIn("2 jours à corriger", out.getvalue())
+        self.assertEqual(self.counters(self.today)['vehicles'], 1)
+
+        call_command('reconcile_garage_stats', stdout=StringIO())
+        self.assertEqual(self.counters(self.today)['vehicles'], 0)
+        self.assertEqual(self.counters(old_day)['vehicles'], 1)
+        self.assertMatchesSource()
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Needs concurrent writers (PostgreSQL)")
+class ConcurrentGarageStatsTests(TransactionTestCase):
+    """Writers of the same day must not wait on each other for the counters."""
+    writers = 4
+
+    def test_writers_do_not_serialize_on_the_day(self):
+        owner = User.objects.create_user(username='statsrace', password='testpassword123')
+        # Every writer holds its transaction open until all of them have written
+        barrier = threading.Barrier(self.writers, timeout=10)
+        errors = []
+
+        def write(index):
+            try:
+                with transaction.atomic():
+                    Vehicle.objects.create(
+                        owner=owner, make='Stat', model='Race', registration_number=f'9{index}TU9090', initial_mileage=0
+                    )
+                    barrier.wait()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=write, args=(index,)) for index in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+        fold_stats()
+        self.assertEqual(GarageStats.objects.get(day=timezone.localdate()).vehicles, self.writers)
+        self.assertEqual(reconcile_stats(dry_run=True), [])
+
+    def test_fold_waits_for_reconcile(self):
+        owner = User.objects.create_user(username='statsfold', password='testpassword123')
+        Vehicle.objects.create(owner=owner, make='Stat', model='Fold', registration_number='95TU9595', initial_mileage=0)
+        computed, resume = threading.Event(), threading.Event()
+        results = {}
+
+        def computed_then_paused(*args, **kwargs):
+            expected = computed_stats(*args, **kwargs)
+            computed.set()
+            resume.wait(10)
+            return expected
+
+        def run(name, func):
+            try:
+                results[name] = func()
+            finally:
+                connections.close_all()
+
+        with mock.patch.object(stats, 'computed_stats', side_effect=computed_then_paused):
+            reconciler = threading.Thread(target=run, args=('reconcile', reconcile_stats))
+            reconciler.start()
+            self.assertTrue(computed.wait(10))
+            folder = threading.Thread(target=run, args=('fold', fold_stats))
+            folder.start()
+            folder.join(1)
+            # Blocked on the advisory lock until the reconciliation commits
+            self.assertTrue(folder.is_alive())
+            resume.set()
+            reconciler.join()
+            folder.join()
+        self.assertEqual(results['reconcile'], [])
+        self.assertEqual(reconcile_stats(dry_run=True), [])
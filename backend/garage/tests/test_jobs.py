@@ -0,0 +1,223 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from django.test import TransactionTestCase
+from rest_framework.test import APITestCase, APIClient
+
+from ..models import Vehicle, MileageRecord, ServiceType, PredictionRule, ServicePrediction, PredictionJob
+from .. import jobs, predictions
+
+User = get_user_model()
+
+class PredictionJobQueueTests(APITestCase):
+    """Tests for the durable prediction recompute queue."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.client_user = User.objects.create_user(username='queueclient', password='testpassword123')
+        cls.admin_user = User.objects.create_user(
+            username='queueadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.service_type = ServiceType.objects.create(name="Vidange File")
+        PredictionRule.objects.create(service_type=cls.service_type, interval_km=10000, interval_months=12)
+        PredictionJob.objects.all().delete() # Queued for the new rule
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.client_user, make='Queue', model='Q1',
+            registration_number='12TU3456', initial_mileage=1000
+        )
+        cls.other_vehicle = Vehicle.objects.create(
+            owner=cls.client_user, make='Queue', model='Q2',
+            registration_number='13TU3456', initial_mileage=2000
+        )
+
+    def test_signal_only_enqueues(self):
+        """Saving a MileageRecord queues a job instead of computing predictions."""
+        with self.captureOnCommitCallbacks(execute=True):
+            MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500, source='ADMIN')
+        self.assertTrue(PredictionJob.objects.filter(vehicle=self.vehicle, status='PENDING').exists())
+        self.assertFalse(ServicePrediction.objects.exists())
+
+    def test_duplicate_jobs_collapse(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500, source='ADMIN')
+        with self.captureOnCommitCallbacks(execute=True):
+            MileageRecord.objects.create(vehicle=self.vehicle, mileage=1600, source='ADMIN')
+        jobs.enqueue_vehicle_recompute([self.vehicle.pk, self.vehicle.pk])
+        self.assertEqual(PredictionJob.objects.filter(vehicle=self.vehicle).count(), 1)
+
+    def test_recomputes_are_coalesced_per_transaction(self):
+        with mock.patch.object(jobs, 'enqueue_vehicle_recompute') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500, source='ADMIN')
+                MileageRecord.objects.create(vehicle=self.vehicle, mileage=1600, source='ADMIN')
+                MileageRecord.objects.create(vehicle=self.other_vehicle, mileage=2500, source='ADMIN')
+            self.assertEqual(len(callbacks), 1)
+            enqueue.assert_called_once_with({self.vehicle.pk, self.other_vehicle.pk})
+
+    def test_rolled_back_requests_are_dropped(self):
+        with mock.patch.object(jobs, 'enqueue_vehicle_recompute') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    jobs.schedule_vehicle_recompute([self.vehicle.pk])
+                    raise RuntimeError
+                jobs.schedule_vehicle_recompute([self.other_vehicle.pk])
+            enqueue.assert_called_once_with({self.other_vehicle.pk})
+
+    def test_service_event_request_queues_vehicle_once(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin_user)
+        with mock.patch.object(jobs, 'enqueue_vehicle_recompute') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post(reverse('serviceevent-list'), {
+                    'vehicle_id': self.vehicle.pk, 'service_type_id': self.service_type.pk,
+                    'event_date': timezone.now().isoformat(), 'mileage_at_service': 1500,
+                }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            enqueue.assert_called_once_with({self.vehicle.pk})
+
+    def test_deferred_recomputes_flush_once(self):
+        with mock.patch.object(jobs, 'enqueue_vehicle_recompute') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                with jobs.deferred_recomputes():
+                    with jobs.deferred_recomputes():
+                        MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500, source='ADMIN')
+                    MileageRecord.objects.create(vehicle=self.vehicle, mileage=1600, source='ADMIN')
+                    self.assertFalse(self.recompute_scheduled())
+            enqueue.assert_called_once_with({self.vehicle.pk})
+
+            # A failing block schedules nothing
+            enqueue.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), jobs.deferred_recomputes():
+                    MileageRecord.objects.create(vehicle=self.vehicle, mileage=1700, source='ADMIN')
+                    raise RuntimeError
+            enqueue.assert_not_called()
+
+    def recompute_scheduled(self):
+        pending_ref = getattr(connection, 'pending_recomputes', None)
+        pending = pending_ref() if pending_ref is not None else None
+        return pending is not None and not pending.flushed
+
+    def test_worker_processes_and_deletes_jobs(self):
+        jobs.enqueue_vehicle_recompute([self.vehicle.pk, self.other_vehicle.pk])
+        stats = jobs.run_pending_jobs()
+        self.assertEqual(stats, {'processed': 2, 'failed': 0})
+        self.assertFalse(PredictionJob.objects.exists())
+        self.assertEqual(ServicePrediction.objects.count(), 2)
+
+    def test_failed_job_backs_off_then_gives_up(self):
+        jobs.enqueue_vehicle_recompute([self.vehicle.pk])
+        with mock.patch.object(jobs, 'recompute_predictions', side_effect=RuntimeError('boom')):
+            stats = jobs.run_pending_jobs()
+            self.assertEqual(stats, {'processed': 0, 'failed': 1})
+            job = PredictionJob.objects.get(vehicle=self.vehicle)
+            self.assertEqual(job.attempts, 1)
+            self.assertGreater(job.run_after, timezone.now())
+            self.assertIn('boom', job.last_error)
+
+            # Not ready yet: nothing is claimed
+            self.assertEqual(jobs.run_pending_jobs(), {'processed': 0, 'failed': 0})
+
+            PredictionJob.objects.update(attempts=jobs.MAX_ATTEMPTS - 1, run_after=timezone.now() - timedelta(seconds=1))
+            jobs.run_pending_jobs()
+        self.assertEqual(PredictionJob.objects.get(vehicle=self.vehicle).status, 'FAILED')
+
+        # Re-enqueueing gives the vehicle a fresh start
+        jobs.enqueue_vehicle_recompute([self.vehicle.pk])
+        job = PredictionJob.objects.get(vehicle=self.vehicle)
+        self.assertEqual((job.status, job.attempts), ('PENDING', 0))
+
+    def test_queue_depth_metric(self):
+        jobs.enqueue_vehicle_recompute([self.vehicle.pk, self.other_vehicle.pk])
+        PredictionJob.objects.filter(vehicle=self.other_vehicle).update(status='FAILED')
+        depth = jobs.queue_depth()
+        self.assertEqual((depth['pending'], depth['ready'], depth['failed']), (1, 1, 1))
+
+        client = APIClient()
+        client.force_authenticate(user=self.client_user)
+        self.assertEqual(client.get(reverse('serviceprediction-queue')).status_code, status.HTTP_403_FORBIDDEN)
+        client.force_authenticate(user=self.admin_user)
+        response = client.get(reverse('serviceprediction-queue'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['pending'], 1)
+
+    def test_worker_command_once(self):
+        jobs.enqueue_vehicle_recompute([self.vehicle.pk])
+        out = StringIO()
+        call_command('ecar_worker', '--once', stdout=out)
+        self.assertIn('1 tâches traitées', out.getvalue())
+        self.assertFalse(PredictionJob.objects.exists())
+
+
+class ServiceTypeJobTests(TransactionTestCase):
+    """A fleet-wide rule change must commit chunk by chunk, not in the worker's claim transaction."""
+
+    def test_chunks_are_visible_before_the_job_ends(self):
+        owner = User.objects.create_user(username='chunkowner', password='testpassword123')
+        for i in range(3):
+            Vehicle.objects.create(
+                owner=owner, make='Chunk', model=f'C{i}', registration_number=f'{i + 1}TU5050', initial_mileage=1000
+            )
+        service_type = ServiceType.objects.create(name="Vidange Lots")
+        PredictionRule.objects.create(service_type=service_type, interval_km=10000)
+        PredictionJob.objects.exclude(service_type=service_type).delete() # Vehicle jobs of the creations
+
+        def count_elsewhere():
+            # Read from another connection: only committed rows are seen
+            counts = []
+            def read():
+                try:
+                    counts.append(ServicePrediction.objects.count())
+                finally:
+                    connections.close_all()
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join()
+            return counts[0]
+
+        seen = []
+        save_predictions = predictions.save_predictions
+        def save_chunk(*args, **kwargs):
+            changed = save_predictions(*args, **kwargs)
+            seen.append((count_elsewhere(), PredictionJob.objects.get(service_type=service_type).status))
+            return changed
+
+        with mock.patch.object(predictions, 'save_predictions', side_effect=save_chunk), \
+                mock.patch.object(jobs, 'apply_rule_change', lambda pk: predictions.apply_rule_change(pk, chunk_size=1)):
+            self.assertEqual(jobs.run_pending_jobs(), {'processed': 1, 'failed': 0})
+        self.assertEqual(seen, [(1, 'RUNNING'), (2, 'RUNNING'), (3, 'RUNNING')])
+        self.assertFalse(PredictionJob.objects.exists())
+
+    def test_job_enqueued_again_while_running_is_kept(self):
+        service_type = ServiceType.objects.create(name="Freins Lots")
+        PredictionRule.objects.create(service_type=service_type, interval_km=20000)
+        rerun = lambda pk: jobs.enqueue_service_type_recompute([pk])
+        with mock.patch.object(jobs, 'apply_rule_change', side_effect=rerun):
+            self.assertEqual(jobs.run_pending_jobs(), {'processed': 1, 'failed': 0})
+        self.assertEqual(PredictionJob.objects.get(service_type=service_type).status, 'PENDING')
+
+
+class PendingRecomputeTests(TransactionTestCase):
+    """The pending set follows real transactions (TestCase never commits)."""
+
+    def test_pending_set_is_dropped_on_rollback_and_flushed_once_on_commit(self):
+        with mock.patch.object(jobs, 'enqueue_vehicle_recompute') as enqueue:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                jobs.schedule_vehicle_recompute([1])
+                raise RuntimeError
+            with transaction.atomic():
+                jobs.schedule_vehicle_recompute([2])
+                with transaction.atomic():
+                    jobs.schedule_vehicle_recompute([3])
+                enqueue.assert_not_called()
+            jobs.schedule_vehicle_recompute([4]) # Autocommit: queued right away
+        self.assertEqual(enqueue.call_args_list, [mock.call({2, 3}), mock.call({4})])
@@ -0,0 +1,111 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Vehicle, MileageRecord, ServiceType, ServiceEvent, Invoice
+
+User = get_user_model()
+
+class ListFilterTests(APITestCase):
+    """Tests for the declarative list filters and orderings (garage/filters.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='filterowner', password='testpassword123')
+        cls.other = User.objects.create_user(username='filterother', password='testpassword123')
+        cls.admin_user = User.objects.create_user(
+            username='filteradmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.clio = Vehicle.objects.create(
+            owner=cls.owner, make='Renault', model='Clio', year=2015, registration_number='81TU8181', initial_mileage=100
+        )
+        cls.polo = Vehicle.objects.create(
+            owner=cls.owner, make='Volkswagen', model='Polo', year=2020, registration_number='82TU8282', initial_mileage=100
+        )
+        cls.foreign = Vehicle.objects.create(
+            owner=cls.other, make='Renault', model='Clio', year=2018, registration_number='83TU8383', initial_mileage=100
+        )
+        now = timezone.now()
+        cls.records = [
+            MileageRecord.objects.create(
+                vehicle=cls.clio, mileage=1000 * (i + 1), recorded_at=now - timedelta(days=10 - i),
+                source='CUSTOMER' if i % 2 else 'ADMIN',
+            )
+            for i in range(4)
+        ]
+        cls.service_type = ServiceType.objects.create(name="Vidange Filtre")
+        cls.events = [
+            ServiceEvent.objects.create(
+                vehicle=cls.clio, service_type=cls.service_type, event_date=date(2024, 3, day), mileage_at_service=900
+            )
+            for day in (1, 15, 31)
+        ]
+        pdf = lambda: SimpleUploadedFile('facture.pdf', b'%PDF-1.4', content_type='application/pdf')
+        cls.invoices = [
+            Invoice.objects.create(vehicle=cls.clio, pdf_file=pdf(), final_amount=Decimal(amount), invoice_date=date(2024, 5, day))
+            for amount, day in (('120.50', 1), ('80.00', 2), ('300.00', 3))
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.owner)
+
+    def ids(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [row['id'] for row in response.data['results']]
+
+    def test_vehicle_filters(self):
+        self.assertEqual(self.ids('vehicle-list', make='renault'), [self.clio.pk])
+        self.assertEqual(self.ids('vehicle-list', year_min=2016), [self.polo.pk])
+        self.assertEqual(self.ids('vehicle-list', registration_prefix='82tu'), [self.polo.pk])
+        # Filters never widen the user's scope
+        self.assertEqual(self.ids('vehicle-list', owner_id=self.other.pk), [])
+        self.client.force_authenticate(user=self.admin_user)
+        self.assertEqual(self.ids('vehicle-list', owner_id=self.other.pk, model='CLIO'), [self.foreign.pk])
+
+    def test_mileage_filters(self):
+        self.assertEqual(self.ids('mileagerecord-list', source='customer'), [self.records[3].pk, self.records[1].pk])
+        self.assertEqual(
+            self.ids('mileagerecord-list', mileage_min=2000, mileage_max=3000), [self.records[2].pk, self.records[1].pk]
+        )
+        day = timezone.localtime(self.records[2].recorded_at).date().isoformat()
+        self.assertEqual(self.ids('mileagerecord-list', recorded_from=day, recorded_to=day), [self.records[2].pk])
+        self.assertEqual(self.ids('mileagerecord-list', vehicle_id=self.foreign.pk), [])
+
+    def test_date_field_bounds_are_inclusive_days(self):
+        self.assertEqual(
+            self.ids('serviceevent-list', event_from='2024-03-15', event_to='2024-03-31'),
+            [self.events[2].pk, self.events[1].pk],
+        )
+        self.assertEqual(self.ids('invoice-list', invoice_to='2024-05-02', ordering='invoice_date'),
+                         [self.invoices[0].pk, self.invoices[1].pk])
+
+    def test_ordering_pages_along_the_chosen_key(self):
+        self.assertEqual(
+            self.ids('invoice-list', ordering='-final_amount'), [self.invoices[2].pk, self.invoices[0].pk, self.invoices[1].pk]
+        )
+        self.assertEqual(self.ids('invoice-list', amount_min='100'), [self.invoices[2].pk, self.invoices[0].pk])
+
+        url = reverse('mileagerecord-list')
+        response = self.client.get(url, {'ordering': 'mileage', 'page_size': 3})
+        seen = [row['id'] for row in response.data['results']]
+        seen += [row['id'] for row in self.client.get(response.data['next']).data['results']]
+        self.assertEqual(seen, [record.pk for record in self.records])
+
+    def test_invalid_values_are_rejected(self):
+        response = self.client.get(reverse('mileagerecord-list'), {
+            'source': 'garage', 'recorded_from': '2024-02-30', 'mileage_min': '-1', 'ordering': 'vehicle',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(response.data), ['mileage_min', 'ordering', 'recorded_from', 'source'])
+
+    def test_detail_routes_ignore_list_filters(self):
+        response = self.client.get(reverse('vehicle-detail', args=[self.clio.pk]), {'make': 'Volkswagen'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core.pagination import KeysetPagination
+
+from ..models import Vehicle, MileageRecord, ServiceType, ServiceEvent, ServicePrediction
+
+User = get_user_model()
+
+class ListPaginationTests(APITestCase):
+    """Tests for the default keyset pagination of the list endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.admin_user = User.objects.create_user(
+            username='pageadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.vehicles = [
+            Vehicle.objects.create(
+                owner=cls.admin_user, make='Page', model=f'P{i}', registration_number=f'8{i}TU8888', initial_mileage=0
+            )
+            for i in range(6)
+        ]
+        # Same timestamp for all: the id breaks the ties
+        Vehicle.objects.update(created_at=timezone.now())
+        now = timezone.now()
+        MileageRecord.objects.bulk_create([
+            MileageRecord(vehicle=vehicle, mileage=1000 + i, recorded_at=now - timedelta(days=i % 3))
+            for i, vehicle in enumerate(cls.vehicles * 2)
+        ])
+        service_type = ServiceType.objects.create(name="Vidange Pages")
+        ServiceEvent.objects.bulk_create([
+            ServiceEvent(vehicle=vehicle, service_type=service_type, event_date=now.date(), mileage_at_service=500)
+            for vehicle in cls.vehicles
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def walk(self, url, page_size=3):
+        """Follows the next links; returns the ids seen and the number of queries of each page."""
+        response = self.client.get(url, {'page_size': page_size})
+        seen, queries = [], []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [row['id'] for row in response.data['results']]
+            next_url = response.data['next']
+            if not next_url:
+                return seen, queries
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(next_url)
+            queries.append(len(context))
+
+    def test_lists_are_paginated_in_view_order(self):
+        expectations = {
+            'vehicle-list': Vehicle.objects.order_by('-created_at', '-id'),
+            'mileagerecord-list': MileageRecord.objects.order_by('-recorded_at', '-id'),
+            'serviceevent-list': ServiceEvent.objects.order_by('-event_date', '-id'),
+        }
+        for name, expected in expectations.items():
+            with self.subTest(name):
+                seen, queries = self.walk(reverse(name))
+                self.assertEqual(seen, list(expected.values_list('id', flat=True)))
+                # Deep pages cost the same as the second one
+                self.assertEqual(len(set(queries)), 1)
+
+    def test_envelope(self):
+        response = self.client.get(reverse('vehicle-list'), {'page_size': 2})
+        body = response.json()
+        self.assertEqual(len(body['data']), 2)
+        self.assertIsNone(body['metadata']['pagination']['count'])
+        self.assertIsNotNone(body['metadata']['pagination']['next'])
+        self.assertIsNone(body['metadata']['pagination']['previous'])
+
+    def test_previous_link_returns_the_same_page(self):
+        url = reverse('mileagerecord-list')
+        first = self.client.get(url, {'page_size': 4})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']], [row['id'] for row in first.data['results']]
+        )
+
+    def test_seek_query_can_use_the_index(self):
+        first = self.client.get(reverse('mileagerecord-list'), {'page_size': 2})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(first.data['next'])
+        sql = next(query['sql'] for query in context if 'ORDER BY' in query['sql'])
+        # NOT NULL keys: plain DESC ordering (a backward scan of the (recorded_at, id) index)
+        # and a leading range bound, without IS NULL branches
+        self.assertIn('ORDER BY "garage_mileagerecord"."recorded_at" DESC, "garage_mileagerecord"."id" DESC', sql)
+        self.assertNotIn('NULLS', sql)
+        self.assertNotIn('IS NULL', sql)
+        self.assertRegex(sql, r'WHERE \("garage_mileagerecord"\."recorded_at" <= ')
+
+    def test_nullable_keys_keep_nulls_last(self):
+        paginator = KeysetPagination()
+        paginator.fields = [('predicted_due_date', False), ('id', False)]
+        paginator.nullable = [paginator.is_nullable(ServicePrediction, name) for name, _ in paginator.fields]
+        self.assertEqual(paginator.nullable, [True, False])
+        sql = str(ServicePrediction.objects.filter(paginator.seek_filter(['2024-01-01', 5])).order_by(
+            *paginator.order_expressions()
+        ).query)
+        self.assertIn('"predicted_due_date" IS NULL', sql)
+        self.assertIn('ASC NULLS LAST', sql)
+        self.assertEqual(paginator.is_nullable(MileageRecord, 'vehicle__registration_number'), False)
+        self.assertEqual(paginator.is_nullable(MileageRecord, 'recorded_by__username'), True)
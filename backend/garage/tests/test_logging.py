@@ -0,0 +1,55 @@
+import io
+import json
+import logging
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from core.log import NonBlockingStreamHandler
+
+class NonBlockingLoggingTests(SimpleTestCase):
+    """Tests for the queue-based JSON logging handler."""
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.handler = NonBlockingStreamHandler(self.stream)
+        self.logger = logging.getLogger('garage.tests.logging')
+        self.logger.handlers = [self.handler]
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        self.handler.close()
+        self.logger.handlers = []
+
+    def records(self):
+        self.handler.stop() # Drains the queue
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_records_are_written_as_json_lines(self):
+        self.logger.info("Vehicle %s recomputed", 42, extra={'vehicle_id': 42})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            self.logger.exception("Recompute failed")
+        info, error = self.records()
+        self.assertEqual((info['level'], info['message'], info['vehicle_id']), ('INFO', 'Vehicle 42 recomputed', 42))
+        self.assertEqual(error['logger'], 'garage.tests.logging')
+        self.assertIn('ValueError: boom', error['exception'])
+
+    def test_disabled_levels_are_never_formatted(self):
+        class Expensive:
+            formatted = 0
+            def __str__(self):
+                Expensive.formatted += 1
+                return 'expensive'
+
+        self.logger.debug("Details: %s", Expensive())
+        self.assertEqual(self.records(), [])
+        self.assertEqual(Expensive.formatted, 0)
+
+class LoggingBenchmarkCommandTests(TestCase):
+    def test_benchmark_command_reports_each_mode(self):
+        out = io.StringIO()
+        call_command('benchmark_logging', '--requests', '3', stdout=out)
+        self.assertEqual(out.getvalue().count('médiane'), 3)
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Vehicle, MileageRecord
+
+User = get_user_model()
+
+class MileageAggregateTests(TestCase):
+    """Tests for the first/latest mileage aggregates stored on Vehicle."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='aggowner', password='testpassword123')
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Agg', model='A1', registration_number='21TU2121', initial_mileage=1000
+        )
+        cls.now = timezone.now()
+
+    def aggregates(self):
+        self.vehicle.refresh_from_db()
+        return (self.vehicle.first_mileage, self.vehicle.first_mileage_at,
+                self.vehicle.latest_mileage, self.vehicle.latest_mileage_at)
+
+    def test_insert_updates_first_and_latest(self):
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=1000, recorded_at=self.now - timedelta(days=10))
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500, recorded_at=self.now)
+        self.assertEqual(self.aggregates(), (1000, self.now - timedelta(days=10), 1500, self.now))
+
+        # A back-dated reading becomes the first one without touching the latest
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500, recorded_at=self.now - timedelta(days=20))
+        self.assertEqual(self.aggregates(), (1500, self.now - timedelta(days=20), 1500, self.now))
+
+    def test_stale_vehicle_save_keeps_aggregates(self):
+        stale = Vehicle.objects.get(pk=self.vehicle.pk)
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=2000, recorded_at=self.now)
+        stale.make = 'Agg2'
+        stale.save()
+        self.assertEqual(self.aggregates()[2:], (2000, self.now))
+        self.assertEqual(self.vehicle.make, 'Agg2')
+        with self.assertRaises(ValidationError):
+            MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500)
+
+    def test_monotonic_check_uses_latest_mileage(self):
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=2000, recorded_at=self.now)
+        with self.assertRaises(ValidationError):
+            MileageRecord.objects.create(vehicle=self.vehicle, mileage=1999)
+        self.assertEqual(MileageRecord.objects.filter(vehicle=self.vehicle).count(), 1)
+
+        # A back-dated reading is checked too, and leaves the aggregates alone when rejected
+        with self.assertRaises(ValidationError):
+            MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500, recorded_at=self.now - timedelta(days=1))
+        self.assertEqual(self.aggregates()[2:], (2000, self.now))
+
+    def test_insert_does_not_read_latest_mileage_first(self):
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=2000, recorded_at=self.now)
+        # Vehicle FK validation, savepoint, guarded latest UPDATE, first UPDATE, insert,
+        # locked EWMA read and UPDATE, dashboard counter upsert, release
+        with self.assertNumQueries(9):
+            MileageRecord.objects.create(vehicle=self.vehicle, mileage=2100)
+
+    def test_delete_and_edit_rebuild_aggregates(self):
+        first = MileageRecord.objects.create(vehicle=self.vehicle, mileage=1000, recorded_at=self.now - timedelta(days=10))
+        latest = MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500, recorded_at=self.now)
+        latest.delete()
+        self.assertEqual(self.aggregates(), (1000, first.recorded_at, 1000, first.recorded_at))
+
+        first.mileage = 1200
+        first.save()
+        self.assertEqual(self.aggregates()[::2], (1200, 1200))
+
+    def test_rebuild_command_repairs_drift(self):
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=1000, recorded_at=self.now - timedelta(days=10))
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=1500, recorded_at=self.now)
+        expected = self.aggregates()
+        Vehicle.objects.update(first_mileage=None, first_mileage_at=None, latest_mileage=None, latest_mileage_at=None)
+
+        out = StringIO()
+        call_command('rebuild_mileage_aggregates', stdout=out)
+        self.assertIn('1 véhicules reconstruits', out.getvalue())
+        self.assertEqual(self.aggregates(), expected)
@@ -0,0 +1,47 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+
+from ..management.commands.benchmark_mileage_inserts import MIN_PARALLEL_RATIO, post_in_parallel
+from ..models import Vehicle, MileageRecord
+
+User = get_user_model()
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Needs concurrent writers (PostgreSQL)")
+class ConcurrentMileageTests(TransactionTestCase):
+    """Stress test for the monotonic mileage check under parallel POSTs."""
+    clients = 8
+    readings_per_client = 50
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='raceowner', password='testpassword123')
+
+    def create_vehicle(self, plate):
+        return Vehicle.objects.create(
+            owner=self.owner, make='Race', model='R1', registration_number=plate, initial_mileage=0
+        )
+
+    def test_parallel_posts_stay_monotonic(self):
+        # Baseline: the same number of readings from a single client
+        baseline = self.create_vehicle('40TU4040')
+        _, _, baseline_rate = post_in_parallel(
+            self.owner, baseline.pk, 1, self.clients * self.readings_per_client
+        )
+
+        vehicle = self.create_vehicle('41TU4141')
+        accepted, rejected, rate = post_in_parallel(self.owner, vehicle.pk, self.clients, self.readings_per_client)
+
+        self.assertEqual(accepted + rejected, self.clients * self.readings_per_client)
+        # Inserts are serialized by the vehicle row lock: in id order, mileage never decreases
+        mileages = list(MileageRecord.objects.filter(vehicle=vehicle).order_by('id').values_list('mileage', flat=True))
+        self.assertEqual(len(mileages), accepted)
+        self.assertEqual(mileages, sorted(mileages))
+        vehicle.refresh_from_db()
+        self.assertEqual(vehicle.latest_mileage, mileages[-1])
+        # A lost lock or a retry storm would drag the parallel rate well below one client's
+        self.assertGreaterEqual(
+            rate, MIN_PARALLEL_RATIO * baseline_rate,
+            f"{self.clients} clients : {rate:.0f} relevés/s, 1 client : {baseline_rate:.0f} relevés/s",
+        )
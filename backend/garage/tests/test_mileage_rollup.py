@@ -0,0 +1,122 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Vehicle, MileageRecord, MileageDailySummary, ServiceType, ServiceEvent, Tombstone
+from ..mileage import rebuild_daily_km_estimates, rebuild_mileage_aggregates
+from ..rollup import compact_mileage_history, retention_cutoff
+
+User = get_user_model()
+
+AGGREGATE_FIELDS = (
+    'first_mileage', 'first_mileage_at', 'latest_mileage', 'latest_mileage_at',
+    'daily_km_ewma', 'daily_km_ewma_mileage', 'daily_km_ewma_at',
+)
+
+class MileageRollupTests(APITestCase):
+    """Tests for the daily mileage summaries and the compaction command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='rollupowner', password='testpassword123')
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Roll', model='R1', registration_number='61TU6161', initial_mileage=0
+        )
+        cls.cutoff = retention_cutoff(days=30)
+        # Two readings a day: 7 days before the cutoff, then the last 5 days
+        mileage = 1000
+        for days_ago in [*range(40, 33, -1), *range(-25, -30, -1)]:
+            day = cls.cutoff - timedelta(days=days_ago) + timedelta(hours=8)
+            for hours in (0, 9):
+                mileage += 25
+                MileageRecord.objects.create(vehicle=cls.vehicle, mileage=mileage, recorded_at=day + timedelta(hours=hours))
+
+    def aggregates(self):
+        return Vehicle.objects.filter(pk=self.vehicle.pk).values(*AGGREGATE_FIELDS).get()
+
+    def test_compaction_keeps_aggregates(self):
+        before = self.aggregates()
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            totals = compact_mileage_history(cutoff=self.cutoff)
+        self.assertEqual(totals, {'readings': 14, 'summaries': 7})
+        # One DELETE, without loading the rows
+        table = MileageRecord._meta.db_table
+        statements = [query['sql'] for query in queries if table in query['sql']]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('DELETE')]), 1)
+        self.assertFalse([sql for sql in statements if sql.startswith('SELECT') and f'"{table}"."mileage",' in sql])
+        # Not a deletion for the post_delete handlers: no recompute, no tombstone
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Tombstone.objects.exists())
+        self.assertEqual(MileageRecord.objects.filter(vehicle=self.vehicle).count(), 10)
+        summary = MileageDailySummary.objects.filter(vehicle=self.vehicle).earliest('day')
+        self.assertEqual((summary.min_mileage, summary.max_mileage, summary.reading_count), (1025, 1050, 2))
+        self.assertEqual(self.aggregates(), before)
+
+        # The rebuilds read the summaries: same result as from the full history
+        rebuild_mileage_aggregates([self.vehicle.pk])
+        rebuild_daily_km_estimates([self.vehicle.pk])
+        self.assertEqual(self.aggregates(), before)
+
+    def test_event_update_skips_the_history_check(self):
+        event = ServiceEvent.objects.create(
+            vehicle=self.vehicle, service_type=ServiceType.objects.create(name="Vidange Rollup"),
+            event_date=timezone.now(), mileage_at_service=1500,
+        )
+        event.notes = "Filtre changé"
+        with CaptureQueriesContext(connection) as queries:
+            event.save()
+        self.assertFalse([query for query in queries if MileageDailySummary._meta.db_table in query['sql']])
+
+    def test_rerun_is_a_noop_and_merges_late_readings(self):
+        compact_mileage_history(cutoff=self.cutoff)
+        self.assertEqual(compact_mileage_history(cutoff=self.cutoff), {'readings': 0, 'summaries': 0})
+
+        # A reading back-dated into a compacted day (bypassing the monotonic check)
+        first_day = MileageDailySummary.objects.filter(vehicle=self.vehicle).earliest('day')
+        MileageRecord.objects.bulk_create([MileageRecord(
+            vehicle=self.vehicle, mileage=1040, recorded_at=first_day.first_recorded_at + timedelta(hours=2)
+        )])
+        self.assertEqual(compact_mileage_history(cutoff=self.cutoff), {'readings': 1, 'summaries': 1})
+        first_day.refresh_from_db()
+        self.assertEqual((first_day.min_mileage, first_day.max_mileage, first_day.reading_count), (1025, 1050, 3))
+
+    def test_fully_compacted_vehicle_keeps_its_history(self):
+        before = self.aggregates()
+        compact_mileage_history(cutoff=timezone.now() + timedelta(days=1))
+        self.assertFalse(MileageRecord.objects.filter(vehicle=self.vehicle).exists())
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(**{field: None for field in AGGREGATE_FIELDS})
+        rebuild_mileage_aggregates([self.vehicle.pk])
+        rebuild_daily_km_estimates([self.vehicle.pk])
+        self.assertEqual(self.aggregates(), before)
+
+    def test_history_endpoint_spans_both_tiers(self):
+        compact_mileage_history(cutoff=self.cutoff)
+        self.client.force_authenticate(user=self.owner)
+        url = reverse('vehicle-mileage-history', kwargs={'pk': self.vehicle.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual([row['reading_count'] for row in response.data], [2] * 12)
+        self.assertEqual(response.data[0]['min_mileage'], 1025)
+        self.assertEqual(response.data[-1]['max_mileage'], 1600)
+
+        last_day = response.data[-1]['day']
+        response = self.client.get(url, {'from': last_day.isoformat()})
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(self.client.get(url, {'to': 'demain'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_command_resumes_after_vehicle(self):
+        out = StringIO()
+        call_command('compact_mileage_history', older_than=30, after_vehicle=self.vehicle.pk, stdout=out)
+        self.assertIn("0 relevés regroupés", out.getvalue())
+        call_command('compact_mileage_history', older_than=30, stdout=out)
+        self.assertEqual(MileageDailySummary.objects.count(), 7)
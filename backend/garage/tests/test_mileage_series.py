@@ -0,0 +1,98 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Vehicle, MileageRecord
+from ..rollup import compact_mileage_history
+from ..series import lttb
+
+User = get_user_model()
+
+class LTTBTests(APITestCase):
+    """Tests for the Largest-Triangle-Three-Buckets downsampling."""
+
+    def test_keeps_ends_and_peaks(self):
+        points = [(x, 0) for x in range(100)]
+        points[37] = (37, 50) # A spike must survive
+        sampled = list(lttb(iter(points), len(points), 10))
+        self.assertEqual(len(sampled), 10)
+        self.assertEqual((sampled[0], sampled[-1]), (points[0], points[-1]))
+        self.assertIn((37, 50), sampled)
+        self.assertEqual(sampled, sorted(sampled))
+
+    def test_short_series_pass_through(self):
+        points = [(x, x) for x in range(5)]
+        self.assertEqual(list(lttb(iter(points), 5, 10)), points)
+
+    def test_tolerates_a_wrong_count(self):
+        points = [(x, x * x) for x in range(100)]
+        for count in (90, 110):
+            sampled = list(lttb(iter(points), count, 10))
+            self.assertEqual(sampled[0], points[0])
+            self.assertEqual(sampled[-1], points[-1])
+            self.assertEqual(sampled, sorted(sampled))
+
+
+class MileageSeriesEndpointTests(APITestCase):
+    """Tests for the vehicle mileage series endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='seriesowner', password='testpassword123')
+        cls.other = User.objects.create_user(username='seriesother', password='testpassword123')
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Series', model='S1', registration_number='71TU7171', initial_mileage=0
+        )
+        cls.start = timezone.now().replace(microsecond=0) - timedelta(days=1000)
+        MileageRecord.objects.bulk_create([
+            MileageRecord(vehicle=cls.vehicle, mileage=1000 + day * 40, recorded_at=cls.start + timedelta(days=day))
+            for day in range(1000)
+        ])
+        cls.url = reverse('vehicle-mileage-series', kwargs={'pk': cls.vehicle.pk})
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.owner)
+
+    def get(self, params=None):
+        response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_downsamples_to_requested_points(self):
+        body = self.get({'points': 50})
+        self.assertEqual(body['metadata']['count'], 1000)
+        self.assertEqual(len(body['data']), 50)
+        self.assertIsNone(body['error'])
+        first, last = body['data'][0], body['data'][-1]
+        self.assertEqual(first, [int(self.start.timestamp() * 1000), 1000])
+        self.assertEqual(last[1], 1000 + 999 * 40)
+        self.assertEqual(len(self.get()['data']), 500)
+
+    def test_date_bounds(self):
+        first_day = timezone.localdate(self.start + timedelta(days=10)).isoformat()
+        last_day = timezone.localdate(self.start + timedelta(days=19)).isoformat()
+        body = self.get({'from': first_day, 'to': last_day})
+        self.assertEqual(body['metadata']['count'], 10)
+        self.assertEqual([km for _, km in body['data']], [1000 + day * 40 for day in range(10, 20)])
+
+    def test_reads_compacted_history(self):
+        compact_mileage_history(cutoff=self.start + timedelta(days=500))
+        body = self.get({'points': 1000})
+        # One reading per day: a compacted day yields that same reading
+        self.assertEqual(body['metadata']['count'], 1000)
+        self.assertEqual([km for _, km in body['data']], [1000 + day * 40 for day in range(1000)])
+
+    def test_invalid_parameters(self):
+        response = self.client.get(self.url, {'points': 2, 'from': 'hier'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'points', 'from'})
+
+    def test_other_users_vehicle_is_hidden(self):
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
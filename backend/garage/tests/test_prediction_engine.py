@@ -0,0 +1,209 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from ..models import Vehicle, MileageRecord, ServiceType, ServiceEvent, PredictionRule, ServicePrediction, PredictionJob
+from ..jobs import run_pending_jobs
+from ..predictions import build_predictions, estimate_daily_km, load_prediction_inputs, predict_service, recompute_predictions
+
+User = get_user_model()
+
+class PredictionEngineTests(APITestCase):
+    """Tests for the set-based prediction engine and its entry points."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.client_user = User.objects.create_user(username='engineclient', password='testpassword123')
+        cls.admin_user = User.objects.create_user(
+            username='engineadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.vidange = ServiceType.objects.create(name="Vidange Moteur")
+        cls.freins = ServiceType.objects.create(name="Plaquettes de frein")
+        PredictionRule.objects.create(service_type=cls.vidange, interval_km=10000, interval_months=12)
+        PredictionRule.objects.create(service_type=cls.freins, interval_km=30000)
+        PredictionJob.objects.all().delete() # Queued for the new rules
+
+        now = timezone.now()
+        cls.vehicles = []
+        for i in range(3):
+            vehicle = Vehicle.objects.create(
+                owner=cls.client_user, make='Engine', model=f'M{i}',
+                registration_number=f'{i + 1}TU100{i}', initial_mileage=1000 * (i + 1)
+            )
+            MileageRecord.objects.create(vehicle=vehicle, mileage=1000 * (i + 1), recorded_at=now - timedelta(days=100), source='INITIAL')
+            MileageRecord.objects.create(vehicle=vehicle, mileage=1000 * (i + 1) + 4000 * i, recorded_at=now, source='ADMIN')
+            cls.vehicles.append(vehicle)
+        ServiceEvent.objects.create(
+            vehicle=cls.vehicles[1], service_type=cls.vidange,
+            event_date=date.today() - timedelta(days=30), mileage_at_service=4000
+        )
+        cls.recompute_url = reverse('serviceprediction-recompute')
+
+    def snapshot(self):
+        predictions = ServicePrediction.objects.order_by('vehicle_id', 'service_type_id').values_list(
+            'vehicle_id', 'service_type_id', 'predicted_due_mileage', 'predicted_due_date'
+        )
+        averages = Vehicle.objects.order_by('pk').values_list('pk', 'average_daily_km')
+        return list(predictions), list(averages)
+
+    def reference_snapshot(self, current_date):
+        """Predictions and averages computed one (vehicle, rule) pair at a time with the scalar predict_service."""
+        vehicles, last_services = load_prediction_inputs([v.pk for v in self.vehicles])
+        rules = PredictionRule.objects.filter(is_active=True).order_by('service_type_id')
+        predictions, averages = [], []
+        for vehicle in sorted(vehicles, key=lambda v: v['id']):
+            avg_km = estimate_daily_km(vehicle)
+            averages.append((vehicle['id'], avg_km))
+            current_mileage = vehicle['latest_mileage'] if vehicle['latest_mileage'] is not None else vehicle['initial_mileage']
+            for rule in rules:
+                base_mileage, base_date = last_services.get(
+                    (vehicle['id'], rule.service_type_id), (vehicle['initial_mileage'], vehicle['created_at'].date())
+                )
+                due_mileage, due_date = predict_service(
+                    rule.interval_km, rule.interval_months, base_mileage, base_date,
+                    current_mileage, avg_km, current_date,
+                )
+                predictions.append((vehicle['id'], rule.service_type_id, due_mileage, due_date))
+        return predictions, averages
+
+    def test_engine_matches_scalar_reference(self):
+        """Batch results are identical to predict_service applied one pair at a time."""
+        current_date = timezone.now().date()
+        expected = self.reference_snapshot(current_date)
+
+        vehicles, last_services = load_prediction_inputs([v.pk for v in self.vehicles])
+        predictions, avg_km_changes = build_predictions(
+            vehicles, last_services, list(PredictionRule.objects.filter(is_active=True)), current_date
+        )
+        built = sorted(
+            (p.vehicle_id, p.service_type_id, p.predicted_due_mileage, p.predicted_due_date) for p in predictions
+        )
+        self.assertEqual(built, expected[0])
+        self.assertEqual(sorted(avg_km_changes.items()), expected[1])
+
+        stats = recompute_predictions(chunk_size=2)
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(stats['vehicles'], 3)
+        self.assertEqual(stats['predictions'], 6)
+        self.assertEqual(stats['avg_km_updated'], 3)
+
+    def test_engine_updates_existing_predictions(self):
+        """Existing rows are upserted, not duplicated."""
+        recompute_predictions()
+        ServicePrediction.objects.update(predicted_due_mileage=1)
+        recompute_predictions(vehicle_ids=[self.vehicles[0].pk])
+        self.assertEqual(ServicePrediction.objects.count(), 6)
+        self.assertEqual(ServicePrediction.objects.filter(predicted_due_mileage=1).count(), 4)
+
+    def test_unchanged_predictions_are_not_rewritten(self):
+        first = recompute_predictions()
+        self.assertEqual((first['changed'], first['unchanged']), (6, 0))
+        again = recompute_predictions()
+        self.assertEqual((again['changed'], again['unchanged']), (0, 6))
+
+        ServicePrediction.objects.filter(vehicle=self.vehicles[0]).update(predicted_due_date=None)
+        ServicePrediction.objects.filter(vehicle=self.vehicles[1]).update(prediction_source='ML')
+        stats = recompute_predictions()
+        self.assertEqual((stats['changed'], stats['unchanged']), (3, 3))
+        self.assertFalse(ServicePrediction.objects.filter(prediction_source='ML').exists())
+
+    def test_management_command_reports_progress(self):
+        out = StringIO()
+        call_command('recompute_predictions', '--chunk-size', '2', stdout=out)
+        output = out.getvalue()
+        self.assertIn('2/3 véhicules', output)
+        self.assertIn('Terminé : 3 véhicules, 6 prédictions', output)
+
+    def test_recompute_action_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(user=self.client_user)
+        response = client.post(self.recompute_url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        client.force_authenticate(user=self.admin_user)
+        response = client.post(self.recompute_url, {'vehicle_ids': [self.vehicles[0].pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['vehicles'], 1)
+        self.assertEqual(ServicePrediction.objects.filter(vehicle=self.vehicles[0]).count(), 2)
+
+        response = client.post(self.recompute_url, {'vehicle_ids': 'all'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fleet_recompute_is_queued(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin_user)
+        response = client.post(self.recompute_url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['queued'], 3)
+        self.assertEqual(response.data['pending'], 3)
+        self.assertFalse(ServicePrediction.objects.exists()) # Left to the worker
+        self.assertEqual(set(PredictionJob.objects.values_list('vehicle_id', flat=True)), {v.pk for v in self.vehicles})
+
+        with mock.patch('garage.views.MAX_INLINE_RECOMPUTE_VEHICLES', 1):
+            response = client.post(self.recompute_url, {'vehicle_ids': [self.vehicles[0].pk, 0]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['queued'], 1) # Unknown ids are ignored
+
+class PredictionRuleChangeTests(APITestCase):
+    """Tests for the targeted recompute triggered by PredictionRule changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='ruleowner', password='testpassword123')
+        cls.vidange = ServiceType.objects.create(name="Vidange Règle")
+        cls.courroie = ServiceType.objects.create(name="Courroie Règle")
+        cls.vidange_rule = PredictionRule.objects.create(service_type=cls.vidange, interval_km=10000)
+        cls.courroie_rule = PredictionRule.objects.create(service_type=cls.courroie, interval_km=60000)
+        cls.vehicles = [
+            Vehicle.objects.create(
+                owner=cls.owner, make='Rule', model=f'R{i}',
+                registration_number=f'{i + 1}TU200{i}', initial_mileage=5000
+            )
+            for i in range(3)
+        ]
+        recompute_predictions()
+        PredictionJob.objects.all().delete() # Queued for the new rules, done above
+
+    def due_mileages(self, service_type):
+        return set(ServicePrediction.objects.filter(service_type=service_type).values_list('predicted_due_mileage', flat=True))
+
+    def test_interval_change_recomputes_only_that_service_type(self):
+        ServicePrediction.objects.filter(service_type=self.courroie).update(predicted_due_mileage=1)
+        self.vidange_rule.interval_km = 15000
+        self.vidange_rule.save()
+        # Left to the worker
+        self.assertEqual(self.due_mileages(self.vidange), {15000})
+        self.assertTrue(PredictionJob.objects.filter(service_type=self.vidange).exists())
+        self.assertEqual(run_pending_jobs(), {'processed': 1, 'failed': 0})
+        self.assertEqual(self.due_mileages(self.vidange), {20000})
+        self.assertEqual(self.due_mileages(self.courroie), {1}) # Untouched
+
+    def test_unrelated_save_is_a_noop(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.vidange_rule.save()
+        self.assertEqual(callbacks, [])
+
+    def test_deactivation_and_delete_remove_predictions(self):
+        self.vidange_rule.is_active = False
+        self.vidange_rule.save()
+        run_pending_jobs()
+        self.assertFalse(ServicePrediction.objects.filter(service_type=self.vidange).exists())
+        self.assertEqual(ServicePrediction.objects.filter(service_type=self.courroie).count(), 3)
+
+        self.courroie_rule.delete()
+        run_pending_jobs()
+        self.assertFalse(ServicePrediction.objects.exists())
+
+    def test_service_type_deletion_queues_nothing(self):
+        self.courroie.delete() # Cascades to its rule and predictions
+        self.assertFalse(PredictionJob.objects.exists())
+        self.assertEqual(ServicePrediction.objects.count(), 3)
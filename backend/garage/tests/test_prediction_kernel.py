@@ -0,0 +1,50 @@
+from datetime import date
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from ..management.commands.benchmark_prediction_kernel import random_inputs
+from ..prediction_kernel import predict_due
+from ..predictions import predict_service
+
+class PredictionKernelTests(SimpleTestCase):
+    """The vectorized kernel must reproduce the scalar predict_service exactly."""
+
+    def assert_matches_scalar(self, inputs):
+        due_mileage, due_date = predict_due(**inputs)
+        rows = zip(
+            inputs['interval_km'], inputs['interval_months'], inputs['base_mileage'],
+            np.asarray(inputs['base_date'], dtype='datetime64[D]').astype(object),
+            inputs['current_mileage'], inputs['avg_daily_km'],
+        )
+        for i, (interval_km, interval_months, base_mileage, base_date, current_mileage, avg_daily_km) in enumerate(rows):
+            expected = predict_service(
+                int(interval_km), int(interval_months) or None, int(base_mileage), base_date,
+                int(current_mileage), float(avg_daily_km), inputs['current_date'],
+            )
+            got_date = None if np.isnat(due_date[i]) else due_date[i].astype(object)
+            self.assertEqual((int(due_mileage[i]), got_date), expected, f"ligne {i}")
+
+    def test_random_inputs(self):
+        self.assert_matches_scalar(random_inputs(2000, seed=42))
+
+    def test_edge_cases(self):
+        today = date(2024, 3, 15)
+        self.assert_matches_scalar({
+            # month-end clipping, no interval, zero average, due mileage already passed, overflow
+            'base_date': np.array(['2024-01-31', '2023-02-28', '2024-03-15', '2020-01-01', '2024-03-01', '2024-02-29'], dtype='datetime64[D]'),
+            'interval_months': [1, 12, 0, 6, 0, 12],
+            'base_mileage': [0, 0, 0, 10000, 0, 0],
+            'interval_km': [10000, 10000, 10000, 10000, 10**15, 10000],
+            'current_mileage': [5000, 5000, 5000, 30000, 0, 0],
+            'avg_daily_km': [100.0, 0.0, 0.0, 50.0, 0.001, 3.0],
+            'current_date': today,
+        })
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_prediction_kernel', '--pairs', '1000', '--repeat', '1', '--scalar-sample', '100', stdout=out)
+        self.assertIn('1000 prédictions', out.getvalue())
+        self.assertIn('Accélération', out.getvalue())
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Vehicle, CustomerProfile
+from ..search import search
+
+User = get_user_model()
+
+class SearchTests(APITestCase):
+    """Tests for the quick search endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(
+            username='searchowner', password='testpassword123', first_name='Amine', last_name='Trabelsi'
+        )
+        cls.owner.groups.add(Group.objects.get(name='Customers'))
+        CustomerProfile.objects.create(user=cls.owner, phone_number='+216 20 123 456')
+        cls.other = User.objects.create_user(username='searchother', password='testpassword123')
+        cls.admin_user = User.objects.create_user(
+            username='searchadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.clio = Vehicle.objects.create(
+            owner=cls.owner, make='Renault', model='Clio', year=2015, registration_number='123TU4567',
+            vin='VF1CLIO0000000001', initial_mileage=100
+        )
+        cls.megane = Vehicle.objects.create(
+            owner=cls.owner, make='Renault', model='Megane', registration_number='123TU45', initial_mileage=100
+        )
+        cls.foreign = Vehicle.objects.create(
+            owner=cls.other, make='Renault', model='Clio', registration_number='124TU1000', initial_mileage=100
+        )
+        cls.url = reverse('search')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.owner)
+
+    def hits(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['partial'])
+        return [(hit['type'], hit['id']) for hit in response.data['results']]
+
+    def test_ranked_vehicle_hits(self):
+        # The exact plate comes first, then the prefix match
+        self.assertEqual(self.hits('123tu45'), [('vehicle', self.megane.pk), ('vehicle', self.clio.pk)])
+        self.assertEqual(self.hits('VF1CLIO'), [('vehicle', self.clio.pk)])
+        # Other owners' vehicles and customers stay hidden
+        self.assertEqual(self.hits('124TU'), [])
+        self.assertEqual(self.hits('Amine'), [])
+
+    def test_admin_finds_customers_by_name_and_phone(self):
+        self.client.force_authenticate(user=self.admin_user)
+        self.assertEqual(self.hits('trabel'), [('customer', self.owner.pk)])
+        self.assertEqual(self.hits('20 12'), [('customer', self.owner.pk)])
+        # Equal scores: by plate
+        self.assertEqual(self.hits('Renault', limit=2), [('vehicle', self.megane.pk), ('vehicle', self.clio.pk)])
+
+    def test_substring_matching(self):
+        # The default on Postgres, where the trigram indexes serve it
+        result = search(self.owner, 'TU456', substring=True)
+        self.assertEqual([hit['id'] for hit in result['results']], [self.clio.pk])
+        self.assertEqual(result['results'][0]['score'], 1)
+        self.assertEqual(search(self.owner, 'TU456')['results'], [])
+
+    @override_settings(SEARCH_TIME_BUDGET_MS=0)
+    def test_exhausted_budget_is_partial(self):
+        response = self.client.get(self.url, {'q': '123TU'})
+        self.assertTrue(response.data['partial'])
+
+    def test_invalid_parameters(self):
+        response = self.client.get(self.url, {'q': 'ab', 'limit': 500})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(response.data), ['limit', 'q'])
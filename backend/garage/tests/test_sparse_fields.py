@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Vehicle, MileageRecord, ServiceType, ServicePrediction
+
+User = get_user_model()
+
+class SparseFieldsetTests(APITestCase):
+    """Tests for ?fields=, ?omit= and ?view=compact on the read endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.admin_user = User.objects.create_user(
+            username='sparseadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.admin_user, make='Sparse', model='S1', registration_number='51TU5151', initial_mileage=100
+        )
+        now = timezone.now()
+        MileageRecord.objects.bulk_create([
+            MileageRecord(vehicle=cls.vehicle, mileage=1000 + i, recorded_at=now - timedelta(days=i))
+            for i in range(3)
+        ])
+        cls.service_type = ServiceType.objects.create(name="Vidange Sparse")
+        cls.prediction = ServicePrediction.objects.create(
+            vehicle=cls.vehicle, service_type=cls.service_type,
+            predicted_due_date=now.date() + timedelta(days=30), predicted_due_mileage=15000,
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The list/detail query is the last one
+        return response.data, context.captured_queries[-1]['sql']
+
+    def test_fields_narrow_payload_and_select(self):
+        data, sql = self.get(reverse('mileagerecord-list'), fields='id,mileage')
+        self.assertEqual([set(row) for row in data['results']], [{'id', 'mileage'}] * 3)
+        self.assertNotIn('"source"', sql)
+        self.assertNotIn('JOIN', sql)
+        # The pagination key is still loaded, so next pages work
+        self.assertIn('"recorded_at"', sql)
+
+    def test_omit(self):
+        data, _ = self.get(reverse('vehicle-detail', args=[self.vehicle.pk]), omit='vin,owner_username')
+        self.assertNotIn('vin', data)
+        self.assertNotIn('owner_username', data)
+        self.assertEqual(data['registration_number'], '51TU5151')
+
+    def test_compact_view_returns_references_as_ids(self):
+        data, sql = self.get(reverse('serviceprediction-list'), view='compact')
+        self.assertEqual(data['results'][0], {
+            'id': self.prediction.pk, 'vehicle': self.vehicle.pk, 'service_type': self.service_type.pk,
+            'predicted_due_date': self.prediction.predicted_due_date.isoformat(), 'predicted_due_mileage': 15000,
+        })
+        self.assertNotIn('JOIN', sql)
+
+    def test_nested_fields_follow_their_relations(self):
+        data, sql = self.get(reverse('serviceprediction-list'), fields='id,vehicle_info')
+        self.assertEqual(data['results'][0]['vehicle_info']['owner_username'], 'sparseadmin')
+        # owner_username of the nested vehicle is joined rather than queried per row
+        self.assertEqual(sql.count('JOIN'), 2)
+        self.assertNotIn('"garage_servicetype"', sql)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse('mileagerecord-list'), {'fields': 'id,nope'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_return_full_representation(self):
+        response = self.client.post(
+            reverse('mileagerecord-list') + '?fields=id', {'vehicle_id': self.vehicle.pk, 'mileage': 5000}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('source', response.data)
@@ -0,0 +1,166 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Vehicle, MileageRecord, ServiceType, ServiceEvent, Tombstone
+from ..sync import encode_token
+
+User = get_user_model()
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class SyncTests(APITestCase):
+    """Tests for the delta sync endpoint and its tombstones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='syncowner', password='testpassword123')
+        cls.other = User.objects.create_user(username='syncother', password='testpassword123')
+        cls.admin_user = User.objects.create_user(
+            username='syncadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Sync', model='S1', registration_number='71TU7171', initial_mileage=100
+        )
+        cls.other_vehicle = Vehicle.objects.create(
+            owner=cls.other, make='Sync', model='S2', registration_number='72TU7272', initial_mileage=100
+        )
+        cls.records = [
+            MileageRecord.objects.create(vehicle=cls.vehicle, mileage=1000 + i, recorded_at=timezone.now() - timedelta(days=5 - i))
+            for i in range(3)
+        ]
+        MileageRecord.objects.create(vehicle=cls.other_vehicle, mileage=500)
+        cls.url = reverse('sync')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.owner)
+
+    def sync(self, token=None):
+        response = self.client.get(self.url, {'since': token} if token else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def ids(self, data, stream):
+        return sorted(row['id'] for row in data['changes'][stream])
+
+    def test_full_then_incremental(self):
+        data = self.sync()
+        self.assertEqual(self.ids(data, 'vehicles'), [self.vehicle.pk])
+        self.assertEqual(self.ids(data, 'mileage_records'), sorted(record.pk for record in self.records))
+        self.assertFalse(data['has_more'])
+
+        data = self.sync(data['token'])
+        self.assertEqual(sum(len(rows) for rows in data['changes'].values()), 0)
+
+        record = MileageRecord.objects.create(vehicle=self.vehicle, mileage=2000)
+        data = self.sync(data['token'])
+        self.assertEqual(self.ids(data, 'mileage_records'), [record.pk])
+        # The vehicle's mileage aggregates changed too
+        self.assertEqual(self.ids(data, 'vehicles'), [self.vehicle.pk])
+
+    def test_deletions_are_reported_to_the_owner_only(self):
+        token = self.sync()['token']
+        record = self.records[0]
+        self.client.force_authenticate(user=self.admin_user)
+        admin_token = self.sync()['token']
+        self.assertEqual(self.client.delete(reverse('mileagerecord-detail', args=[record.pk])).status_code, 204)
+        self.assertEqual(self.sync(admin_token)['deleted']['mileage_records'], [record.pk])
+
+        self.client.force_authenticate(user=self.other)
+        other_token = self.sync()['token']
+        self.client.force_authenticate(user=self.owner)
+        data = self.sync(token)
+        self.assertEqual(data['deleted']['mileage_records'], [record.pk])
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.sync(other_token)['deleted']['mileage_records'], [])
+
+    def test_vehicle_delete_leaves_one_tombstone(self):
+        ServiceEvent.objects.create(
+            vehicle=self.vehicle, service_type=ServiceType.objects.create(name="Vidange Sync"),
+            event_date=timezone.now().date(), mileage_at_service=900,
+        )
+        token = self.sync()['token']
+        pk = self.vehicle.pk
+        self.vehicle.delete()
+        self.assertEqual(list(Tombstone.objects.values_list('stream', 'object_id')), [('vehicles', pk)])
+        data = self.sync(token)
+        self.assertEqual(data['deleted']['vehicles'], [pk])
+        self.assertEqual(data['deleted']['mileage_records'], [])
+
+    def test_reassigned_vehicle_is_deleted_for_the_previous_owner(self):
+        token = self.sync()['token']
+        self.client.force_authenticate(user=self.other)
+        other_token = self.sync()['token']
+        self.client.force_authenticate(user=self.admin_user)
+        admin_token = self.sync()['token']
+
+        self.vehicle.owner = self.other
+        self.vehicle.save()
+        self.assertEqual(self.sync(admin_token)['deleted']['vehicles'], [])
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(self.sync(token)['deleted']['vehicles'], [self.vehicle.pk])
+        # The new owner gets the vehicle with its history
+        self.client.force_authenticate(user=self.other)
+        data = self.sync(other_token)
+        self.assertEqual(self.ids(data, 'vehicles'), [self.vehicle.pk])
+        self.assertEqual(self.ids(data, 'mileage_records'), sorted(record.pk for record in self.records))
+
+        # Given back: the first owner's tombstone no longer applies
+        self.vehicle.owner = self.owner
+        self.vehicle.save(update_fields=['owner'])
+        self.client.force_authenticate(user=self.owner)
+        data = self.sync(token)
+        self.assertEqual(self.ids(data, 'vehicles'), [self.vehicle.pk])
+        self.assertEqual(data['deleted']['vehicles'], [])
+        self.assertEqual(Tombstone.objects.filter(stream='vehicles', object_id=self.vehicle.pk).count(), 2)
+
+    def test_horizon_waits_for_open_transactions(self):
+        opened = timezone.now() - timedelta(minutes=2)
+        with mock.patch('garage.sync.oldest_open_transaction', return_value=opened):
+            token = self.sync()['token']
+        # Written by that transaction, committed after the call
+        late = MileageRecord.objects.create(vehicle=self.vehicle, mileage=2000)
+        MileageRecord.objects.filter(pk=late.pk).update(updated_at=opened + timedelta(seconds=1))
+        self.assertIn(late.pk, self.ids(self.sync(token), 'mileage_records'))
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_no_more_pages_past_the_horizon(self):
+        MileageRecord.objects.filter(vehicle=self.vehicle).update()
+        # Three rows after the horizon: they come back on each call, without `has_more`
+        with mock.patch('garage.sync.oldest_open_transaction', return_value=timezone.now() - timedelta(minutes=2)):
+            data = self.sync(self.sync()['token'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(len(data['changes']['mileage_records']), 2)
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_pages_until_done(self):
+        MileageRecord.objects.bulk_create([
+            MileageRecord(vehicle=self.vehicle, mileage=3000 + i, recorded_at=timezone.now()) for i in range(3)
+        ])
+        # Same updated_at for every row: the id breaks the ties
+        MileageRecord.objects.filter(vehicle=self.vehicle).update()
+        seen, token, calls = [], None, 0
+        while True:
+            data = self.sync(token)
+            seen += self.ids(data, 'mileage_records')
+            token, calls = data['token'], calls + 1
+            if not data['has_more']:
+                break
+        self.assertEqual(calls, 3)
+        self.assertEqual(sorted(seen), sorted(MileageRecord.objects.filter(vehicle=self.vehicle).values_list('pk', flat=True)))
+
+    def test_expired_token_resets(self):
+        old = timezone.now() - timedelta(days=365)
+        data = self.sync(encode_token({'vehicles': (old, 0), 'deleted': (old, 0)}))
+        self.assertTrue(data['reset'])
+        self.assertEqual(self.ids(data, 'vehicles'), [self.vehicle.pk])
+
+    def test_invalid_token(self):
+        response = self.client.get(self.url, {'since': 'pas-un-jeton'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,100 @@
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Vehicle, MileageRecord
+from .. import ingest
+
+User = get_user_model()
+
+class TelemetryIngestTests(APITestCase):
+    """Tests for the streaming NDJSON telemetry endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up data for the whole TestCase."""
+        cls.owner = User.objects.create_user(username='teleowner', password='testpassword123')
+        cls.admin_user = User.objects.create_user(
+            username='teleadmin', password='testpassword123', is_staff=True, is_superuser=True
+        )
+        cls.vehicle = Vehicle.objects.create(
+            owner=cls.owner, make='Tele', model='T1', registration_number='51TU5151', initial_mileage=0
+        )
+        cls.other_vehicle = Vehicle.objects.create(
+            owner=cls.admin_user, make='Tele', model='T2', registration_number='52TU5252', initial_mileage=0
+        )
+        cls.url = reverse('mileagerecord-telemetry')
+        cls.start = datetime(2024, 9, 1, 8, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def line(self, vehicle, mileage, minutes):
+        return json.dumps({
+            'vehicle_id': vehicle.pk, 'mileage': mileage,
+            'recorded_at': (self.start + timedelta(minutes=minutes)).isoformat(),
+        })
+
+    def post(self, lines):
+        return self.client.post(self.url, '\n'.join(lines) + '\n', content_type='application/x-ndjson')
+
+    def test_keeps_max_reading_per_vehicle_per_hour(self):
+        # A reading every 5 minutes over 3 hours, for two interleaved vehicles
+        lines = []
+        for minutes in range(0, 180, 5):
+            lines.append(self.line(self.vehicle, 1000 + minutes, minutes))
+            lines.append(self.line(self.other_vehicle, 5000 + minutes, minutes))
+        response = self.post(lines)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['lines'], 72)
+        self.assertEqual(response.data['created'], 6)
+        self.assertEqual(response.data['downsampled'], 66)
+
+        records = MileageRecord.objects.filter(vehicle=self.vehicle).order_by('recorded_at')
+        self.assertEqual([record.mileage for record in records], [1055, 1115, 1175])
+        self.assertEqual({record.source for record in records}, {'TELEMETRY'})
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.latest_mileage, 1175)
+
+    @override_settings(TELEMETRY_BATCH_SIZE=2)
+    def test_survivors_are_written_in_batches(self):
+        lines = [self.line(self.vehicle, 1000 + hour, hour * 60) for hour in range(7)]
+        with mock.patch('garage.telemetry.ingest_mileage_readings', wraps=ingest.ingest_mileage_readings) as store:
+            response = self.post(lines)
+        self.assertEqual(response.data['created'], 7)
+        self.assertEqual([len(call.args[0]) for call in store.call_args_list], [2, 2, 2, 1])
+
+    def test_invalid_lines_are_reported(self):
+        MileageRecord.objects.create(vehicle=self.vehicle, mileage=9000, recorded_at=self.start)
+        lines = [
+            self.line(self.vehicle, 9100, 60),
+            '{pas du json',
+            json.dumps({'vehicle_id': self.vehicle.pk, 'mileage': '12'}),
+            json.dumps({'vehicle_id': self.vehicle.pk, 'mileage': 100, 'recorded_at': 'hier'}),
+            self.line(self.other_vehicle, 10, 0),
+            self.line(self.other_vehicle, 5, 120), # Lower than the previous survivor
+        ]
+        response = self.post(lines)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['error_count'], 4)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3, 4, 6])
+        self.assertIn('recorded_at', response.data['errors'][2]['errors'])
+        self.assertIn('mileage', response.data['errors'][3]['errors'])
+
+    def test_customer_can_only_send_own_vehicles(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.post([self.line(self.vehicle, 100, 0), self.line(self.other_vehicle, 100, 0)])
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['line'], 2)
+        self.assertFalse(MileageRecord.objects.filter(vehicle=self.other_vehicle).exists())
+
+    def test_empty_body(self):
+        response = self.client.post(self.url, '', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['lines'], 0)
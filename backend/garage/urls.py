@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     VehicleViewSet, MileageRecordViewSet, ServiceTypeViewSet, 
     ServiceEventViewSet, PredictionRuleViewSet, ServicePredictionViewSet,
-    InvoiceViewSet, CustomerListView, UserViewSet
+    InvoiceViewSet, CustomerListView, UserViewSet, SyncView, SearchView, DashboardView,
+    ActivityFeedView
 )
 
 # Create a router and register our viewsets with it.
@@ -21,6 +22,10 @@ router.register(r'users', UserViewSet, basename='user')
 urlpatterns = [
     # Add URL for listing customers (admins only) FIRST
     path('users/customers/', CustomerListView.as_view(), name='customer-list'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('activity/', ActivityFeedView.as_view(), name='activity'),
     # Include router URLs AFTER specific paths
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -1,3 +1,5 @@
+import logging
+
 from django.shortcuts import render, redirect
 from rest_framework import viewsets, permissions, generics
 from django.contrib.auth import get_user_model
@@ -5,12 +7,21 @@ from .models import Vehicle, MileageRecord, ServiceType, ServiceEvent, Predictio
 from .serializers import (
     VehicleSerializer, MileageRecordSerializer, ServiceTypeSerializer, 
     ServiceEventSerializer, PredictionRuleSerializer, ServicePredictionSerializer,
-    RegisterSerializer, UserSerializer, InvoiceSerializer, CustomerListSerializer, ProfileSerializer
+    RegisterSerializer, UserSerializer, InvoiceSerializer, CustomerListSerializer, ProfileSerializer,
+    DuePredictionSerializer, MileageReadingSerializer
 )
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from .parsers import CSVParser
+from .fieldsets import SparseFieldsetViewMixin
+from .filters import ChoiceFilter, DateBoundFilter, Filter, parse_bound, parse_decimal
+from .conditional import conditional_get
+from .sync import sync_changes, SYNC_STREAMS
+from .dashboard import dashboard_stats
+from .activity import activity_feed, DEFAULT_LIMIT as DEFAULT_ACTIVITY_LIMIT, MAX_LIMIT as MAX_ACTIVITY_LIMIT
+from .search import search, MIN_QUERY_LENGTH as MIN_SEARCH_LENGTH, DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT, MAX_LIMIT as MAX_SEARCH_LIMIT
 from django.db import transaction
 # Imports for drf-yasg documentation
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.utils import swagger_auto_schema, no_body
 from drf_yasg import openapi
 from rest_framework import status
 from rest_framework.response import Response
@@ -19,10 +30,30 @@ from django.contrib.auth.models import Group
 from rest_framework import exceptions
 from django.views import View
 from rest_framework.decorators import action
+from .predictions import recompute_predictions
+from .jobs import enqueue_fleet_recompute, queue_depth, MAX_INLINE_VEHICLES as MAX_INLINE_RECOMPUTE_VEHICLES
+from .forecast import forecast_vehicle
+from .ingest import ingest_mileage_readings, MAX_BULK_ROWS
+from .telemetry import ingest_telemetry
+from .rollup import daily_mileage_history
+from .series import mileage_series, stream_series_envelope, DEFAULT_POINTS as DEFAULT_SERIES_POINTS, MAX_POINTS as MAX_SERIES_POINTS
+from datetime import date, timedelta
+from django.http import StreamingHttpResponse
+from django.db.models import Q
+from django.utils import timezone
 
 # Get User model instance
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
+# Query parameters of the sparse fieldsets (see garage.fieldsets), shared by list and retrieve
+SPARSE_FIELDSET_PARAMETERS = [
+    openapi.Parameter('fields', openapi.IN_QUERY, description="Champs à retourner, séparés par des virgules (ex: `id,vehicle,mileage`). Les clés étrangères (`vehicle`...) sont retournées sous forme d'ID.", type=openapi.TYPE_STRING),
+    openapi.Parameter('omit', openapi.IN_QUERY, description="Champs à exclure, séparés par des virgules", type=openapi.TYPE_STRING),
+    openapi.Parameter('view', openapi.IN_QUERY, description="`compact` : uniquement les identifiants et les références", type=openapi.TYPE_STRING, enum=['compact']),
+]
+
 # Create your views here.
 
 # --- Permission Classes --- (Define custom permissions later if needed)
@@ -158,20 +189,15 @@ class CurrentUserView(generics.RetrieveAPIView):
     def get_object(self):
         """Retourne l'objet utilisateur actuel (request.user)."""
         user = self.request.user
-        print(f"--- CurrentUserView --- START") # Added log
-        print(f"Request Headers: {self.request.headers}") # Added log
-        print(f"Request User: {user}") # Added log
-        print(f"Is Authenticated: {user.is_authenticated if user else 'N/A'}") # Added log
 
         if not user or not user.is_authenticated:
              # This check is technically redundant due to permission_classes,
              # but helps confirm the state if something unexpected happens.
-             print(f"WARNING: CurrentUserView accessed but request.user is not authenticated! User: {user}")
+             logger.warning("CurrentUserView accessed but request.user is not authenticated: %s", user)
              # Raising NotAuthenticated is more appropriate than letting it potentially 404
              raise exceptions.NotAuthenticated("Authentification requise ou invalide pour accéder à cet utilisateur.")
 
-        print(f"CurrentUserView: Fetching details for user: {user.username} (ID: {user.id})")
-        print(f"--- CurrentUserView --- END") # Added log
+        logger.debug("CurrentUserView: fetching details for user %s (ID: %s)", user.username, user.id)
         return user
 
 # --- ViewSets --- 
@@ -180,7 +206,7 @@ class CurrentUserView(generics.RetrieveAPIView):
     tags=['Véhicules'], # Group all vehicle actions under this tag
     operation_description="Opérations CRUD pour les véhicules."
 )
-class VehicleViewSet(viewsets.ModelViewSet):
+class VehicleViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """Gère les véhicules (CRUD).
 
     - **list**: Retourne les véhicules de l'utilisateur connecté (ou tous pour admin).
@@ -190,6 +216,25 @@ class VehicleViewSet(viewsets.ModelViewSet):
     - **destroy**: Supprime un véhicule (propriétaire ou admin uniquement).
     """
     serializer_class = VehicleSerializer
+    keyset_ordering = ('-created_at', '-id') # Newest first; also the pagination key
+    # List filters and `?ordering=` values (see garage/filters.py)
+    query_filters = {
+        'owner_id': Filter('owner_id', "Filtrer par ID de propriétaire (admin)"),
+        'make': Filter('make__iexact', "Filtrer par marque (insensible à la casse)", parse=str, schema_type='string'),
+        'model': Filter('model__iexact', "Filtrer par modèle (insensible à la casse)", parse=str, schema_type='string'),
+        'year': Filter('year', "Filtrer par année"),
+        'year_min': Filter('year__gte', "Année minimale"),
+        'year_max': Filter('year__lte', "Année maximale"),
+        'registration_prefix': Filter(
+            'registration_number__istartswith', "Début du numéro d'immatriculation", parse=str, schema_type='string'
+        ),
+    }
+    orderings = {
+        'created_at': ('created_at', 'id'),
+        'registration_number': ('registration_number',), # Unique
+        'year': ('year', 'id'),
+        'latest_mileage': ('latest_mileage', 'id'),
+    }
     # Apply IsOwnerOrReadOnly for object-level permissions on detail views (update/delete)
     # IsAuthenticated is applied globally in settings.py
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
@@ -205,9 +250,9 @@ class VehicleViewSet(viewsets.ModelViewSet):
              return Vehicle.objects.none()
              
         if user.is_staff or user.is_superuser:
-            return Vehicle.objects.all().order_by('-created_at')
+            return Vehicle.objects.all().order_by(*self.keyset_ordering)
         elif user.is_authenticated: # Check if authenticated before filtering
-            return Vehicle.objects.filter(owner=user).order_by('-created_at')
+            return Vehicle.objects.filter(owner=user).order_by(*self.keyset_ordering)
         else:
             return Vehicle.objects.none() # Unauthenticated users see nothing
 
@@ -285,6 +330,7 @@ class VehicleViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         operation_summary="Lister les véhicules",
         operation_description="Retourne la liste des véhicules accessibles par l'utilisateur (les siens pour Client, tous pour Admin).",
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
         responses={
             status.HTTP_200_OK: openapi.Response(
                 description="Liste des véhicules.",
@@ -322,10 +368,12 @@ class VehicleViewSet(viewsets.ModelViewSet):
             )
         }
     )
+    @conditional_get
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
     
-    @swagger_auto_schema(operation_summary="Récupérer un véhicule spécifique")
+    @swagger_auto_schema(operation_summary="Récupérer un véhicule spécifique", manual_parameters=SPARSE_FIELDSET_PARAMETERS)
+    @conditional_get
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -341,11 +389,161 @@ class VehicleViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
          return super().destroy(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        operation_summary="Prévoir les entretiens d'un véhicule à une date / un kilométrage",
+        operation_description=(
+            "Calcule en mémoire, sans rien enregistrer, les prédictions du véhicule à la date `as_of` "
+            "(aujourd'hui par défaut) et au kilométrage `mileage`.\n"
+            "Sans `mileage`, le kilométrage à `as_of` est estimé à partir du dernier relevé et de la moyenne journalière."
+        ),
+        manual_parameters=[
+            openapi.Parameter('as_of', openapi.IN_QUERY, description="Date de référence (AAAA-MM-JJ)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('mileage', openapi.IN_QUERY, description="Kilométrage à cette date", type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Prévisions du véhicule.",
+                examples={
+                    "application/json": {
+                        "vehicle": 1, "as_of": "2024-09-01", "mileage": 21500, "average_daily_km": 35.2,
+                        "predictions": [
+                            {
+                                "service_type": 1, "service_type_name": "Vidange Moteur",
+                                "predicted_due_mileage": 25000, "predicted_due_date": "2024-10-10",
+                                "km_remaining": 3500, "days_remaining": 39, "is_due": False
+                            }
+                        ]
+                    }
+                }
+            ),
+            status.HTTP_400_BAD_REQUEST: "`as_of` ou `mileage` invalide",
+            status.HTTP_404_NOT_FOUND: "Véhicule non trouvé"
+        }
+    )
+    @action(detail=True, methods=['get'], url_path='forecast')
+    def forecast(self, request, pk=None):
+        vehicle = self.get_object()
+        as_of = request.query_params.get('as_of')
+        mileage = request.query_params.get('mileage')
+        errors = {}
+        if as_of is not None:
+            try:
+                as_of = date.fromisoformat(as_of)
+            except ValueError:
+                errors['as_of'] = "Doit être une date au format AAAA-MM-JJ."
+        if mileage is not None:
+            try:
+                mileage = int(mileage)
+                if mileage < 0:
+                    raise ValueError
+            except ValueError:
+                errors['mileage'] = "Doit être un kilométrage entier positif."
+        if errors:
+            raise serializers.ValidationError(errors)
+        return Response(forecast_vehicle(vehicle, as_of=as_of, mileage=mileage))
+
+    @swagger_auto_schema(
+        operation_summary="Historique kilométrique journalier d'un véhicule",
+        operation_description=(
+            "Retourne, jour par jour, le kilométrage minimum et maximum et le nombre de relevés du véhicule.\n"
+            "Les jours anciens proviennent des résumés journaliers (relevés regroupés par `compact_mileage_history`), "
+            "les jours récents des relevés eux-mêmes : l'historique est continu."
+        ),
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, description="Premier jour inclus (AAAA-MM-JJ)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('to', openapi.IN_QUERY, description="Dernier jour inclus (AAAA-MM-JJ)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+        ],
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Historique journalier.",
+                examples={
+                    "application/json": [
+                        {"day": "2024-09-01", "min_mileage": 21450, "max_mileage": 21530, "reading_count": 3}
+                    ]
+                }
+            ),
+            status.HTTP_400_BAD_REQUEST: "`from` ou `to` invalide",
+            status.HTTP_404_NOT_FOUND: "Véhicule non trouvé"
+        }
+    )
+    @action(detail=True, methods=['get'], url_path='mileage-history')
+    def mileage_history(self, request, pk=None):
+        vehicle = self.get_object()
+        bounds, errors = {}, {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            if value is None:
+                bounds[param] = None
+                continue
+            try:
+                bounds[param] = date.fromisoformat(value)
+            except ValueError:
+                errors[param] = "Doit être une date au format AAAA-MM-JJ."
+        if errors:
+            raise serializers.ValidationError(errors)
+        return Response(daily_mileage_history(vehicle.pk, start=bounds['from'], end=bounds['to']))
+
+    @swagger_auto_schema(
+        operation_summary="Série kilométrique sous-échantillonnée d'un véhicule",
+        operation_description=(
+            "Retourne l'évolution du kilométrage sous forme de paires `[horodatage en ms, km]`, réduite côté serveur "
+            "à au plus `points` points par l'algorithme LTTB (Largest-Triangle-Three-Buckets), qui conserve l'allure "
+            "de la courbe. La taille de la réponse ne dépend pas du nombre de relevés ; elle est envoyée en flux.\n"
+            "`metadata.count` donne le nombre de points disponibles sur la période."
+        ),
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, description="Début inclus (AAAA-MM-JJ ou date ISO 8601)", type=openapi.TYPE_STRING),
+            openapi.Parameter('to', openapi.IN_QUERY, description="Fin incluse (AAAA-MM-JJ ou date ISO 8601)", type=openapi.TYPE_STRING),
+            openapi.Parameter('points', openapi.IN_QUERY, description=f"Nombre maximal de points (3 à {MAX_SERIES_POINTS}, défaut : {DEFAULT_SERIES_POINTS})", type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Série kilométrique.",
+                examples={
+                    "application/json": {
+                        "metadata": {"timestamp": "2024-09-01T10:00:00+01:00", "count": 18250, "points": 3},
+                        "data": [[1693526400000, 1000], [1709251200000, 9800], [1725148800000, 21500]],
+                        "error": None
+                    }
+                }
+            ),
+            status.HTTP_400_BAD_REQUEST: "`from`, `to` ou `points` invalide",
+            status.HTTP_404_NOT_FOUND: "Véhicule non trouvé"
+        }
+    )
+    @action(detail=True, methods=['get'], url_path='mileage-series')
+    def mileage_series(self, request, pk=None):
+        vehicle = self.get_object()
+        errors = {}
+        start, end = request.query_params.get('from'), request.query_params.get('to')
+        bounds = {}
+        for param, value in (('from', start), ('to', end)):
+            if value is None:
+                bounds[param] = None
+                continue
+            try:
+                bounds[param] = parse_bound(value, upper=param == 'to')
+            except ValueError as exc:
+                errors[param] = str(exc)
+        try:
+            points = int(request.query_params.get('points', DEFAULT_SERIES_POINTS))
+            if not 3 <= points <= MAX_SERIES_POINTS:
+                raise ValueError
+        except ValueError:
+            errors['points'] = f"Doit être un entier entre 3 et {MAX_SERIES_POINTS}."
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        count, series = mileage_series(vehicle.pk, start=bounds['from'], end=bounds['to'], points=points)
+        return StreamingHttpResponse(
+            stream_series_envelope(count, series, points), content_type='application/json'
+        )
+
 @swagger_auto_schema(
     tags=['Kilométrage'],
     operation_description="Opérations CRUD pour les relevés de kilométrage."
 )
-class MileageRecordViewSet(viewsets.ModelViewSet):
+class MileageRecordViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """Gère les relevés de kilométrage (CRUD).
 
     - **list/retrieve**: Retourne les relevés des véhicules du client (ou tous pour admin).
@@ -353,6 +551,17 @@ class MileageRecordViewSet(viewsets.ModelViewSet):
     - **update/partial_update/destroy**: Modifie/supprime un relevé (admin uniquement pour l'instant).
     """
     serializer_class = MileageRecordSerializer
+    keyset_ordering = ('-recorded_at', '-id')
+    conditional_fields = ('updated_at',) # ETag / Last-Modified, see garage.conditional
+    query_filters = {
+        'vehicle_id': Filter('vehicle_id', "Filtrer les relevés par ID de véhicule"),
+        'source': ChoiceFilter('source', MileageRecord.SOURCE_CHOICES, "Filtrer par source du relevé"),
+        'recorded_from': DateBoundFilter('recorded_at', 'from', "Relevés à partir de cette date (incluse)"),
+        'recorded_to': DateBoundFilter('recorded_at', 'to', "Relevés jusqu'à cette date (incluse)"),
+        'mileage_min': Filter('mileage__gte', "Kilométrage minimal"),
+        'mileage_max': Filter('mileage__lte', "Kilométrage maximal"),
+    }
+    orderings = {'recorded_at': ('recorded_at', 'id'), 'mileage': ('mileage', 'id')}
     
     def get_permissions(self):
         """Instantiates and returns the list of permissions that this view requires."""
@@ -375,25 +584,18 @@ class MileageRecordViewSet(viewsets.ModelViewSet):
             queryset = base_queryset.filter(vehicle__owner=user)
         else:
              queryset = MileageRecord.objects.none() # Unauthenticated users see nothing
-        
-        # Optional filtering by vehicle_id query parameter
-        vehicle_id = self.request.query_params.get('vehicle_id')
-        if vehicle_id is not None:
-            if user.is_staff or user.is_superuser or Vehicle.objects.filter(id=vehicle_id, owner=user).exists():
-                queryset = queryset.filter(vehicle_id=vehicle_id)
-            else:
-                return queryset.none()
-        
-        return queryset.order_by('-recorded_at')
+                
+        return queryset.order_by(*self.keyset_ordering)
 
     @swagger_auto_schema(
         operation_summary="Lister les relevés de kilométrage",
-        operation_description="Retourne les relevés de kilométrage pour les véhicules de l'utilisateur (ou tous pour admin). Peut être filtré par `vehicle_id`.",
+        operation_description="Retourne les relevés de kilométrage pour les véhicules de l'utilisateur (ou tous pour admin). Filtres et tri : voir les paramètres.",
         manual_parameters=[
-            openapi.Parameter('vehicle_id', openapi.IN_QUERY, description="Filtrer les relevés par ID de véhicule", type=openapi.TYPE_INTEGER)
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
         responses={status.HTTP_200_OK: MileageRecordSerializer(many=True)}
     )
+    @conditional_get
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
@@ -452,7 +654,8 @@ class MileageRecordViewSet(viewsets.ModelViewSet):
         # Save with recorded_by and determined source
         serializer.save(recorded_by=user, source=source)
 
-    @swagger_auto_schema(operation_summary="Récupérer un relevé spécifique")
+    @swagger_auto_schema(operation_summary="Récupérer un relevé spécifique", manual_parameters=SPARSE_FIELDSET_PARAMETERS)
+    @conditional_get
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -480,6 +683,110 @@ class MileageRecordViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        operation_summary="Importer des relevés de kilométrage en masse",
+        operation_description=(
+            "Enregistre en une seule transaction une liste de relevés, envoyée en JSON (tableau d'objets) "
+            "ou en CSV (`Content-Type: text/csv`, en-tête `vehicle_id,mileage,recorded_at`).\n"
+            "Les relevés de chaque véhicule sont vérifiés dans l'ordre chronologique : un kilométrage "
+            "inférieur au dernier relevé est refusé. Une ligne invalide n'empêche pas l'import des autres ; "
+            f"les erreurs sont renvoyées par numéro de ligne (à partir de 1). Au plus {MAX_BULK_ROWS} lignes.\n"
+            "Les prédictions de chaque véhicule concerné sont recalculées une seule fois."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                required=['vehicle_id', 'mileage'],
+                properties={
+                    'vehicle_id': openapi.Schema(type=openapi.TYPE_INTEGER, description="ID du véhicule"),
+                    'mileage': openapi.Schema(type=openapi.TYPE_INTEGER, description="Kilométrage relevé", example=15000),
+                    'recorded_at': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME, description="Date du relevé (maintenant par défaut)"),
+                }
+            )
+        ),
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Bilan de l'import.",
+                examples={
+                    "application/json": {
+                        "created": 2, "vehicles": 1,
+                        "errors": [{"row": 3, "errors": {"mileage": ["Le kilométrage (900 km) ne peut pas être inférieur au dernier relevé (15000 km)."]}}]
+                    }
+                }
+            ),
+            status.HTTP_400_BAD_REQUEST: "Corps invalide (ni tableau ni CSV, ou trop de lignes)"
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, CSVParser])
+    def bulk(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            raise serializers.ValidationError({"detail": "Le corps doit être un tableau de relevés ou un fichier CSV."})
+        if len(rows) > MAX_BULK_ROWS:
+            raise serializers.ValidationError({"detail": f"Au plus {MAX_BULK_ROWS} relevés par import."})
+
+        now = timezone.now()
+        readings, errors = [], []
+        for row, data in enumerate(rows, start=1):
+            serializer = MileageReadingSerializer(data=data if isinstance(data, dict) else {})
+            if not serializer.is_valid():
+                errors.append({'row': row, 'errors': serializer.errors})
+                continue
+            reading = serializer.validated_data
+            readings.append((row, reading['vehicle_id'], reading['mileage'], reading.get('recorded_at', now)))
+
+        user = request.user
+        result = ingest_mileage_readings(
+            readings,
+            recorded_by=user,
+            source='ADMIN' if user.is_staff else 'CUSTOMER',
+            owner=None if user.is_staff else user,
+        )
+        result['errors'] = sorted(errors + result['errors'], key=lambda error: error['row'])
+        logger.info(
+            "Bulk mileage import: %s created, %s rejected, %s vehicles",
+            result['created'], len(result['errors']), result['vehicles'],
+        )
+        return Response(result)
+
+    @swagger_auto_schema(
+        operation_summary="Envoyer de la télémétrie odométrique (NDJSON)",
+        operation_description=(
+            "Reçoit un flux NDJSON (`Content-Type: application/x-ndjson`), un relevé par ligne : "
+            "`{\"vehicle_id\": 1, \"mileage\": 15000, \"recorded_at\": \"2024-09-01T08:00:00Z\"}`.\n"
+            "Le corps est lu ligne par ligne. Un seul relevé (le plus élevé) est conservé par véhicule et par "
+            "fenêtre de `TELEMETRY_RESOLUTION_MINUTES` minutes ; les relevés conservés sont enregistrés par lots "
+            "avec la source `TELEMETRY`. Les relevés de chaque véhicule doivent être envoyés dans l'ordre chronologique.\n"
+            "Les erreurs sont renvoyées par numéro de ligne (les 100 premières)."
+        ),
+        request_body=no_body,
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Bilan de l'envoi.",
+                examples={
+                    "application/json": {
+                        "lines": 120, "created": 2, "downsampled": 117, "error_count": 1,
+                        "errors": [{"line": 42, "errors": {"mileage": ["Le kilométrage doit être un nombre positif."]}}]
+                    }
+                }
+            )
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='telemetry')
+    def telemetry(self, request):
+        user = request.user
+        # Read the raw stream: request.data would parse (and buffer) the whole body
+        stream = request.stream
+        if stream is None:
+            return Response({'lines': 0, 'created': 0, 'downsampled': 0, 'error_count': 0, 'errors': []})
+        result = ingest_telemetry(stream, recorded_by=user, owner=None if user.is_staff else user)
+        logger.info(
+            "Telemetry ingest: %s lines, %s created, %s downsampled, %s rejected",
+            result['lines'], result['created'], result['downsampled'], result['error_count'],
+        )
+        return Response(result)
+
 # --- New ViewSets --- 
 
 @swagger_auto_schema(
@@ -490,9 +797,11 @@ class ServiceTypeViewSet(viewsets.ModelViewSet):
     """Gère les types de service (Admin uniquement - CRUD)."""
     queryset = ServiceType.objects.all()
     serializer_class = ServiceTypeSerializer
+    keyset_ordering = ('name', 'id')
     permission_classes = [IsAdminUser] # Example: Only admins can manage service types
 
     @swagger_auto_schema(operation_summary="Lister tous les types de service")
+    @conditional_get
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
         
@@ -501,6 +810,7 @@ class ServiceTypeViewSet(viewsets.ModelViewSet):
         return super().create(request, *args, **kwargs)
         
     @swagger_auto_schema(operation_summary="Récupérer un type de service spécifique")
+    @conditional_get
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -520,13 +830,22 @@ class ServiceTypeViewSet(viewsets.ModelViewSet):
     tags=['Événements de Service'],
     operation_description="Gestion des enregistrements des interventions de service effectuées sur les véhicules."
 )
-class ServiceEventViewSet(viewsets.ModelViewSet):
+class ServiceEventViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """Gère les interventions de service effectuées (CRUD).
 
     - **list/retrieve**: Retourne les interventions des véhicules du client (ou tous pour admin).
     - **create/update/partial_update/destroy**: Ajoute/modifie/supprime une intervention (admin uniquement).
     """
     serializer_class = ServiceEventSerializer
+    keyset_ordering = ('-event_date', '-id')
+    conditional_fields = ('updated_at', 'vehicle__updated_at', 'service_type__updated_at') # Embedded in vehicle_info / service_type_info
+    query_filters = {
+        'vehicle_id': Filter('vehicle_id', "Filtrer les interventions par ID de véhicule"),
+        'service_type_id': Filter('service_type_id', "Filtrer par ID de type de service"),
+        'event_from': DateBoundFilter('event_date', 'from', "Interventions à partir de cette date (incluse)"),
+        'event_to': DateBoundFilter('event_date', 'to', "Interventions jusqu'à cette date (incluse)"),
+    }
+    orderings = {'event_date': ('event_date', 'id'), 'mileage_at_service': ('mileage_at_service', 'id')}
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -549,28 +868,17 @@ class ServiceEventViewSet(viewsets.ModelViewSet):
         else:
             queryset = ServiceEvent.objects.none()
         
-        # Optional filtering by vehicle_id query parameter
-        vehicle_id = self.request.query_params.get('vehicle_id')
-        if vehicle_id is not None:
-            # Ensure the user has permission to view events for this vehicle_id
-            can_view_vehicle = (user.is_staff 
-                                or user.is_superuser 
-                                or Vehicle.objects.filter(id=vehicle_id, owner=user).exists())
-            if can_view_vehicle:
-                queryset = queryset.filter(vehicle_id=vehicle_id)
-            else:
-                return queryset.none()
-
-        return queryset.order_by('-event_date')
+        return queryset.order_by(*self.keyset_ordering)
 
     @swagger_auto_schema(
         operation_summary="Lister les interventions de service",
-        operation_description="Retourne les interventions pour les véhicules de l'utilisateur (ou tous pour admin). Peut être filtré par `vehicle_id`.",
+        operation_description="Retourne les interventions pour les véhicules de l'utilisateur (ou tous pour admin). Filtres et tri : voir les paramètres.",
         manual_parameters=[
-            openapi.Parameter('vehicle_id', openapi.IN_QUERY, description="Filtrer les interventions par ID de véhicule", type=openapi.TYPE_INTEGER)
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
         responses={status.HTTP_200_OK: ServiceEventSerializer(many=True)}
     )
+    @conditional_get
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
@@ -603,7 +911,8 @@ class ServiceEventViewSet(viewsets.ModelViewSet):
         # If needed later, add check: vehicle = serializer.validated_data['vehicle'] etc.
         serializer.save()
 
-    @swagger_auto_schema(operation_summary="Récupérer une intervention spécifique")
+    @swagger_auto_schema(operation_summary="Récupérer une intervention spécifique", manual_parameters=SPARSE_FIELDSET_PARAMETERS)
+    @conditional_get
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -639,6 +948,7 @@ class PredictionRuleViewSet(viewsets.ModelViewSet):
     """Gère les règles de prédiction basées sur les intervalles (Admin uniquement - CRUD)."""
     queryset = PredictionRule.objects.all().select_related('service_type')
     serializer_class = PredictionRuleSerializer
+    keyset_ordering = ('id',)
     permission_classes = [IsAdminUser] # Example: Only admins can manage rules
 
     @swagger_auto_schema(operation_summary="Lister les règles de prédiction actives")
@@ -669,12 +979,22 @@ class PredictionRuleViewSet(viewsets.ModelViewSet):
     tags=['Prédictions de Service'],
     operation_description="Affichage des prédictions de service générées pour les véhicules (lecture seule)."
 )
-class ServicePredictionViewSet(viewsets.ReadOnlyModelViewSet):
+class ServicePredictionViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """Affiche les prédictions de service générées (Lecture seule).
 
     - **list/retrieve**: Retourne les prédictions des véhicules du client (ou tous pour admin).
     """
     serializer_class = ServicePredictionSerializer
+    keyset_ordering = ('vehicle_id', 'predicted_due_date', 'predicted_due_mileage', 'id')
+    conditional_fields = ('updated_at', 'vehicle__updated_at', 'service_type__updated_at')
+    query_filters = {
+        'vehicle_id': Filter('vehicle_id', "Filtrer les prédictions par ID de véhicule"),
+        'service_type_id': Filter('service_type_id', "Filtrer par ID de type de service"),
+    }
+    orderings = {
+        'predicted_due_date': ('predicted_due_date', 'km_remaining', 'id'),
+        'km_remaining': ('km_remaining', 'id'),
+    }
     permission_classes = [permissions.IsAuthenticated] # Read-only, access controlled by queryset filter
 
     def get_queryset(self):
@@ -689,29 +1009,18 @@ class ServicePredictionViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = base_queryset.filter(vehicle__owner=user)
         else:
             queryset = ServicePrediction.objects.none()
-        
-        # Optional filtering by vehicle_id query parameter
-        vehicle_id = self.request.query_params.get('vehicle_id')
-        if vehicle_id is not None:
-            # Ensure the user has permission to view predictions for this vehicle_id
-            can_view_vehicle = (user.is_staff 
-                                or user.is_superuser 
-                                or Vehicle.objects.filter(id=vehicle_id, owner=user).exists())
-            if can_view_vehicle:
-                queryset = queryset.filter(vehicle_id=vehicle_id)
-            else:
-                return queryset.none()
-                
-        return queryset.order_by('vehicle', 'predicted_due_date', 'predicted_due_mileage')
+                        
+        return queryset.order_by(*self.keyset_ordering)
 
     @swagger_auto_schema(
         operation_summary="Lister les prédictions de service",
-        operation_description="Retourne les prédictions pour les véhicules de l'utilisateur (ou tous pour admin). Peut être filtré par `vehicle_id`.",
+        operation_description="Retourne les prédictions pour les véhicules de l'utilisateur (ou tous pour admin). Filtres et tri : voir les paramètres.",
         manual_parameters=[
-            openapi.Parameter('vehicle_id', openapi.IN_QUERY, description="Filtrer les prédictions par ID de véhicule", type=openapi.TYPE_INTEGER)
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
         responses={status.HTTP_200_OK: ServicePredictionSerializer(many=True)}
     )
+    @conditional_get
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
@@ -722,17 +1031,128 @@ class ServicePredictionViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
         
-    @swagger_auto_schema(operation_summary="Récupérer une prédiction spécifique")
+    @swagger_auto_schema(operation_summary="Récupérer une prédiction spécifique", manual_parameters=SPARSE_FIELDSET_PARAMETERS)
+    @conditional_get
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
-# --- Invoice ViewSet --- 
+    @swagger_auto_schema(
+        operation_summary="Recalculer les prédictions - Admin Seulement",
+        operation_description=(
+            "Recalcule la moyenne kilométrique journalière et toutes les prédictions basées sur les règles actives.\n"
+            f"Jusqu'à {MAX_INLINE_RECOMPUTE_VEHICLES} `vehicle_ids`, le recalcul est immédiat et ses statistiques sont retournées (200). "
+            "Sans `vehicle_ids` (toute la flotte) ou au-delà, les véhicules sont mis dans la file traitée par la commande "
+            "`ecar_worker` et la réponse (202) donne le nombre de véhicules mis en file et l'état de la file."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'vehicle_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                    description="IDs des véhicules à recalculer (optionnel)"
+                )
+            }
+        ),
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Statistiques du recalcul.",
+                examples={
+                    "application/json": {
+                        "total": 2, "vehicles": 2, "predictions": 6, "changed": 2, "unchanged": 4,
+                        "avg_km_updated": 1, "elapsed": 0.02
+                    }
+                }
+            ),
+            status.HTTP_202_ACCEPTED: openapi.Response(
+                description="Recalcul mis en file.",
+                examples={
+                    "application/json": {"queued": 1200, "pending": 1203, "ready": 1203, "failed": 0, "oldest_age_seconds": 0.4}
+                }
+            ),
+            status.HTTP_400_BAD_REQUEST: "`vehicle_ids` invalide",
+            status.HTTP_403_FORBIDDEN: "Permission refusée (non admin)"
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='recompute', permission_classes=[IsAdminUser])
+    def recompute(self, request):
+        vehicle_ids = request.data.get('vehicle_ids')
+        if vehicle_ids is not None:
+            if not isinstance(vehicle_ids, list) or not all(isinstance(pk, int) for pk in vehicle_ids):
+                raise serializers.ValidationError({"vehicle_ids": "Doit être une liste d'identifiants de véhicules."})
+            if len(vehicle_ids) <= MAX_INLINE_RECOMPUTE_VEHICLES:
+                return Response(recompute_predictions(vehicle_ids=vehicle_ids))
+        # Too long for a request: the worker recomputes them
+        queued = enqueue_fleet_recompute(vehicle_ids)
+        return Response({'queued': queued, **queue_depth()}, status=status.HTTP_202_ACCEPTED)
+
+    @swagger_auto_schema(
+        operation_summary="État de la file de recalcul - Admin Seulement",
+        operation_description=(
+            "Retourne la profondeur de la file des recalculs de prédictions traitée par la commande `ecar_worker` : "
+            "tâches en attente, prêtes à être exécutées, en échec, et âge de la plus ancienne tâche prête."
+        ),
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Métriques de la file.",
+                examples={
+                    "application/json": {"pending": 3, "ready": 2, "failed": 0, "oldest_age_seconds": 4.2}
+                }
+            ),
+            status.HTTP_403_FORBIDDEN: "Permission refusée (non admin)"
+        }
+    )
+    @action(detail=False, methods=['get'], url_path='queue', permission_classes=[IsAdminUser])
+    def queue(self, request):
+        return Response(queue_depth())
+
+    @swagger_auto_schema(
+        operation_summary="Liste des entretiens à prévoir (atelier)",
+        operation_description=(
+            "Retourne, du plus urgent au moins urgent, les prédictions dont la date d'échéance tombe dans les "
+            "`within_days` prochains jours ou dont il reste au plus `within_km` km.\n"
+            "Format compact paginé par curseur : suivre `metadata.pagination.next`."
+        ),
+        manual_parameters=[
+            openapi.Parameter('within_days', openapi.IN_QUERY, description="Horizon en jours (défaut : 30)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('within_km', openapi.IN_QUERY, description="Horizon en kilomètres (défaut : 1000)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Nombre de lignes par page (défaut : 50, max : 500)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Curseur de pagination", type=openapi.TYPE_STRING),
+        ],
+        responses={
+            status.HTTP_200_OK: DuePredictionSerializer(many=True),
+            status.HTTP_400_BAD_REQUEST: "`within_days` ou `within_km` invalide"
+        }
+    )
+    # Most urgent first: earliest due date, then fewest km remaining
+    @action(detail=False, methods=['get'], url_path='due', keyset_ordering=('predicted_due_date', 'km_remaining', 'id'))
+    def due(self, request):
+        horizons = {}
+        for param, default in (('within_days', 30), ('within_km', 1000)):
+            try:
+                horizons[param] = int(request.query_params.get(param, default))
+                if horizons[param] < 0:
+                    raise ValueError
+            except ValueError:
+                raise serializers.ValidationError({param: "Doit être un entier positif."})
+
+        due_before = timezone.localdate() + timedelta(days=horizons['within_days'])
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            Q(predicted_due_date__lte=due_before) | Q(km_remaining__lte=horizons['within_km'])
+        ).select_related('vehicle__owner', 'service_type').only(
+            'vehicle_id', 'service_type_id', 'predicted_due_date', 'predicted_due_mileage', 'km_remaining',
+            'vehicle__registration_number', 'vehicle__make', 'vehicle__model', 'vehicle__owner__username',
+            'service_type__name',
+        )
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(DuePredictionSerializer(page, many=True).data)
+
+# --- Invoice ViewSet ---
 
 @swagger_auto_schema(
     tags=['Factures'],
     operation_description="Gestion des factures PDF associées aux véhicules."
 )
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """Gère les factures PDF (CRUD).
 
     Accepte les uploads via `multipart/form-data`.
@@ -740,6 +1160,20 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     - **create/update/partial_update/destroy**: Ajoute/modifie/supprime une facture (admin uniquement).
     """
     serializer_class = InvoiceSerializer
+    keyset_ordering = ('-uploaded_at', '-id')
+    conditional_fields = ('updated_at', 'vehicle__updated_at')
+    query_filters = {
+        'vehicle_id': Filter('vehicle_id', "Filtrer les factures par ID de véhicule"),
+        'invoice_from': DateBoundFilter('invoice_date', 'from', "Factures datées à partir de ce jour (inclus)"),
+        'invoice_to': DateBoundFilter('invoice_date', 'to', "Factures datées jusqu'à ce jour (inclus)"),
+        'amount_min': Filter('final_amount__gte', "Montant minimal (DT)", parse=parse_decimal, schema_type='number'),
+        'amount_max': Filter('final_amount__lte', "Montant maximal (DT)", parse=parse_decimal, schema_type='number'),
+    }
+    orderings = {
+        'uploaded_at': ('uploaded_at', 'id'),
+        'invoice_date': ('invoice_date', 'id'),
+        'final_amount': ('final_amount', 'id'),
+    }
     parser_classes = (MultiPartParser, FormParser) # Support file uploads
 
     def get_permissions(self):
@@ -762,28 +1196,17 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         else:
             queryset = Invoice.objects.none()
         
-        # Optional filtering by vehicle_id query parameter
-        vehicle_id = self.request.query_params.get('vehicle_id')
-        if vehicle_id is not None:
-             # Ensure the user has permission to view invoices for this vehicle_id
-            can_view_vehicle = (user.is_staff 
-                                or user.is_superuser 
-                                or Vehicle.objects.filter(id=vehicle_id, owner=user).exists())
-            if can_view_vehicle:
-                queryset = queryset.filter(vehicle_id=vehicle_id)
-            else:
-                return queryset.none()
-
-        return queryset.order_by('-uploaded_at')
+        return queryset.order_by(*self.keyset_ordering)
 
     @swagger_auto_schema(
         operation_summary="Lister les factures",
-        operation_description="Retourne les factures pour les véhicules de l'utilisateur (ou tous pour admin). Peut être filtré par `vehicle_id`.",
+        operation_description="Retourne les factures pour les véhicules de l'utilisateur (ou tous pour admin). Filtres et tri : voir les paramètres.",
         manual_parameters=[
-            openapi.Parameter('vehicle_id', openapi.IN_QUERY, description="Filtrer les factures par ID de véhicule", type=openapi.TYPE_INTEGER)
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
         responses={status.HTTP_200_OK: InvoiceSerializer(many=True)}
     )
+    @conditional_get
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
@@ -848,7 +1271,8 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         """Associate the invoice with the uploading user."""
         serializer.save(uploaded_by=self.request.user)
 
-    @swagger_auto_schema(operation_summary="Récupérer une facture spécifique")
+    @swagger_auto_schema(operation_summary="Récupérer une facture spécifique", manual_parameters=SPARSE_FIELDSET_PARAMETERS)
+    @conditional_get
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -909,27 +1333,234 @@ class CustomerListView(generics.ListAPIView):
     Accessible uniquement par les administrateurs.
     """
     serializer_class = CustomerListSerializer # <-- Use the new serializer
+    keyset_ordering = ('username', 'id')
     permission_classes = [permissions.IsAdminUser] # Only admins can list customers
 
     def get_queryset(self):
         """Retourne les utilisateurs du groupe 'Customers'."""
-        print("--- CustomerListView --- get_queryset START") # Added log
         queryset = User.objects.none() # Default to empty
         try:
-            print("Attempting to get 'Customers' group...") # Added log
             customer_group = Group.objects.get(name='Customers')
-            print(f"'Customers' group found: {customer_group}") # Added log
-            queryset = User.objects.filter(groups=customer_group).order_by('username')
-            print(f"Queryset created, count: {queryset.count()}") # Added log
+            queryset = User.objects.filter(groups=customer_group).order_by(*self.keyset_ordering)
         except Group.DoesNotExist:
-            print("ERROR: 'Customers' group does not exist.") # Enhanced log
+            logger.error("'Customers' group does not exist")
             # Keep queryset as User.objects.none()
-        except Exception as e:
-             print(f"ERROR: An unexpected error occurred in get_queryset: {e}") # Added general exception log
+        except Exception:
+             logger.exception("Unexpected error in CustomerListView.get_queryset")
 
-        print("--- CustomerListView --- get_queryset END") # Added log
         return queryset
 
+# --- Delta sync ---
+
+class SyncView(generics.GenericAPIView):
+    """Synchronisation incrémentale : ce qui a été créé, modifié ou supprimé depuis le dernier appel."""
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None # Paged by the sync token
+
+    @swagger_auto_schema(
+        tags=['Synchronisation'],
+        operation_summary="Synchroniser les données (delta)",
+        operation_description=(
+            "Retourne les véhicules, relevés, interventions et factures de l'utilisateur (tous pour admin) "
+            "créés ou modifiés depuis le jeton `since`, et les ID supprimés depuis (`deleted`).\n"
+            "Sans `since`, toutes les données sont retournées. Chaque réponse contient le jeton (`token`) "
+            "du prochain appel ; si `has_more` est vrai, rappeler immédiatement avec ce jeton.\n"
+            "Une ligne peut être renvoyée plusieurs fois : appliquer `changes` par ID, puis `deleted`. "
+            "La suppression d'un véhicule supprime ses relevés, interventions et factures.\n"
+            "Si `reset` est vrai (jeton trop ancien), tout est renvoyé : supprimer les lignes locales absentes de la réponse."
+        ),
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY, description="Jeton retourné par l'appel précédent", type=openapi.TYPE_STRING),
+        ],
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Changements depuis le jeton.",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'token': openapi.Schema(type=openapi.TYPE_STRING, description="Jeton du prochain appel"),
+                        'has_more': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                        'reset': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                        'changes': openapi.Schema(type=openapi.TYPE_OBJECT, properties={
+                            name: openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT))
+                            for name in SYNC_STREAMS
+                        }),
+                        'deleted': openapi.Schema(type=openapi.TYPE_OBJECT, properties={
+                            name: openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER))
+                            for name in SYNC_STREAMS
+                        }),
+                    }
+                )
+            ),
+            status.HTTP_400_BAD_REQUEST: "Jeton invalide",
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            result = sync_changes(request.user, request.query_params.get('since'), context={'request': request})
+        except ValueError as e:
+            raise serializers.ValidationError({'since': [str(e)]})
+        return Response(result)
+
+# --- Quick search ---
+
+class SearchView(generics.GenericAPIView):
+    """Recherche rapide de véhicules (et de clients pour les administrateurs)."""
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None # Ranked and limited by `limit`
+
+    @swagger_auto_schema(
+        tags=['Recherche'],
+        operation_summary="Rechercher un véhicule ou un client",
+        operation_description=(
+            "Cherche `q` dans l'immatriculation, le VIN, la marque et le modèle des véhicules de l'utilisateur "
+            "(tous pour admin) et, pour les administrateurs, dans l'identifiant, le nom et le téléphone des clients.\n"
+            "Les résultats sont typés (`vehicle` / `customer`) et classés : correspondance exacte (3), "
+            "début (2), puis partielle (1).\n"
+            "La recherche est limitée dans le temps : si le délai est dépassé, `partial` est vrai et les résultats sont incomplets."
+        ),
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description=f"Texte recherché ({MIN_SEARCH_LENGTH} caractères minimum)", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('limit', openapi.IN_QUERY, description=f"Nombre maximal de résultats (défaut : {DEFAULT_SEARCH_LIMIT}, max : {MAX_SEARCH_LIMIT})", type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Résultats classés.",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'query': openapi.Schema(type=openapi.TYPE_STRING),
+                        'partial': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Délai dépassé : résultats incomplets"),
+                        'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'type': openapi.Schema(type=openapi.TYPE_STRING, enum=['vehicle', 'customer']),
+                                'id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'label': openapi.Schema(type=openapi.TYPE_STRING, description="Immatriculation ou nom du client"),
+                                'detail': openapi.Schema(type=openapi.TYPE_STRING, description="Marque, modèle et année, ou téléphone"),
+                                'score': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            }
+                        )),
+                    }
+                )
+            ),
+            status.HTTP_400_BAD_REQUEST: "`q` ou `limit` invalide",
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        errors = {}
+        q = request.query_params.get('q', '').strip()
+        if len(q) < MIN_SEARCH_LENGTH:
+            errors['q'] = [f"Doit contenir au moins {MIN_SEARCH_LENGTH} caractères."]
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT))
+            if not 1 <= limit <= MAX_SEARCH_LIMIT:
+                raise ValueError
+        except ValueError:
+            errors['limit'] = [f"Doit être un entier entre 1 et {MAX_SEARCH_LIMIT}."]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return Response(search(request.user, q, limit=limit))
+
+# --- Dashboard ---
+
+class DashboardView(generics.GenericAPIView):
+    """Indicateurs du tableau de bord, lus dans les compteurs journaliers (GarageStats)."""
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = None
+
+    @swagger_auto_schema(
+        tags=['Tableau de bord'],
+        operation_summary="Indicateurs du tableau de bord (admin)",
+        operation_description=(
+            "Retourne en une requête les indicateurs du tableau de bord : nombre de véhicules (et ajoutés sur "
+            "30 jours), interventions à venir, du jour et urgentes (sous 3 jours), clients (et inscrits sur 7 jours), "
+            "montants des factures (total, 30 derniers jours, par mois sur 6 mois) et activité récente."
+        ),
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Indicateurs.",
+                examples={
+                    "application/json": {
+                        "metadata": {"timestamp": "2024-09-01T10:00:00+01:00"},
+                        "data": {
+                            "vehicles": {"total": 120, "added_last_month": 6, "average_mileage": 84250, "growth_rate": 5.3},
+                            "service_events": {"upcoming": 14, "today": 3, "urgent": 5, "last_month": 41},
+                            "customers": {"total": 97, "joined_last_week": 2},
+                            "invoices": {
+                                "total": 530, "total_amount": 182340.5, "amount_last_month": 9120.0,
+                                "monthly": [{"month": "2024-09", "count": 4, "amount": 1350.0}]
+                            },
+                            "recent_activity": [{
+                                "type": "mileage", "id": 981, "at": "2024-09-01T09:12:00+01:00",
+                                "registration_number": "123TU4567", "value": 84250, "user": "client1"
+                            }]
+                        },
+                        "error": None
+                    }
+                }
+            ),
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(dashboard_stats())
+
+# --- Activity feed ---
+
+class ActivityFeedView(generics.GenericAPIView):
+    """Fil d'activité : véhicules, interventions, relevés et factures, du plus récent au plus ancien."""
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None # Paged by the `before` cursor
+
+    @swagger_auto_schema(
+        tags=['Tableau de bord'],
+        operation_summary="Fil d'activité récente",
+        operation_description=(
+            "Retourne les véhicules ajoutés, interventions enregistrées, relevés kilométriques et factures de "
+            "l'utilisateur (tous pour admin), du plus récent au plus ancien.\n"
+            "Pour la page suivante, rappeler avec `before` égal au curseur `next` de la réponse ; "
+            "`next` est nul sur la dernière page."
+        ),
+        manual_parameters=[
+            openapi.Parameter('limit', openapi.IN_QUERY, description=f"Nombre d'éléments (défaut : {DEFAULT_ACTIVITY_LIMIT}, max : {MAX_ACTIVITY_LIMIT})", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('before', openapi.IN_QUERY, description="Curseur `next` de la page précédente", type=openapi.TYPE_STRING),
+        ],
+        responses={
+            status.HTTP_200_OK: openapi.Response(
+                description="Page du fil d'activité.",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'type': openapi.Schema(type=openapi.TYPE_STRING, enum=['vehicle', 'service', 'mileage', 'invoice']),
+                                'id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'at': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+                                'registration_number': openapi.Schema(type=openapi.TYPE_STRING),
+                                'value': openapi.Schema(type=openapi.TYPE_STRING, description="Véhicule, type d'intervention, kilométrage ou montant"),
+                                'user': openapi.Schema(type=openapi.TYPE_STRING, description="Auteur, si connu"),
+                            }
+                        )),
+                        'next': openapi.Schema(type=openapi.TYPE_STRING, description="Curseur de la page suivante (nul sur la dernière page)"),
+                    }
+                )
+            ),
+            status.HTTP_400_BAD_REQUEST: "`limit` ou `before` invalide",
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_ACTIVITY_LIMIT))
+            if not 1 <= limit <= MAX_ACTIVITY_LIMIT:
+                raise ValueError
+        except ValueError:
+            raise serializers.ValidationError({'limit': [f"Doit être un entier entre 1 et {MAX_ACTIVITY_LIMIT}."]})
+        try:
+            return Response(activity_feed(request.user, limit=limit, before=request.query_params.get('before')))
+        except ValueError as e:
+            raise serializers.ValidationError({'before': [str(e)]})
+
 # --- User Management ViewSet (Admin Only) ---
 
 @swagger_auto_schema(
@@ -945,6 +1576,7 @@ class UserViewSet(viewsets.ModelViewSet):
     """
     queryset = User.objects.all().order_by('id')
     serializer_class = UserSerializer
+    keyset_ordering = ('id',)
     permission_classes = [permissions.IsAdminUser] # Only admins can manage users
 
     # Custom action to update the user's profile